@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+"""Cache of parsed ASTs for imported dice sources."""
+
+from __future__ import annotations
+
+import os
+import threading
+
+
+CACHE_FORMAT_VERSION = 1
+# Cached trees are only valid for the lexer and parser that built them, so
+# these modules' sources are part of the parser version stored with each tree.
+PARSER_SOURCE_MODULES = (
+    "lexer.py",
+    "diceparser.py",
+    "syntaxtree.py",
+    "diagnostics.py",
+    "astcache.py",
+)
+_parser_version = None
+
+
+def parser_version():
+    global _parser_version
+    if _parser_version is None:
+        import hashlib
+
+        digest = hashlib.sha256("ast-cache-format-{}".format(CACHE_FORMAT_VERSION).encode("utf-8"))
+        root = os.path.dirname(os.path.abspath(__file__))
+        for module_name in PARSER_SOURCE_MODULES:
+            with open(os.path.join(root, module_name), "rb") as handle:
+                digest.update(module_name.encode("utf-8"))
+                digest.update(handle.read())
+        _parser_version = digest.hexdigest()
+    return _parser_version
+
+
+class ParsedSourceCache:
+    """Parsed ASTs keyed by source path, modification time and size.
+
+    Trees are kept in memory for the whole process, so every Interpreter and
+    DiceSession shares them. When a directory is set (see `dice.py
+    --cache-dir`), in-memory misses fall back to pickled trees there, which
+    are also checked against the parser version.
+    """
+
+    def __init__(self):
+        self.directory = None
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def set_directory(self, directory):
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    def parse(self, path, parse_function):
+        """Return the tree for path, calling parse_function(path) on a miss."""
+        status = os.stat(path)
+        stamp = (status.st_mtime_ns, status.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == stamp:
+                self.hits += 1
+                return entry[1]
+        ast = self._load(path, stamp)
+        if ast is None:
+            ast = parse_function(path)
+            self._store(path, stamp, ast)
+        with self._lock:
+            self._entries[path] = (stamp, ast)
+        return ast
+
+    def _disk_path(self, path):
+        import hashlib
+
+        return os.path.join(self.directory, hashlib.sha256(path.encode("utf-8")).hexdigest() + ".pickle")
+
+    def _load(self, path, stamp):
+        if self.directory is None:
+            self.misses += 1
+            return None
+        import pickle
+
+        try:
+            with open(self._disk_path(path), "rb") as handle:
+                version, cached_path, cached_stamp, ast = pickle.load(handle)
+        except Exception:
+            self.misses += 1
+            return None
+        if version != parser_version() or cached_path != path or cached_stamp != stamp:
+            self.misses += 1
+            return None
+        self.disk_hits += 1
+        return ast
+
+    def _store(self, path, stamp, ast):
+        if self.directory is None:
+            return
+        # Only the disk cache needs these, so they are imported here.
+        import pickle
+        import tempfile
+
+        try:
+            payload = pickle.dumps((parser_version(), path, stamp, ast), protocol=pickle.HIGHEST_PROTOCOL)
+            # Written to a temporary file first so concurrent runs never read
+            # a partial pickle.
+            handle, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        except Exception:
+            return
+        try:
+            with os.fdopen(handle, "wb") as stream:
+                stream.write(payload)
+            os.replace(temporary_path, self._disk_path(path))
+        except OSError:
+            try:
+                os.unlink(temporary_path)
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.disk_hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "directory": self.directory,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+
+AST_CACHE = ParsedSourceCache()
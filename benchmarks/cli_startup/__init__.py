@@ -0,0 +1 @@
+"""CLI cold start benchmark."""
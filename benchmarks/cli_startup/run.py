@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+"""Measure `dice.py` cold start with `python -X importtime`."""
+
+from __future__ import annotations
+
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+from time import perf_counter
+
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from benchmarks import common
+
+
+# Modules a text or JSON one-shot run must never pay for.
+HEAVY_MODULES = ("matplotlib", "numpy", "readline", "sqlite3", "timeout_decorator")
+COMMANDS = (
+    ("python -c pass", ("-c", "pass")),
+    ('dice.py "d20 + 5"', (str(ROOT / "dice.py"), "d20 + 5")),
+    ('dice.py --json "d20 + 5"', (str(ROOT / "dice.py"), "--json", "d20 + 5")),
+)
+
+
+def run_once(arguments, importtime=False):
+    command = (sys.executable,) + (("-X", "importtime") if importtime else ()) + tuple(arguments)
+    start = perf_counter()
+    completed = subprocess.run(
+        command,
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return perf_counter() - start, completed.stderr
+
+
+def parse_importtime(stderr):
+    """Return {module: (self_us, cumulative_us, depth)} from -X importtime output."""
+    imports = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_time, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports[name.strip()] = (int(self_time), int(cumulative), depth)
+    return imports
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=5,
+        help="Timing repeats; the best run is reported.",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=10,
+        help="Number of top-level imports to list for the dice run.",
+    )
+    args = parser.parse_args()
+
+    rows = []
+    dice_imports = {}
+    for label, arguments in COMMANDS:
+        # -X importtime slows the interpreter down, so wall times come from
+        # plain runs and the module list from one extra instrumented run.
+        best = min(run_once(arguments)[0] for _ in range(max(1, args.repeats)))
+        imports = parse_importtime(run_once(arguments, importtime=True)[1])
+        if label == COMMANDS[1][0]:
+            dice_imports = imports
+        heavy = [name for name in HEAVY_MODULES if name in imports]
+        rows.append(
+            (
+                label,
+                "{:.1f}".format(best * 1000),
+                "{:,}".format(len(imports)),
+                ", ".join(heavy) if heavy else "-",
+            )
+        )
+
+    print("Benchmark: CLI cold start")
+    print()
+    print(common.markdown_table(("Command", "Best wall (ms)", "Modules imported", "Heavy modules"), rows))
+    print()
+    top_level = sorted(
+        ((name, cumulative) for name, (_, cumulative, depth) in dice_imports.items() if depth == 0),
+        key=lambda item: item[1],
+        reverse=True,
+    )[: max(0, args.top)]
+    print(
+        common.markdown_table(
+            ("Top-level import", "Cumulative (ms)"),
+            [(name, "{:.1f}".format(cumulative / 1000)) for name, cumulative in top_level],
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
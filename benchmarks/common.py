@@ -49,6 +49,21 @@ def mean_absolute_error(exact_result, sampled_result, coordinates) -> float:
     return sum(errors) / len(errors)
 
 
+def max_probability_difference(left_result, right_result) -> float:
+    left_cells = cells_dict(left_result)
+    right_cells = cells_dict(right_result)
+    difference = 0.0
+    for coordinate, left in left_cells.items():
+        right = right_cells[coordinate]
+        for outcome in set(left.keys()) | set(right.keys()):
+            difference = max(difference, abs(float(left[outcome]) - float(right[outcome])))
+    return difference
+
+
+def max_total_deviation(result) -> float:
+    return max(abs(float(cell.total_weight) - 1.0) for cell in cells_dict(result).values())
+
+
 def sample_coordinates(backend, coordinates, trials: int, seed: int, **backend_kwargs) -> dict[tuple[object, ...], dict[int, float]]:
     sampled = {}
     for index, coordinate in enumerate(coordinates):
@@ -3,10 +3,12 @@
 from __future__ import annotations
 
 from dice import dice_interpreter
+from diceengine import exact_probabilities
 
 from .workload import ROOT, build_dice_program
 
 
-def evaluate_exact_sweep():
-    session = dice_interpreter(current_dir=str(ROOT))
-    return session(build_dice_program())
+def evaluate_exact_sweep(rational=False):
+    with exact_probabilities(rational):
+        session = dice_interpreter(current_dir=str(ROOT))
+        return session(build_dice_program())
@@ -45,6 +45,7 @@ class BenchmarkConfig:
     plot_path: str | None
     numpy_batch_size: int
     numpy_processes: int
+    exact_probabilities: bool
 
 
 def parse_args() -> BenchmarkConfig:
@@ -104,6 +105,11 @@ def parse_args() -> BenchmarkConfig:
         default=(os.cpu_count() or 1),
         help="Worker-process count for the NumPy backend. Trials are split evenly across workers.",
     )
+    parser.add_argument(
+        "--exact-probabilities",
+        action="store_true",
+        help="Also time the exact sweep with rational probabilities and compare it to float mode.",
+    )
     args = parser.parse_args()
     shared_counts = tuple(dict.fromkeys(args.sample_counts or ()))
     baseline_counts = tuple(dict.fromkeys(args.baseline_sample_counts or shared_counts or (4000,)))
@@ -117,6 +123,7 @@ def parse_args() -> BenchmarkConfig:
         plot_path=args.plot_path,
         numpy_batch_size=args.numpy_batch_size,
         numpy_processes=max(1, args.numpy_processes),
+        exact_probabilities=args.exact_probabilities,
     )
 
 
@@ -205,6 +212,22 @@ def main() -> None:
         )
     ]
 
+    rational_sweep = None
+    if config.exact_probabilities:
+        rational_start = perf_counter()
+        rational_sweep = exact_dice.evaluate_exact_sweep(rational=True)
+        rational_elapsed = perf_counter() - rational_start
+        table_rows.append(
+            (
+                "dice exact (rational)",
+                "-",
+                "full sweep ({:,} cells)".format(len(exact_cells)),
+                "{:.3f}".format(rational_elapsed),
+                format_ratio(rational_elapsed / exact_elapsed),
+                "{:.4f}".format(common.mean_absolute_error(rational_sweep, exact_sweep, workload.REPRESENTATIVE_CELLS)),
+            )
+        )
+
     for backend_index, (backend_name, sample_counts) in enumerate(benchmark_rows(config), start=1):
         backend = BACKENDS[backend_name]
         for sample_index, sample_count in enumerate(sample_counts, start=1):
@@ -238,6 +261,16 @@ def main() -> None:
         )
     )
 
+    if rational_sweep is not None:
+        print()
+        print(
+            "Rational vs float: max |p_float - p_exact| = {:.3e}, max |total - 1| float = {:.3e}, rational = {:.3e}".format(
+                common.max_probability_difference(exact_sweep, rational_sweep),
+                common.max_total_deviation(exact_sweep),
+                common.max_total_deviation(rational_sweep),
+            )
+        )
+
     print()
     print("Representative cells:")
     for label, sampled_sweep in sampled_runs.items():
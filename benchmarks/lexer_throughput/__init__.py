@@ -0,0 +1 @@
+"""Lexer throughput benchmark workload."""
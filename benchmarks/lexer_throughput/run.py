@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+"""Measure lexer and parser throughput on a large generated program."""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from time import perf_counter
+
+
+if __package__ in (None, ""):
+    from pathlib import Path
+
+    ROOT = Path(__file__).resolve().parents[2]
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    from benchmarks import common
+    from benchmarks.lexer_throughput import workload
+else:
+    from benchmarks import common
+    from . import workload
+
+from diceparser import DiceParser
+from lexer import EOF, Lexer
+
+
+def lex(text):
+    lexer = Lexer(text)
+    count = 0
+    while lexer.next_token().type != EOF:
+        count += 1
+    return count
+
+
+def parse(text):
+    return DiceParser(Lexer(text)).parse()
+
+
+def best_time(function, text, repeats):
+    best = None
+    result = None
+    for _ in range(repeats):
+        start = perf_counter()
+        result = function(text)
+        elapsed = perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--lines",
+        type=int,
+        default=workload.DEFAULT_LINES,
+        help="Approximate number of lines in the generated program.",
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=3,
+        help="Timing repeats; the best run is reported.",
+    )
+    args = parser.parse_args()
+    text = workload.build_program(args.lines)
+    line_count = text.count("\n")
+
+    lex_elapsed, token_count = best_time(lex, text, max(1, args.repeats))
+    parse_elapsed, _ = best_time(parse, text, max(1, args.repeats))
+
+    print("Benchmark: lexer throughput")
+    print("Program: {:,} lines, {:,} characters, {:,} tokens".format(line_count, len(text), token_count))
+    print()
+    print(
+        common.markdown_table(
+            ("Stage", "Time (s)", "Lines / s", "Tokens / s"),
+            [
+                (
+                    stage,
+                    "{:.3f}".format(elapsed),
+                    "{:,.0f}".format(line_count / elapsed),
+                    "{:,.0f}".format(token_count / elapsed),
+                )
+                for stage, elapsed in (("lex", lex_elapsed), ("lex + parse", parse_elapsed))
+            ],
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Generated multi-thousand-line program for the lexer throughput benchmark."""
+
+from __future__ import annotations
+
+from textwrap import dedent
+
+
+DEFAULT_LINES = 5000
+
+# One block of definitions covering comments, strings, indented bodies,
+# sweeps, split clauses and the usual operators. Blocks are repeated with
+# fresh names until the program has the requested number of lines.
+BLOCK_TEMPLATE = dedent(
+    """\
+    # generated block {index}
+    bonus_{index} = {index} + 2
+
+    damage_{index}(ac, mode="normal"):
+        roll = mode == "advantage" -> d+20 | d20
+        hit = roll + bonus_{index} >= ac
+        hit -> 2 d 6 + 3 | 0
+
+    attack_{index}(ac):
+        split d20 as roll | roll == 20 -> 4 d 6 | roll + bonus_{index} >= ac -> 2 d 6 ||
+
+    sweep_{index} = damage_{index}([AC_{index}:10..20], mode=["normal", "advantage"]) $ mean
+    table_{index} = [1, 2, 3] + 3 d 8 h 2 - d4 * 1.5 // 2
+    """
+)
+
+
+def build_program(lines=DEFAULT_LINES):
+    block_lines = BLOCK_TEMPLATE.count("\n")
+    blocks = max(1, -(-lines // block_lines))
+    return "".join(BLOCK_TEMPLATE.format(index=index) for index in range(blocks))
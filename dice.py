@@ -2,29 +2,63 @@
 """Interactive interpreter for the dice language"""
 
 import argparse
+from fractions import Fraction
+import functools
+import importlib.util
 import os
+import signal
 import sys
 
 from diagnostics import DEFAULT_SOURCE_NAME, DiagnosticError, format_diagnostic
-try:
-    import timeout_decorator
-except ImportError:
-    class _TimeoutFallback(object):
-        @staticmethod
-        def timeout(_seconds):
-            def decorator(function):
-                return function
-            return decorator
 
-    timeout_decorator = _TimeoutFallback()
 
-try:
-    import readline
-except ImportError:  # pragma: no cover - platform-specific
-    readline = None
+class _SignalTimeout(object):
+    """Signal-based timeout_decorator.timeout that defers importing it.
+
+    timeout_decorator imports multiprocessing up front, a sizeable share of a
+    one-shot CLI run. The alarm is armed the same way here, and the package
+    is only imported to raise its TimeoutError once a call times out."""
+
+    @staticmethod
+    def timeout(seconds):
+        def decorator(function):
+            @functools.wraps(function)
+            def new_function(*args, **kwargs):
+                new_seconds = kwargs.pop("timeout", seconds)
+                if not new_seconds:
+                    return function(*args, **kwargs)
+                old = signal.signal(signal.SIGALRM, _SignalTimeout._handler)
+                signal.setitimer(signal.ITIMER_REAL, new_seconds)
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+                    signal.signal(signal.SIGALRM, old)
+            return new_function
+        return decorator
+
+    @staticmethod
+    def _handler(_signum, _frame):
+        import timeout_decorator
+
+        raise timeout_decorator.TimeoutError()
+
+
+class _TimeoutFallback(object):
+    @staticmethod
+    def timeout(_seconds):
+        def decorator(function):
+            return function
+        return decorator
+
+
+if importlib.util.find_spec("timeout_decorator") is not None and hasattr(signal, "setitimer"):
+    timeout_decorator = _SignalTimeout()
+else:
+    timeout_decorator = _TimeoutFallback()
 
 from interpreter import Interpreter
-from hostfunctions import D, dicefunction
+from hostfunctions import D, RESULT_CACHE, dicefunction
 from diceengine import (
     Distributions,
     Distribution,
@@ -32,12 +66,14 @@ from diceengine import (
     TupleValue,
     RecordValue,
     RenderConfig,
+    set_exact_probabilities,
     wait_for_rendered_figures,
 )
 from diceparser import DiceParser, ParserError
 from lexer import Lexer, LexerError
 from resultjson import (
     format_result_json as _format_result_json,
+    iter_result_json_lines as _iter_result_json_lines,
     is_numeric as _is_numeric,
     resolve_probability_mode as _resolve_probability_mode,
     round_numeric as _round_numeric,
@@ -88,6 +124,9 @@ def _ordered_labels(values):
 
 
 def _format_rounded_numeric(value, roundlevel=0):
+    if isinstance(value, Fraction):
+        # Exact probabilities are printed as floats.
+        value = float(value)
     if isinstance(value, int):
         return str(value)
     if isinstance(value, float):
@@ -147,7 +186,8 @@ def _distribution_mean(distrib):
     outcomes = list(distrib.keys())
     if not outcomes or not all(_is_numeric(outcome) for outcome in outcomes):
         return None
-    return distrib.average()
+    mean = distrib.average()
+    return float(mean) if isinstance(mean, Fraction) else mean
 
 
 def _format_unswept_distribution(distrib, roundlevel=0, probability_mode="percent"):
@@ -176,7 +216,7 @@ def _format_scalar_sweep(result, roundlevel=0):
             [
                 (
                     _format_label(value, roundlevel),
-                    _format_scalar(_deterministic_outcome(result.cells[(value,)]), roundlevel),
+                    _format_scalar(_deterministic_outcome(result.cell((value,))), roundlevel),
                 )
                 for value in axis.values
             ]
@@ -191,9 +231,9 @@ def _format_distribution_sweep(result, roundlevel=0, probability_mode="percent")
     seen = set()
     means = []
     for axis_value in axis.values:
-        distrib = result.cells[(axis_value,)]
+        distrib = result.cell((axis_value,))
         means.append(_distribution_mean(distrib))
-        for outcome in _ordered_labels(result.cells[(axis_value,)].keys()):
+        for outcome in _ordered_labels(result.cell((axis_value,)).keys()):
             if outcome not in seen:
                 outcomes.append(outcome)
                 seen.add(outcome)
@@ -204,7 +244,7 @@ def _format_distribution_sweep(result, roundlevel=0, probability_mode="percent")
             [_format_label(outcome, roundlevel)]
             + [
                 _format_probability(
-                    result.cells[(value,)][outcome],
+                    result.cell((value,))[outcome],
                     roundlevel,
                     probability_mode=probability_mode,
                 )
@@ -222,12 +262,22 @@ def _format_scalar_heatmap(result, roundlevel=0):
     for row_value in row_axis.values:
         row = [_format_label(row_value, roundlevel)]
         for col_value in col_axis.values:
-            scalar = _deterministic_outcome(result.cells[(row_value, col_value)])
+            scalar = _deterministic_outcome(result.cell((row_value, col_value)))
             row.append(_format_scalar(scalar, roundlevel))
         rows.append(row)
     return _string_table(rows)
 
 
+def _float_weights(value):
+    # Text output reports floats, also for exact-mode measures that fall
+    # back to their repr.
+    if isinstance(value, FiniteMeasure):
+        return type(value)._from_weights({outcome: float(weight) for outcome, weight in value.entries})
+    if isinstance(value, Distributions):
+        return Distributions(value.axes, {coordinates: _float_weights(cell) for coordinates, cell in value.items()})
+    return value
+
+
 def _format_result_text(result, roundlevel=0, probability_mode="percent"):
     if isinstance(result, Distribution):
         return _format_unswept_distribution(
@@ -236,10 +286,10 @@ def _format_result_text(result, roundlevel=0, probability_mode="percent"):
             probability_mode=probability_mode,
         )
     if isinstance(result, FiniteMeasure):
-        return str(result)
+        return str(_float_weights(result))
     if isinstance(result, Distributions):
         if result.is_unswept() and isinstance(result.only_distribution(), FiniteMeasure) and not isinstance(result.only_distribution(), Distribution):
-            return str(result.only_distribution())
+            return str(_float_weights(result.only_distribution()))
         if result.is_unswept():
             return _format_unswept_distribution(
                 result.only_distribution(),
@@ -258,7 +308,7 @@ def _format_result_text(result, roundlevel=0, probability_mode="percent"):
             return _format_scalar_heatmap(result, roundlevel)
     if isinstance(result, float) and roundlevel:
         return _format_scalar(result, roundlevel)
-    return str(result)
+    return str(_float_weights(result))
 
 
 def _build_render_config(mode, render_backend="matplotlib"):
@@ -272,8 +322,17 @@ def _history_file_path():
     return os.path.join(state_home, "dice", "history")
 
 
+def _load_readline():
+    # Only the REPL edits lines, so one-shot runs never import readline.
+    try:
+        import readline
+    except ImportError:  # pragma: no cover - platform-specific
+        return None
+    return readline
+
+
 def _setup_repl_history(readline_module=None):
-    readline_module = readline if readline_module is None else readline_module
+    readline_module = _load_readline() if readline_module is None else readline_module
     if readline_module is None:
         return None
     history_path = _history_file_path()
@@ -290,7 +349,7 @@ def _setup_repl_history(readline_module=None):
 
 
 def _save_repl_history(history_path, readline_module=None):
-    readline_module = readline if readline_module is None else readline_module
+    readline_module = _load_readline() if readline_module is None else readline_module
     if readline_module is None or history_path is None:
         return
     try:
@@ -300,7 +359,7 @@ def _save_repl_history(history_path, readline_module=None):
 
 
 def _setup_repl_completion(interpreter, readline_module=None):
-    readline_module = readline if readline_module is None else readline_module
+    readline_module = _load_readline() if readline_module is None else readline_module
     if readline_module is None:
         return None
 
@@ -389,7 +448,7 @@ def _handle_repl_command(text, state, interpreter):
     raise InteractiveCommandError("Unknown interpreter command {}".format(parts[0]))
 
 
-def _interpret_ast(ast, roundlevel=0, executor=None, interpreter=None, current_dir=None, render_config=None):
+def _interpret_ast(ast, roundlevel=0, executor=None, interpreter=None, current_dir=None, render_config=None, jobs=1):
     if interpreter is None:
         interpreter = Interpreter(
             ast,
@@ -402,10 +461,19 @@ def _interpret_ast(ast, roundlevel=0, executor=None, interpreter=None, current_d
         if current_dir is not None:
             interpreter.current_dir = os.path.abspath(current_dir)
     interpreter.warnings = []
+    if jobs > 1:
+        from parallelsweep import interpret_parallel
+
+        return interpret_parallel(interpreter, ast, jobs)
     result = interpreter.interpret()
     return result
 
 
+def _parse_command(text, source_name=DEFAULT_SOURCE_NAME):
+    parser = DiceParser(Lexer(text, source_name=source_name))
+    return parser.parse() if (";" in text or "\n" in text) else parser.statement()
+
+
 def _print_warnings(interpreter):
     for warning in getattr(interpreter, "warnings", []):
         sys.stderr.write(format_diagnostic(warning) + "\n")
@@ -420,16 +488,16 @@ def interpret_statement(
     current_dir=None,
     source_name=DEFAULT_SOURCE_NAME,
     render_config=None,
+    jobs=1,
 ):
-    parser = DiceParser(Lexer(text, source_name=source_name))
-    ast = parser.parse() if (";" in text or "\n" in text) else parser.statement()
     return _interpret_ast(
-        ast,
+        _parse_command(text, source_name),
         roundlevel,
         executor=executor,
         interpreter=interpreter,
         current_dir=current_dir,
         render_config=render_config,
+        jobs=jobs,
     )
 
 
@@ -442,6 +510,7 @@ def interpret_file(
     current_dir=None,
     source_name=DEFAULT_SOURCE_NAME,
     render_config=None,
+    jobs=1,
 ):
     """Interpret a semicolon or newline separated program."""
     return _interpret_ast(
@@ -451,14 +520,16 @@ def interpret_file(
         interpreter=interpreter,
         current_dir=current_dir,
         render_config=render_config,
+        jobs=jobs,
     )
 
 
 class DiceSession(object):
     """Stateful Python-facing wrapper around the dice interpreter."""
 
-    def __init__(self, roundlevel=0, executor=None, current_dir=None, render_config=None):
+    def __init__(self, roundlevel=0, executor=None, current_dir=None, render_config=None, jobs=1):
         self.roundlevel = roundlevel
+        self.jobs = jobs
         self.current_dir = os.path.abspath(current_dir if current_dir is not None else os.getcwd())
         session_render_config = (
             render_config if render_config is not None else NON_BLOCKING_RENDER_CONFIG
@@ -477,6 +548,7 @@ class DiceSession(object):
             roundlevel=self.roundlevel,
             interpreter=self.interpreter,
             current_dir=call_dir,
+            jobs=self.jobs,
         )
 
     def assign(self, name, value):
@@ -496,12 +568,13 @@ class DiceSession(object):
         return self.interpreter.register_function(function, name=name)
 
 
-def dice_interpreter(roundlevel=0, current_dir=None, executor=None, render_config=None):
+def dice_interpreter(roundlevel=0, current_dir=None, executor=None, render_config=None, jobs=1):
     return DiceSession(
         roundlevel=roundlevel,
         current_dir=current_dir,
         executor=executor,
         render_config=render_config,
+        jobs=jobs,
     )
 
 
@@ -517,6 +590,7 @@ def print_interactive_error(error):
 def runinteractive(args):
     """Run a simple interactive shell."""
     json_output = getattr(args, "json_output", False)
+    json_stream = getattr(args, "json_stream", False)
     render_backend = getattr(args, "render_backend", "matplotlib")
 
     def emit_result(result):
@@ -524,6 +598,7 @@ def runinteractive(args):
             result,
             args.verbose,
             json_output=json_output,
+            json_stream=json_stream,
             roundlevel=state["roundlevel"],
             probability_mode=interpreter.executor.render_config.probability_mode,
         )
@@ -582,6 +657,7 @@ def runinteractive(args):
                     args.verbose,
                     text,
                     json_output=json_output,
+                    json_stream=json_stream,
                     roundlevel=state["roundlevel"],
                     probability_mode=interpreter.executor.render_config.probability_mode,
                 )
@@ -597,12 +673,23 @@ def print_result(
     json_output=False,
     roundlevel=0,
     probability_mode=None,
+    json_stream=False,
 ):
     """Print a result to stdout."""
     effective_probability_mode = _resolve_probability_mode(
         probability_mode,
-        json_output=json_output,
+        json_output=json_output or json_stream,
     )
+    if json_stream:
+        if verbose:
+            sys.stdout.write("dice> " + line + "\n")
+        for json_line in _iter_result_json_lines(
+            result,
+            roundlevel,
+            probability_mode=effective_probability_mode,
+        ):
+            sys.stdout.write(json_line + "\n")
+        return
     rendered = (
         _format_result_json(
             result,
@@ -635,18 +722,112 @@ def main():
     parser.add_argument("-i", "--interactive", action="store_true", help="Run in interactive mode")
     parser.add_argument("-f", "--file", dest="file", help="Execute a dice source file")
     parser.add_argument("--json", action="store_true", dest="json_output", help="Print structured JSON output")
+    parser.add_argument(
+        "--json-stream",
+        action="store_true",
+        dest="json_stream",
+        help="Print JSON as NDJSON: axis metadata first, then one compact line per cell",
+    )
     parser.add_argument(
         "--render-backend",
         choices=("matplotlib", "json"),
         default="matplotlib",
         help="Select the render backend",
     )
+    parser.add_argument(
+        "--cache-dir",
+        dest="cache_dir",
+        default=None,
+        help="Persist exact function results and parsed imports in this directory across runs",
+    )
+    parser.add_argument(
+        "--exact-probabilities",
+        action="store_true",
+        dest="exact_probabilities",
+        help="Compute probabilities as exact rationals instead of floats",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        dest="jobs",
+        help="Evaluate large named sweeps across this many worker processes",
+    )
+    parser.add_argument(
+        "--serve",
+        nargs="?",
+        const="stdio",
+        default=None,
+        metavar="ADDRESS",
+        help='Answer line-delimited JSON requests on "stdio" (default), "unix:PATH" or "http://HOST:PORT"',
+    )
+    parser.add_argument(
+        "--sessions",
+        type=int,
+        default=4,
+        dest="sessions",
+        help="Number of warm sessions kept by --serve",
+    )
+    parser.add_argument(
+        "--preload",
+        action="append",
+        default=[],
+        dest="preload",
+        help='Dice source run in every --serve or --batch session first, e.g. \'import "std:dnd/weapons"\'',
+    )
+    parser.add_argument(
+        "--batch",
+        default=None,
+        metavar="INPUT",
+        help='Evaluate one JSON request per line of INPUT ("-" for stdin) and print JSONL results',
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        dest="workers",
+        help="Evaluate --batch items across this many worker processes",
+    )
     parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose output")
     parser.add_argument("command", nargs="*", help="Command to execute")
 
     # Parse arguments
     args = parser.parse_args()
-    args.roundlevel = _resolve_cli_roundlevel(args.roundlevel, json_output=args.json_output)
+    if args.json_stream:
+        args.json_output = True
+    args.roundlevel = _resolve_cli_roundlevel(
+        args.roundlevel,
+        json_output=args.json_output or args.serve is not None or args.batch is not None,
+    )
+    if args.exact_probabilities:
+        set_exact_probabilities(True)
+
+    if args.cache_dir is None:
+        return _run_cli(parser, args)
+    from astcache import AST_CACHE
+    from resultstore import open_result_store
+
+    store = open_result_store(args.cache_dir)
+    RESULT_CACHE.set_persistent_store(store)
+    AST_CACHE.set_directory(os.path.join(args.cache_dir, "ast"))
+    try:
+        return _run_cli(parser, args)
+    finally:
+        AST_CACHE.set_directory(None)
+        RESULT_CACHE.set_persistent_store(None)
+        store.close()
+
+
+def _run_cli(parser, args):
+    if args.serve is not None:
+        if args.interactive or args.file or args.command:
+            parser.error("--serve cannot be combined with --interactive, --file or a command")
+        return _run_server(args)
+
+    if args.batch is not None:
+        if args.interactive or args.file or args.command:
+            parser.error("--batch cannot be combined with --interactive, --file or a command")
+        return _run_batch(args)
 
     if args.interactive:
         if args.file or args.command:
@@ -663,6 +844,7 @@ def main():
                 args.verbose,
                 args.file,
                 json_output=args.json_output,
+                json_stream=args.json_stream,
                 roundlevel=args.roundlevel,
                 probability_mode=interpreter.executor.render_config.probability_mode,
             )
@@ -681,6 +863,7 @@ def main():
                     interpreter=interpreter,
                     current_dir=os.path.dirname(os.path.abspath(args.file)),
                     source_name=os.path.abspath(args.file),
+                    jobs=args.jobs,
                 )
             except DiagnosticError as error:
                 sys.stderr.write(format_diagnostic(error) + "\n")
@@ -692,6 +875,7 @@ def main():
                 args.verbose,
                 args.file,
                 json_output=args.json_output,
+                json_stream=args.json_stream,
                 roundlevel=args.roundlevel,
                 probability_mode=interpreter.executor.render_config.probability_mode,
             )
@@ -711,6 +895,7 @@ def main():
             args.verbose,
             command,
             json_output=args.json_output,
+            json_stream=args.json_stream,
             roundlevel=args.roundlevel,
             probability_mode=interpreter.executor.render_config.probability_mode,
         ),
@@ -721,6 +906,7 @@ def main():
             args.roundlevel,
             interpreter=interpreter,
             source_name="<command>",
+            jobs=args.jobs,
         )
     except DiagnosticError as error:
         sys.stderr.write(format_diagnostic(error) + "\n")
@@ -732,6 +918,7 @@ def main():
             args.verbose,
             command,
             json_output=args.json_output,
+            json_stream=args.json_stream,
             roundlevel=args.roundlevel,
             probability_mode=interpreter.executor.render_config.probability_mode,
         )
@@ -739,5 +926,49 @@ def main():
     return 0
 
 
+def _run_server(args):
+    from diceserver import SessionPool, serve
+
+    try:
+        pool = SessionPool(
+            lambda: DiceSession(
+                roundlevel=args.roundlevel,
+                render_config=_build_render_config("deferred", args.render_backend),
+                jobs=args.jobs,
+            ),
+            size=args.sessions,
+            preload=args.preload,
+            roundlevel=args.roundlevel,
+        )
+    except DiagnosticError as error:
+        sys.stderr.write(format_diagnostic(error) + "\n")
+        return 1
+    return serve(args.serve, pool)
+
+
+def _run_batch(args):
+    from dicebatch import run_batch_file
+
+    session_factory = functools.partial(
+        DiceSession,
+        roundlevel=args.roundlevel,
+        render_config=_build_render_config("deferred", args.render_backend),
+        jobs=args.jobs,
+    )
+    try:
+        return run_batch_file(
+            args.batch,
+            sys.stdout,
+            session_factory,
+            preload=args.preload,
+            roundlevel=args.roundlevel,
+            workers=args.workers,
+            cache_dir=args.cache_dir,
+        )
+    except DiagnosticError as error:
+        sys.stderr.write(format_diagnostic(error) + "\n")
+        return 1
+
+
 if __name__ == "__main__":
     sys.exit(main())
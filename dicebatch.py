@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+"""Bulk evaluation of JSONL workloads in one process.
+
+Every input line is a `diceserver` request such as
+`{"id": "fighter-3", "program": "d20 + bonus >= ac", "bindings": {"bonus": 5, "ac": 15}}`.
+One response line is written per input line, in input order. Each response
+has its own `elapsed_ms`, and failures carry `format_diagnostic` text. Lines
+without an id are numbered from 1. With more than one worker, lines are
+evaluated in worker processes that each keep their own warm session."""
+
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import json
+import os
+import sys
+from time import perf_counter
+
+from diceengine import exact_probabilities_enabled, set_exact_probabilities
+from diceserver import SessionPool
+
+
+# Lines handed to the worker pool at once, per worker.
+WINDOW_PER_WORKER = 256
+CHUNKSIZE = 16
+_worker_pool = None
+
+
+def handle_batch_line(pool, number, line):
+    """Return (ok, response line) for input line number."""
+    try:
+        request = json.loads(line)
+    except ValueError as error:
+        response = {"id": number, "ok": False, "error": "error: invalid JSON request: {}".format(error), "elapsed_ms": 0.0}
+    else:
+        if isinstance(request, dict) and "id" not in request:
+            request["id"] = number
+        response = pool.handle(request)
+    return response["ok"], json.dumps(response)
+
+
+def _numbered_lines(input_stream):
+    for number, line in enumerate(input_stream, 1):
+        if line.strip():
+            yield number, line
+
+
+def _start_worker(session_factory, preload, roundlevel, exact_probabilities, cache_dir):
+    global _worker_pool
+    set_exact_probabilities(exact_probabilities)
+    if cache_dir is not None:
+        # A forked worker must not share the parent's SQLite connection.
+        from astcache import AST_CACHE
+        from hostfunctions import RESULT_CACHE
+        from resultstore import open_result_store
+
+        RESULT_CACHE.set_persistent_store(open_result_store(cache_dir))
+        AST_CACHE.set_directory(os.path.join(cache_dir, "ast"))
+    _worker_pool = SessionPool(session_factory, size=1, preload=preload, roundlevel=roundlevel)
+
+
+def _handle_in_worker(item):
+    return handle_batch_line(_worker_pool, *item)
+
+
+def run_batch(input_stream, output_stream, session_factory, preload=(), roundlevel=0, workers=1, cache_dir=None):
+    """Evaluate every request line of input_stream and return (items, failures).
+
+    session_factory must be picklable when workers is above 1."""
+    # Built up front even with workers, so a broken --preload fails once here.
+    pool = SessionPool(session_factory, size=1, preload=preload, roundlevel=roundlevel)
+    lines = _numbered_lines(input_stream)
+    items = 0
+    failures = 0
+
+    def emit(outcomes):
+        nonlocal items, failures
+        for ok, response in outcomes:
+            items += 1
+            failures += 0 if ok else 1
+            output_stream.write(response + "\n")
+        output_stream.flush()
+
+    if workers <= 1:
+        for number, line in lines:
+            emit([handle_batch_line(pool, number, line)])
+        return items, failures
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_start_worker,
+        initargs=(session_factory, tuple(preload), roundlevel, exact_probabilities_enabled(), cache_dir),
+    ) as executor:
+        while True:
+            window = list(islice(lines, WINDOW_PER_WORKER * workers))
+            if not window:
+                break
+            emit(executor.map(_handle_in_worker, window, chunksize=CHUNKSIZE))
+    return items, failures
+
+
+def run_batch_file(path, output_stream, session_factory, **options):
+    """run_batch over path ("-" reads stdin), reporting a summary on stderr."""
+    start = perf_counter()
+    if path == "-":
+        items, failures = run_batch(sys.stdin, output_stream, session_factory, **options)
+    else:
+        with open(path, encoding="utf-8") as handle:
+            items, failures = run_batch(handle, output_stream, session_factory, **options)
+    sys.stderr.write(
+        "batch: {} items, {} failed, {:.2f}s\n".format(items, failures, perf_counter() - start)
+    )
+    return 1 if failures else 0
@@ -4,17 +4,27 @@
 
 from __future__ import annotations
 
+from bisect import bisect_left, bisect_right
+import cmath
+from contextlib import contextmanager
 from dataclasses import dataclass, replace
 from functools import wraps
+import heapq
 import importlib
-from itertools import product
-from math import inf, isfinite, sqrt
+from itertools import accumulate, product
+from fractions import Fraction
+from math import ceil, floor, inf, isfinite, log2, pi, sqrt
+from operator import mul as _multiply
 import random
 import re
+import sys
+import threading
 from typing import Any, Generic, TypeVar
+import weakref
 
 from diagnostics import RuntimeError as DiceRuntimeError
-from hostfunctions import dicefunction
+from exactprobability import CountWeights, ExactProbability, convolve_counts, count_weights, exact_probability, power_counts
+from hostfunctions import RESULT_CACHE, check_evaluation_deadline, dicefunction
 
 try:
     from math import comb
@@ -29,12 +39,22 @@ TRUE = 1
 FALSE = 0
 PROBABILITY_TOLERANCE = 1e-9
 _renderer_modules = {}
+_optional_modules = {}
+_axis_positions_cache = {}
+# Axis keys never repeat across sweeps, so long-lived processes would grow the
+# positions cache forever; it is cleared once it holds this many layouts.
+AXIS_POSITIONS_CACHE_LIMIT = 4096
+_interned_values = weakref.WeakValueDictionary()
 _RENDERER_MODULE_NAMES = {
     "matplotlib": "viewer",
     "json": "jsonrenderer",
 }
 _IDENTIFIER_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
 _OMITTED = object()
+_NOT_DENSE = object()
+_MISSING_RESULT = object()
+_NOT_SORTABLE = object()
+_exact_probabilities = False
 
 
 def exception(message):
@@ -45,6 +65,45 @@ def runtime_error(message, hint=None):
     raise DiceRuntimeError(message, hint=hint)
 
 
+def set_exact_probabilities(enabled):
+    # Opt-in exact mode: weights become ExactProbability rationals, and dense
+    # integer supports keep integer counts over one shared denominator.
+    global _exact_probabilities
+    enabled = bool(enabled)
+    if enabled != _exact_probabilities:
+        _exact_probabilities = enabled
+        # Cached results and interned dice carry weights of the other mode.
+        RESULT_CACHE.clear()
+        _interned_values.clear()
+    return enabled
+
+
+def exact_probabilities_enabled():
+    return _exact_probabilities
+
+
+@contextmanager
+def exact_probabilities(enabled=True):
+    previous = _exact_probabilities
+    set_exact_probabilities(enabled)
+    try:
+        yield
+    finally:
+        set_exact_probabilities(previous)
+
+
+def _count_probability(count, total):
+    if _exact_probabilities:
+        return ExactProbability(count, total)
+    return count / total
+
+
+def _statistic_value(value):
+    # Statistics are ordinary numeric values in the language, so exact
+    # rationals are reported as floats.
+    return float(value) if isinstance(value, ExactProbability) else value
+
+
 @dataclass(frozen=True)
 class RenderConfig:
     interactive_blocking: bool = True
@@ -181,6 +240,11 @@ def _get_renderer(render_config=None):
 
 
 def wait_for_rendered_figures(render_config=None):
+    backend = _normalize_render_backend((render_config if render_config is not None else RenderConfig()).backend)
+    # A renderer that was never imported has no figures to wait for, so text
+    # and JSON runs do not pay for importing matplotlib here.
+    if _RENDERER_MODULE_NAMES[backend] not in sys.modules:
+        return
     renderer = _get_renderer(render_config)
     renderer.wait_for_rendered_figures(
         render_config=render_config if render_config is not None else RenderConfig()
@@ -188,6 +252,8 @@ def wait_for_rendered_figures(render_config=None):
 
 
 def _canonicalize_weighted_entries(entries):
+    if _exact_probabilities:
+        return _canonicalize_exact_weighted_entries(entries)
     merged = {}
     for outcome, weight in entries:
         if not isinstance(weight, (int, float)) or not isfinite(weight):
@@ -203,6 +269,57 @@ def _canonicalize_weighted_entries(entries):
     return tuple((outcome, weight) for outcome, weight in merged.items() if weight != 0)
 
 
+def _canonicalize_exact_weighted_entries(entries):
+    merged = {}
+    for outcome, weight in entries:
+        if not isinstance(weight, (int, float, Fraction)) or not isfinite(weight):
+            runtime_error("weights must be finite numbers")
+        if weight < 0:
+            runtime_error("weights must be non-negative")
+        if weight == 0:
+            continue
+        try:
+            merged[outcome] = merged.get(outcome, 0) + exact_probability(weight)
+        except TypeError as error:
+            runtime_error("measure outcomes must be hashable: {}".format(error))
+    return tuple((outcome, weight) for outcome, weight in merged.items() if weight != 0)
+
+
+class MeasureBuilder:
+    """Mutable accumulator for engine-produced weighted entries.
+
+    Weights are merged per outcome in first-contribution order, exactly as
+    _canonicalize_weighted_entries would, but without re-validating them. The
+    finished value is built once through the trusted constructor."""
+
+    __slots__ = ("weights",)
+
+    def __init__(self):
+        self.weights = {}
+
+    def add(self, outcome, weight):
+        if weight:
+            weights = self.weights
+            try:
+                weights[outcome] = weights.get(outcome, 0.0) + weight
+            except TypeError as error:
+                runtime_error("measure outcomes must be hashable: {}".format(error))
+
+    def add_scaled(self, measure, factor):
+        if not factor:
+            return
+        weights = self.weights
+        try:
+            for outcome, weight in measure.items():
+                if weight:
+                    weights[outcome] = weights.get(outcome, 0.0) + factor * weight
+        except TypeError as error:
+            runtime_error("measure outcomes must be hashable: {}".format(error))
+
+    def build(self, cls=None):
+        return (Distribution if cls is None else cls)._from_weights(self.weights)
+
+
 def _is_identifier_key(key):
     return isinstance(key, str) and _IDENTIFIER_PATTERN.match(key) is not None
 
@@ -296,21 +413,128 @@ class RecordValue:
     __str__ = __repr__
 
 
-@dataclass(frozen=True, init=False)
+@dataclass(frozen=True, init=False, eq=False, repr=False)
 class FiniteMeasure:
-    entries: tuple[tuple[object, float], ...]
+    _entries: tuple[tuple[object, float], ...] | None
     total_weight: float
+    _dense: object
+    _hash: int | None
+    _thresholds: object
 
     def __init__(self, entries=None):
         normalized_entries = _canonicalize_weighted_entries(entries.items() if isinstance(entries, dict) else (entries or ()))
-        object.__setattr__(self, "entries", normalized_entries)
+        object.__setattr__(self, "_entries", normalized_entries)
         object.__setattr__(self, "total_weight", sum(weight for _, weight in normalized_entries))
+        object.__setattr__(self, "_dense", None)
+        object.__setattr__(self, "_hash", None)
+        object.__setattr__(self, "_thresholds", None)
+
+    @classmethod
+    def _from_dense(cls, offset, weights):
+        # Engine-internal constructor for integer supports. The weights tuple is
+        # stored as-is (offset + contiguous float weights); tuple entries are
+        # only materialized if a caller asks for them.
+        start = 0
+        end = len(weights)
+        while start < end and weights[start] == 0:
+            start += 1
+        while end > start and weights[end - 1] == 0:
+            end -= 1
+        if start or end != len(weights):
+            weights = weights.trimmed(start, end) if isinstance(weights, CountWeights) else weights[start:end]
+        instance = cls.__new__(cls)
+        object.__setattr__(instance, "_entries", None)
+        object.__setattr__(instance, "_hash", None)
+        object.__setattr__(instance, "_thresholds", None)
+        object.__setattr__(instance, "total_weight", weights.total() if isinstance(weights, CountWeights) else sum(weights))
+        object.__setattr__(instance, "_dense", (offset + start, weights) if weights else _NOT_DENSE)
+        if not weights:
+            object.__setattr__(instance, "_entries", ())
+        instance._validate_total_weight()
+        return instance
+
+    @classmethod
+    def _from_weights(cls, weights):
+        # Engine-internal constructor for merged outcome -> weight dicts whose
+        # weights are already known to be finite and non-negative, e.g. from a
+        # MeasureBuilder. Only the distribution total is still validated.
+        instance = cls.__new__(cls)
+        entries = tuple(weights.items())
+        object.__setattr__(instance, "_entries", entries)
+        object.__setattr__(instance, "total_weight", sum(weights.values()))
+        object.__setattr__(instance, "_dense", None)
+        object.__setattr__(instance, "_hash", None)
+        object.__setattr__(instance, "_thresholds", None)
+        instance._validate_total_weight()
+        return instance
+
+    def _validate_total_weight(self):
+        return None
+
+    @property
+    def entries(self):
+        entries = self._entries
+        if entries is None:
+            offset, weights = self._dense
+            entries = tuple((offset + index, weight) for index, weight in enumerate(weights) if weight != 0)
+            object.__setattr__(self, "_entries", entries)
+        return entries
+
+    def _dense_integer_view(self):
+        dense = self._dense
+        if dense is None:
+            dense = _dense_integer_weights_from_entries(self._entries)
+            object.__setattr__(self, "_dense", dense)
+        return None if dense is _NOT_DENSE else dense
+
+    def _threshold_table(self):
+        thresholds = self._thresholds
+        if thresholds is None:
+            thresholds = _ThresholdTable.build(self)
+            object.__setattr__(self, "_thresholds", thresholds)
+        return None if thresholds is _NOT_SORTABLE else thresholds
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return (self.entries, self.total_weight) == (other.entries, other.total_weight)
+
+    def __hash__(self):
+        # Values are immutable and used as result-cache keys, so the
+        # structural hash is computed once.
+        cached = self._hash
+        if cached is None:
+            cached = hash((self.entries, self.total_weight))
+            object.__setattr__(self, "_hash", cached)
+        return cached
+
+    def __getstate__(self):
+        # String hashes are salted per process and _NOT_DENSE is a
+        # process-local sentinel, so neither survives pickling.
+        state = dict(self.__dict__)
+        state["_hash"] = None
+        state["_thresholds"] = None
+        if state["_dense"] is _NOT_DENSE:
+            state["_dense"] = None
+        return state
+
+    def _support_size(self):
+        if self._entries is None:
+            return len(self._dense[1])
+        return len(self._entries)
 
     def __repr__(self):
         return str(dict(self.entries))
 
     def __getitem__(self, key):
-        for outcome, weight in self.entries:
+        if self._entries is None:
+            offset, weights = self._dense
+            if isinstance(key, int) or (isinstance(key, float) and key.is_integer()):
+                index = int(key) - offset
+                if 0 <= index < len(weights):
+                    return weights[index]
+            return 0
+        for outcome, weight in self._entries:
             if outcome == key:
                 return weight
         return 0
@@ -334,8 +558,13 @@ class FiniteMeasure:
         return self.total_weight
 
     def average(self):
+        if self._entries is None:
+            offset, weights = self._dense
+            if isinstance(weights, CountWeights):
+                return ExactProbability(sum((offset + index) * count for index, count in enumerate(weights.counts)), weights.denominator)
+            return sum((offset + index) * probability for index, probability in enumerate(weights) if probability != 0)
         total = 0.0
-        for outcome, probability in self.entries:
+        for outcome, probability in self._entries:
             if not isinstance(outcome, (int, float)):
                 runtime_error(
                     "mean expects numeric outcomes, got {}".format(type(outcome)),
@@ -346,8 +575,18 @@ class FiniteMeasure:
 
     def variance(self):
         mean_value = self.average()
+        if self._entries is None:
+            offset, weights = self._dense
+            if isinstance(weights, CountWeights):
+                second_moment = sum((offset + index) ** 2 * count for index, count in enumerate(weights.counts))
+                return ExactProbability(second_moment, weights.denominator) - mean_value ** 2
+            return sum(
+                ((offset + index - mean_value) ** 2) * probability
+                for index, probability in enumerate(weights)
+                if probability != 0
+            )
         total = 0.0
-        for outcome, probability in self.entries:
+        for outcome, probability in self._entries:
             if not isinstance(outcome, (int, float)):
                 runtime_error(
                     "variance expects numeric outcomes, got {}".format(type(outcome)),
@@ -360,18 +599,22 @@ class FiniteMeasure:
         return sqrt(self.variance())
 
     def map_support(self, mapper):
-        mapped = []
+        mapped = MeasureBuilder()
         for outcome, weight in self.entries:
-            mapped.append((mapper(outcome), weight))
-        if isinstance(self, Distribution):
-            return Distribution(mapped)
-        return FiniteMeasure(mapped)
+            mapped.add(mapper(outcome), weight)
+        return mapped.build(Distribution if isinstance(self, Distribution) else FiniteMeasure)
 
 
-@dataclass(frozen=True, init=False)
+@dataclass(frozen=True, init=False, eq=False, repr=False)
 class Distribution(FiniteMeasure):
     def __init__(self, entries=None):
         super().__init__(entries)
+        self._validate_total_weight()
+
+    def __repr__(self):
+        return "{}(entries={!r}, total_weight={!r})".format(type(self).__qualname__, self.entries, self.total_weight)
+
+    def _validate_total_weight(self):
         if self.total_weight <= 0:
             runtime_error("distributions must have positive total probability")
         if abs(self.total_weight - 1.0) > PROBABILITY_TOLERANCE:
@@ -389,6 +632,8 @@ class SweepAxis:
 
 class SweepValues:
     counter = 0
+    # Server listener threads create sweeps concurrently.
+    _counter_lock = threading.Lock()
 
     def __init__(self, values, name=None):
         deduped = tuple(dict.fromkeys(values))
@@ -396,8 +641,9 @@ class SweepValues:
             runtime_error("sweeps require at least one value")
         self.values = deduped
         self.name = name
-        self.key = "sweep_{}".format(SweepValues.counter)
-        SweepValues.counter += 1
+        with SweepValues._counter_lock:
+            self.key = "sweep_{}".format(SweepValues.counter)
+            SweepValues.counter += 1
 
     def axis(self):
         axis_name = self.name if self.name else self.key
@@ -416,10 +662,27 @@ class SweepValues:
 T = TypeVar("T")
 
 
-@dataclass(frozen=True, init=False)
+def _items_are_row_major(axes, items):
+    expected_count = 1
+    for axis in axes:
+        expected_count *= len(axis.values)
+    if len(items) != expected_count:
+        return False
+    return all(coordinates == expected for (coordinates, _), expected in zip(items, _coordinates_space(axes)))
+
+
+@dataclass(frozen=True, init=False, eq=False)
 class Sweep(Generic[T]):
     axes: tuple[SweepAxis, ...]
-    _cells: tuple[tuple[tuple[object, ...], T], ...]
+    # Cells covering the full axis product in row-major order are stored as a
+    # flat value tuple; anything else keeps explicit (coordinates, value) pairs.
+    _values: tuple[T, ...] | None
+    _cells: tuple[tuple[tuple[object, ...], T], ...] | None
+    # Coordinates -> value, only built for explicit cells.
+    _cell_index: dict | None
+    # Per axis, value -> row-major offset contribution into _values.
+    _offsets: tuple[dict, ...] | None
+    _hash: int | None
 
     def __init__(self, axes=None, cells=None):
         axes = tuple(axes or ())
@@ -431,32 +694,91 @@ class Sweep(Generic[T]):
         if not items:
             items = (((), None),)
         object.__setattr__(self, "axes", axes)
-        object.__setattr__(self, "_cells", items)
+        object.__setattr__(self, "_cell_index", None)
+        object.__setattr__(self, "_offsets", None)
+        object.__setattr__(self, "_hash", None)
+        if _items_are_row_major(axes, items):
+            object.__setattr__(self, "_values", tuple(value for _, value in items))
+            object.__setattr__(self, "_cells", None)
+        else:
+            object.__setattr__(self, "_values", None)
+            object.__setattr__(self, "_cells", items)
+
+    @classmethod
+    def _from_row_major(cls, axes, values):
+        # Engine-internal constructor for values already produced in
+        # _coordinates_space(axes) order, e.g. by cellwise lifting.
+        instance = cls.__new__(cls)
+        object.__setattr__(instance, "axes", tuple(axes))
+        object.__setattr__(instance, "_values", tuple(values))
+        object.__setattr__(instance, "_cells", None)
+        object.__setattr__(instance, "_cell_index", None)
+        object.__setattr__(instance, "_offsets", None)
+        object.__setattr__(instance, "_hash", None)
+        return instance
 
     @staticmethod
     def scalar(value):
-        return Sweep((), {(): value})
+        return Sweep._from_row_major((), (value,))
 
     @staticmethod
     def from_values(sweep_values: SweepValues):
         axis = sweep_values.axis()
-        return Sweep((axis,), {(value,): value for value in axis.values})
+        return Sweep._from_row_major((axis,), axis.values)
+
+    def _cell_map(self):
+        cell_index = self._cell_index
+        if cell_index is None:
+            cell_index = dict(self._cells)
+            object.__setattr__(self, "_cell_index", cell_index)
+        return cell_index
+
+    def _axis_offsets(self):
+        offsets = self._offsets
+        if offsets is None:
+            stride = 1
+            reversed_offsets = []
+            for axis in reversed(self.axes):
+                reversed_offsets.append({value: index * stride for index, value in enumerate(axis.values)})
+                stride *= len(axis.values)
+            offsets = tuple(reversed(reversed_offsets))
+            object.__setattr__(self, "_offsets", offsets)
+        return offsets
 
     @property
     def cells(self):
-        return dict(self._cells)
+        return dict(self.iter_items())
+
+    def cell(self, coordinates):
+        """Return the value at coordinates, one value per axis in axes order."""
+        if self._values is None:
+            return self._cell_map()[coordinates]
+        offsets = self._axis_offsets()
+        if len(coordinates) != len(offsets):
+            raise KeyError(coordinates)
+        return self._values[sum([offset[coordinate] for offset, coordinate in zip(offsets, coordinates)])]
 
     def items(self):
+        if self._cells is None:
+            object.__setattr__(self, "_cells", tuple(zip(_coordinates_space(self.axes), self._values)))
         return self._cells
 
+    def iter_items(self):
+        """Iterate (coordinates, value) pairs without caching them on the sweep."""
+        if self._cells is not None:
+            return iter(self._cells)
+        return zip(_coordinates_space(self.axes), self._values)
+
     def values(self):
+        if self._values is not None:
+            return self._values
         return tuple(value for _, value in self._cells)
 
     def is_unswept(self):
         return len(self.axes) == 0
 
     def only_value(self):
-        return dict(self._cells)[()]
+        return self.cell(())
 
     def only_distribution(self):
         return self.only_value()
@@ -464,9 +786,31 @@ class Sweep(Generic[T]):
     def lookup(self, combined_axes, coordinates):
         if self.is_unswept():
             return self.only_value()
-        index_by_key = {axis.key: idx for idx, axis in enumerate(combined_axes)}
-        local_coordinates = tuple(coordinates[index_by_key[axis.key]] for axis in self.axes)
-        return dict(self._cells)[local_coordinates]
+        positions = _axis_positions(self.axes, combined_axes)
+        return self.cell(tuple([coordinates[position] for position in positions]))
+
+    def __eq__(self, other):
+        if not isinstance(other, Sweep):
+            return NotImplemented
+        if self.axes != other.axes:
+            return False
+        if self._values is not None and other._values is not None:
+            return self._values == other._values
+        return tuple(self.iter_items()) == tuple(other.iter_items())
+
+    def __hash__(self):
+        cached = self._hash
+        if cached is None:
+            cached = hash((self.axes, tuple(self.iter_items())))
+            object.__setattr__(self, "_hash", cached)
+        return cached
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_hash"] = None
+        state["_cell_index"] = None
+        state["_offsets"] = None
+        return state
 
     def with_cells(self, cells):
         return Sweep(self.axes, cells)
@@ -475,7 +819,7 @@ class Sweep(Generic[T]):
         if not digits:
             return self
         updated = {}
-        for coordinates, value in self._cells:
+        for coordinates, value in self.items():
             if isinstance(value, FiniteMeasure):
                 rounded_entries = [(outcome, round(weight, digits)) for outcome, weight in value.items()]
                 if isinstance(value, Distribution):
@@ -496,7 +840,7 @@ class Sweep(Generic[T]):
         if self.is_unswept():
             return repr(self.only_value())
         rendered = {}
-        for coordinates, value in self._cells:
+        for coordinates, value in self.items():
             if len(self.axes) == 1:
                 axis = self.axes[0]
                 key = coordinates[0] if axis.name.startswith("sweep_") else "{}={}".format(axis.name, coordinates[0])
@@ -589,7 +933,29 @@ def _ordered_numeric_outcomes(distrib, opname):
     return tuple(sorted(outcomes))
 
 
+def _ordered_numeric_items(distrib, opname):
+    dense = distrib._dense_integer_view()
+    if dense is not None:
+        start, weights = dense
+        return tuple((start + index, weight) for index, weight in enumerate(weights) if weight != 0)
+    weights = dict(distrib.items())
+    return tuple((outcome, weights[outcome]) for outcome in _ordered_numeric_outcomes(distrib, opname))
+
+
+def _interned(key, build):
+    # Small structural values such as dice and constants are shared per
+    # process, so cache keys built from them compare by identity first. Keys
+    # carry the scalar type because 1 == 1.0 would otherwise merge them.
+    value = _interned_values.get(key)
+    if value is None:
+        value = build()
+        _interned_values[key] = value
+    return value
+
+
 def _deterministic_distribution(value):
+    if value.__class__ in (int, float, str):
+        return _interned(("constant", value.__class__, value), lambda: Distribution(((value, 1.0),)))
     return Distribution(((value, 1.0),))
 
 
@@ -699,26 +1065,94 @@ def _union_axes(sweeps):
     return tuple(axes)
 
 
+def _axis_positions(axes, combined_axes):
+    # Lifting projects every combined coordinate onto each operand's own axes.
+    # The positions only depend on the two axis layouts, so they are computed
+    # once per (operand axes, combined axes) pair instead of once per cell.
+    cache_key = (tuple(axis.key for axis in axes), tuple(axis.key for axis in combined_axes))
+    positions = _axis_positions_cache.get(cache_key)
+    if positions is None:
+        index_by_key = {axis.key: idx for idx, axis in enumerate(combined_axes)}
+        positions = tuple(index_by_key[axis.key] for axis in axes)
+        if len(_axis_positions_cache) >= AXIS_POSITIONS_CACHE_LIMIT:
+            _axis_positions_cache.clear()
+        _axis_positions_cache[cache_key] = positions
+    return positions
+
+
+def _projected_cell_getter(axes, cells, combined_axes, default=None):
+    # Hoisted form of _lookup_projected(...) for loops over combined_axes.
+    if not axes:
+        value = cells.get((), default)
+        return lambda coordinates: value
+    positions = _axis_positions(axes, combined_axes)
+    if positions == tuple(range(len(combined_axes))):
+        return lambda coordinates: cells.get(coordinates, default)
+    return lambda coordinates: cells.get(tuple([coordinates[position] for position in positions]), default)
+
+
+def _cell_projector(sweep, combined_axes):
+    values = sweep._values
+    if values is None:
+        return _projected_cell_getter(sweep.axes, sweep._cell_map(), combined_axes)
+    if not sweep.axes:
+        value = values[0]
+        return lambda coordinates: value
+    # Row-major sweeps are indexed by offset, without a coordinate dict.
+    pairs = tuple(zip(_axis_positions(sweep.axes, combined_axes), sweep._axis_offsets()))
+    if len(pairs) == 1:
+        ((position, offsets),) = pairs
+
+        def project_single(coordinates):
+            offset = offsets.get(coordinates[position])
+            return None if offset is None else values[offset]
+
+        return project_single
+
+    def project(coordinates):
+        offset = 0
+        for position, offsets in pairs:
+            step = offsets.get(coordinates[position])
+            if step is None:
+                return None
+            offset += step
+        return values[offset]
+
+    return project
+
+
 def _lookup_projected(axes, cells, combined_axes, coordinates, default):
     if not axes:
         return cells.get((), default)
-    index_by_key = {axis.key: idx for idx, axis in enumerate(combined_axes)}
-    local_coordinates = tuple(coordinates[index_by_key[axis.key]] for axis in axes)
-    return cells.get(local_coordinates, default)
+    positions = _axis_positions(axes, combined_axes)
+    return cells.get(tuple([coordinates[position] for position in positions]), default)
 
 
 def _coordinates_space(axes):
     return [()] if not axes else product(*(axis.values for axis in axes))
 
 
-def _lift_cellwise(function, *args):
+def _lift_cellwise(function, *args, pure=False):
     sweeps = [_coerce_value_to_sweep(arg) for arg in args]
     combined_axes = _union_axes(sweeps)
-    cells = {}
+    projectors = [_cell_projector(sweep, combined_axes) for sweep in sweeps]
+    # A pure function is evaluated once per distinct tuple of projected cell
+    # objects, as in hostfunctions._lifted_python_call. Sampling functions
+    # are not pure: every cell needs its own draw.
+    results_by_cells = {} if pure else None
+    cells = []
     for coordinates in _coordinates_space(combined_axes):
-        projected = [sweep.lookup(combined_axes, coordinates) for sweep in sweeps]
-        cells[coordinates] = function(*projected)
-    return Sweep(combined_axes, cells)
+        check_evaluation_deadline()
+        projected = [project(coordinates) for project in projectors]
+        if pure:
+            cells_key = tuple(map(id, projected))
+            result = results_by_cells.get(cells_key, _MISSING_RESULT)
+            if result is _MISSING_RESULT:
+                result = results_by_cells[cells_key] = function(*projected)
+        else:
+            result = function(*projected)
+        cells.append(result)
+    return Sweep._from_row_major(combined_axes, cells)
 
 
 def lift_sweeps(function):
@@ -782,82 +1216,374 @@ def _normalize_measure_cell(measure):
     measure = _coerce_to_measure_cell(measure)
     if measure.total_weight <= 0:
         runtime_error("cannot normalize an empty finite measure")
-    entries = []
+    entries = MeasureBuilder()
     for outcome, weight in measure.items():
         outer_probability = weight / measure.total_weight
         if isinstance(outcome, Distribution):
-            for inner_outcome, inner_probability in outcome.items():
-                entries.append((inner_outcome, outer_probability * inner_probability))
+            entries.add_scaled(outcome, outer_probability)
         else:
-            entries.append((outcome, outer_probability))
-    return Distribution(entries)
+            entries.add(outcome, outer_probability)
+    return entries.build()
 
 
 def _uniform_die_distribution(sides):
     _require_int(sides, "roll")
     if sides <= 0:
         runtime_error("roll expects positive die sides")
-    return Distribution(((outcome, 1.0 / sides) for outcome in range(1, sides + 1)))
+    if _exact_probabilities:
+        return _interned(("die", sides), lambda: Distribution._from_dense(1, CountWeights((1,) * sides, sides)))
+    return _interned(("die", sides), lambda: Distribution._from_dense(1, (1.0 / sides,) * sides))
 
 
 DENSE_INTEGER_SUPPORT_RATIO = 8
 DENSE_INTEGER_SUPPORT_MIN_SPAN = 256
+DENSE_CONVOLUTION_LOOP_LIMIT = 256
+# FFT convolution is selected by the shorter operand width: NumPy's FFT pays
+# off early, the pure-Python radix-2 fallback only on wide supports.
+FFT_CONVOLUTION_NUMPY_MIN_WIDTH = 64
+FFT_CONVOLUTION_PYTHON_MIN_WIDTH = 512
+# Float64 FFT convolution of non-negative weights has an absolute per-cell
+# error of roughly eps * log2(n) * sum(left) * sum(right). Cells below
+# FFT_NOISE_FACTOR times that bound are indistinguishable from rounding noise
+# and are cleared, which also removes tiny negative weights. Tail outcomes
+# with less mass than the bound are dropped and the remaining weights are
+# rescaled to the exact total, so long convolution chains stay normalized.
+FFT_NOISE_FACTOR = 8
+_FLOAT_EPSILON = 2.0 ** -52
 _COMPARISON_NOT_DETERMINISTIC = object()
 
 
-def _dense_integer_weights(distrib):
+def _dense_span_allowed(span, nonzero_count):
+    return span <= max(nonzero_count * DENSE_INTEGER_SUPPORT_RATIO, DENSE_INTEGER_SUPPORT_MIN_SPAN)
+
+
+def _dense_integer_weights_from_entries(entries):
     # Dense integer convolution is worthwhile for many combat distributions even
     # when the support has holes, e.g. {0} U [hit_min..hit_max]. We therefore
     # allow zero-filled gaps and gate the fast path by span/density instead of a
     # strict contiguity check.
-    items = distrib.items()
-    if not items:
-        return None
-    weights_by_outcome = {}
+    if not entries:
+        return _NOT_DENSE
     start = None
     end = None
-    for outcome, weight in items:
+    for outcome, _ in entries:
         if not isinstance(outcome, int):
-            return None
-        weights_by_outcome[outcome] = weight
+            return _NOT_DENSE
         start = outcome if start is None else min(start, outcome)
         end = outcome if end is None else max(end, outcome)
     span = end - start + 1
-    nonzero_count = len(weights_by_outcome)
-    if span > max(nonzero_count * DENSE_INTEGER_SUPPORT_RATIO, DENSE_INTEGER_SUPPORT_MIN_SPAN):
-        return None
+    if not _dense_span_allowed(span, len(entries)):
+        return _NOT_DENSE
     dense_weights = [0.0] * span
-    for outcome, weight in weights_by_outcome.items():
+    for outcome, weight in entries:
         dense_weights[outcome - start] = weight
     return start, tuple(dense_weights)
 
 
-def _convolve_dense_integer_add(left, right):
+def _dense_integer_weights(distrib):
+    return distrib._dense_integer_view()
+
+
+def _optional_module(name):
+    if name not in _optional_modules:
+        try:
+            _optional_modules[name] = importlib.import_module(name)
+        except ImportError:
+            _optional_modules[name] = None
+    return _optional_modules[name]
+
+
+def _fft_in_place(values, invert):
+    size = len(values)
+    swap_index = 0
+    for index in range(1, size):
+        bit = size >> 1
+        while swap_index & bit:
+            swap_index ^= bit
+            bit >>= 1
+        swap_index |= bit
+        if index < swap_index:
+            values[index], values[swap_index] = values[swap_index], values[index]
+    length = 2
+    sign = 1 if invert else -1
+    while length <= size:
+        half = length // 2
+        step = cmath.exp(sign * 2j * pi / length)
+        twiddles = [1 + 0j]
+        for _ in range(half - 1):
+            twiddles.append(twiddles[-1] * step)
+        for block in range(0, size, length):
+            for offset, twiddle in enumerate(twiddles):
+                low = values[block + offset]
+                high = values[block + offset + half] * twiddle
+                values[block + offset] = low + high
+                values[block + offset + half] = low - high
+        length <<= 1
+
+
+def _clear_fft_noise(raw_weights, noise_floor, total):
+    weights = [weight if weight > noise_floor else 0.0 for weight in raw_weights]
+    kept = sum(weights)
+    if kept <= 0:
+        return tuple(weights)
+    scale = total / kept
+    return tuple(weight * scale for weight in weights)
+
+
+def _fft_convolve_dense_weights(left_weights, right_weights):
+    result_size = len(left_weights) + len(right_weights) - 1
+    fft_size = 1 << (result_size - 1).bit_length()
+    numpy = _optional_module("numpy")
+    if numpy is not None:
+        spectrum = numpy.fft.rfft(left_weights, fft_size) * numpy.fft.rfft(right_weights, fft_size)
+        raw_weights = numpy.fft.irfft(spectrum, fft_size)[:result_size].tolist()
+    else:
+        left_spectrum = [complex(weight) for weight in left_weights]
+        left_spectrum.extend([0j] * (fft_size - len(left_weights)))
+        right_spectrum = [complex(weight) for weight in right_weights]
+        right_spectrum.extend([0j] * (fft_size - len(right_weights)))
+        _fft_in_place(left_spectrum, False)
+        _fft_in_place(right_spectrum, False)
+        product_spectrum = list(map(_multiply, left_spectrum, right_spectrum))
+        _fft_in_place(product_spectrum, True)
+        raw_weights = [value.real / fft_size for value in product_spectrum[:result_size]]
+    total = sum(left_weights) * sum(right_weights)
+    return _clear_fft_noise(raw_weights, FFT_NOISE_FACTOR * _FLOAT_EPSILON * log2(fft_size) * total, total)
+
+
+def _fft_convolution_selected(left_size, right_size):
+    narrow_width = min(left_size, right_size)
+    if narrow_width < FFT_CONVOLUTION_NUMPY_MIN_WIDTH:
+        return False
+    if narrow_width >= FFT_CONVOLUTION_PYTHON_MIN_WIDTH:
+        return True
+    return _optional_module("numpy") is not None
+
+
+def _convolve_dense_weights(left_weights, right_weights):
+    if _exact_probabilities:
+        return convolve_counts(count_weights(left_weights), count_weights(right_weights))
+    if _fft_convolution_selected(len(left_weights), len(right_weights)):
+        return _fft_convolve_dense_weights(left_weights, right_weights)
+    if len(left_weights) * len(right_weights) <= DENSE_CONVOLUTION_LOOP_LIMIT:
+        result_weights = [0.0] * (len(left_weights) + len(right_weights) - 1)
+        for left_index, left_probability in enumerate(left_weights):
+            if left_probability == 0:
+                continue
+            for right_index, right_probability in enumerate(right_weights):
+                if right_probability == 0:
+                    continue
+                result_weights[left_index + right_index] += left_probability * right_probability
+        return tuple(result_weights)
+    # Larger supports compute each output cell as one C-level dot product over
+    # the overlapping window instead of scattering products from Python.
+    if len(left_weights) < len(right_weights):
+        left_weights, right_weights = right_weights, left_weights
+    left_size = len(left_weights)
+    right_size = len(right_weights)
+    reversed_right = right_weights[::-1]
+    result_weights = []
+    for index in range(left_size + right_size - 1):
+        low = index - right_size + 1 if index >= right_size else 0
+        high = index + 1 if index < left_size else left_size
+        reversed_low = low + right_size - 1 - index
+        result_weights.append(
+            sum(map(_multiply, left_weights[low:high], reversed_right[reversed_low:reversed_low + high - low]))
+        )
+    return tuple(result_weights)
+
+
+def _dense_power(dense, count):
+    # count-fold self-convolution of an integer PMF, i.e. the count-th power of
+    # its generating polynomial, computed on weight tuples without building
+    # intermediate Distribution objects.
+    start, weights = dense
+    if _exact_probabilities:
+        return start * count, power_counts(count_weights(weights), count)
+    result_size = count * (len(weights) - 1) + 1
+    numpy = _optional_module("numpy") if result_size >= 2 * FFT_CONVOLUTION_NUMPY_MIN_WIDTH else None
+    if numpy is not None:
+        # One forward transform, an elementwise power and one inverse transform.
+        # Powering scales the FFT error bound by count.
+        fft_size = 1 << (result_size - 1).bit_length()
+        spectrum = numpy.fft.rfft(weights, fft_size) ** count
+        raw_weights = numpy.fft.irfft(spectrum, fft_size)[:result_size].tolist()
+        total = sum(weights) ** count
+        noise_floor = FFT_NOISE_FACTOR * _FLOAT_EPSILON * log2(fft_size) * count * total
+        return start * count, _clear_fft_noise(raw_weights, noise_floor, total)
+    # Walk the count bits from the top so the squaring order matches the
+    # repeat_sum(count // 2) recursion it replaces.
+    result_weights = weights
+    for bit in bin(count)[3:]:
+        result_weights = _convolve_dense_weights(result_weights, result_weights)
+        if bit == "1":
+            result_weights = _convolve_dense_weights(result_weights, weights)
+    return start * count, result_weights
+
+
+def _dense_add(left_dense, right_dense):
     # This is the main exact-add fast path. It intentionally handles bounded
     # integer supports with holes because branch-heavy attack distributions often
     # have a miss spike at 0 plus dense positive damage bands.
-    left_dense = _dense_integer_weights(left)
+    left_start, left_weights = left_dense
+    right_start, right_weights = right_dense
+    start = left_start + right_start
+    # Adding a deterministic integer is only a shift of the dense window.
+    if len(left_weights) == 1 and left_weights[0] == 1.0:
+        return Distribution._from_dense(start, right_weights)
+    if len(right_weights) == 1 and right_weights[0] == 1.0:
+        return Distribution._from_dense(start, left_weights)
+    return Distribution._from_dense(start, _convolve_dense_weights(left_weights, right_weights))
+
+
+def _dense_negated(dense):
+    start, weights = dense
+    return -(start + len(weights) - 1), weights.reversed() if isinstance(weights, CountWeights) else weights[::-1]
+
+
+def _dense_scale(dense, factor, factor_weight=1.0):
+    start, weights = dense
+    if factor == 0:
+        return _deterministic_distribution(0)
+    stride = abs(factor)
+    nonzero_count = sum(1 for weight in weights if weight != 0)
+    span = (len(weights) - 1) * stride + 1
+    if not _dense_span_allowed(span, nonzero_count):
+        return None
+    if factor < 0:
+        start, weights = _dense_negated(dense)
+    if isinstance(weights, CountWeights) and factor_weight == 1:
+        counts = [0] * span
+        for index, count in enumerate(weights.counts):
+            counts[index * stride] = count
+        return Distribution._from_dense(start * stride, CountWeights(counts, weights.denominator))
+    scaled = [0.0] * span
+    for index, weight in enumerate(weights):
+        scaled[index * stride] = weight * factor_weight
+    return Distribution._from_dense(start * stride, tuple(scaled))
+
+
+def _dense_integer_binary(left, right, opname):
+    # add, sub and scalar mul stay on the offset + contiguous-weights representation
+    # end to end, so chained damage arithmetic never builds tuple entries.
+    if opname not in ("add", "sub", "mul"):
+        return None
+    left_dense = left._dense_integer_view()
     if left_dense is None:
         return None
-    right_dense = _dense_integer_weights(right)
+    right_dense = right._dense_integer_view()
     if right_dense is None:
         return None
-    left_start, left_weights = left_dense
-    right_start, right_weights = right_dense
-    result_weights = [0.0] * (len(left_weights) + len(right_weights) - 1)
-    for left_index, left_probability in enumerate(left_weights):
-        if left_probability == 0:
-            continue
-        for right_index, right_probability in enumerate(right_weights):
-            if right_probability == 0:
-                continue
-            result_weights[left_index + right_index] += left_probability * right_probability
-    start = left_start + right_start
-    return Distribution(
-        (start + index, probability)
-        for index, probability in enumerate(result_weights)
-        if probability != 0
-    )
+    if opname == "add":
+        return _dense_add(left_dense, right_dense)
+    if opname == "sub":
+        return _dense_add(left_dense, _dense_negated(right_dense))
+    if len(right_dense[1]) == 1:
+        return _dense_scale(left_dense, right_dense[0], right_dense[1][0])
+    if len(left_dense[1]) == 1:
+        return _dense_scale(right_dense, left_dense[0], left_dense[1][0])
+    return None
+
+
+def _dense_threshold_interval(dense, scalar, operator, scalar_on_left):
+    # Returns the [low, high) index window of the dense weights for which
+    # "outcome <operator> scalar" holds.
+    if scalar_on_left:
+        operator = {"<=": ">=", ">=": "<=", "<": ">", ">": "<"}.get(operator, operator)
+    start, weights = dense
+    relative = scalar - start
+    size = len(weights)
+    if operator == ">=":
+        low, high = ceil(relative), size
+    elif operator == ">":
+        low, high = floor(relative) + 1, size
+    elif operator == "<=":
+        low, high = 0, floor(relative) + 1
+    elif operator == "<":
+        low, high = 0, ceil(relative)
+    elif operator == "==":
+        if relative != int(relative):
+            return 0, 0
+        low, high = int(relative), int(relative) + 1
+    else:
+        return None
+    low = min(max(low, 0), size)
+    high = min(max(high, low), size)
+    return low, high
+
+
+class _ThresholdTable:
+    """Sorted numeric support with running masses from both ends.
+
+    Built once per measure, so a comparison against a whole sweep of
+    thresholds answers each cell by index arithmetic (dense integer supports)
+    or bisection instead of scanning the support again."""
+
+    __slots__ = ("start", "outcomes", "weights", "prefix", "suffix")
+
+    def __init__(self, start, outcomes, weights, prefix, suffix):
+        self.start = start
+        self.outcomes = outcomes
+        self.weights = weights
+        self.prefix = prefix
+        self.suffix = suffix
+
+    @classmethod
+    def build(cls, measure):
+        dense = measure._dense_integer_view()
+        if dense is not None:
+            start, weights = dense
+            outcomes = None
+        else:
+            entries = measure.entries
+            for outcome, _ in entries:
+                if not isinstance(outcome, (int, float)) or outcome != outcome:
+                    return _NOT_SORTABLE
+            entries = sorted(entries, key=lambda entry: entry[0])
+            start = 0
+            outcomes = [outcome for outcome, _ in entries]
+            weights = tuple(weight for _, weight in entries)
+        if isinstance(weights, CountWeights):
+            denominator = weights.denominator
+            prefix = [ExactProbability(count, denominator) for count in accumulate(weights.counts, initial=0)]
+            suffix = [ExactProbability(count, denominator) for count in accumulate(reversed(weights.counts), initial=0)]
+        else:
+            prefix = list(accumulate(weights, initial=0))
+            suffix = list(accumulate(reversed(weights), initial=0))
+        # Both running sums start from the nearer end, so tail masses are not
+        # computed as 1 - p and never drift below zero.
+        suffix.reverse()
+        return cls(start, outcomes, weights, prefix, suffix)
+
+    def interval(self, scalar, operator, scalar_on_left):
+        if self.outcomes is None:
+            return _dense_threshold_interval((self.start, self.weights), scalar, operator, scalar_on_left)
+        if scalar_on_left:
+            operator = {"<=": ">=", ">=": "<=", "<": ">", ">": "<"}.get(operator, operator)
+        outcomes = self.outcomes
+        size = len(outcomes)
+        if operator == ">=":
+            return bisect_left(outcomes, scalar), size
+        if operator == ">":
+            return bisect_right(outcomes, scalar), size
+        if operator == "<=":
+            return 0, bisect_right(outcomes, scalar)
+        if operator == "<":
+            return 0, bisect_left(outcomes, scalar)
+        if operator == "==":
+            return bisect_left(outcomes, scalar), bisect_right(outcomes, scalar)
+        return None
+
+    def masses(self, low, high):
+        # Returns the (inside, outside) masses of the [low, high) window.
+        size = len(self.weights)
+        if low == 0:
+            inside = self.prefix[high]
+        elif high == size:
+            inside = self.suffix[low]
+        else:
+            inside = sum(self.weights[low:high])
+        return inside, self.prefix[low] + self.suffix[high]
 
 
 def _distribution_support_transform(value, scalar, operator, opname):
@@ -872,20 +1598,19 @@ def _require_support_numeric(outcome, opname):
 
 
 def _pairwise_numeric(left, right, operator, opname):
-    if opname == "add":
-        # Try the dense integer path before falling back to generic pairwise
-        # combination. Future regressions here show up immediately in the exact
-        # combat benchmarks.
-        convolved = _convolve_dense_integer_add(left, right)
-        if convolved is not None:
-            return convolved
-    result = []
+    # Try the dense integer path before falling back to generic pairwise
+    # combination. Future regressions here show up immediately in the exact
+    # combat benchmarks.
+    dense_result = _dense_integer_binary(left, right, opname)
+    if dense_result is not None:
+        return dense_result
+    result = MeasureBuilder()
     for left_value, left_probability in left.items():
         _require_numeric(left_value, opname)
         for right_value, right_probability in right.items():
             _require_numeric(right_value, opname)
-            result.append((operator(left_value, right_value), left_probability * right_probability))
-    return Distribution(result)
+            result.add(operator(left_value, right_value), left_probability * right_probability)
+    return result.build()
 
 
 def _is_structured_value(value):
@@ -912,7 +1637,7 @@ def _numeric_binary_cell(left, right, operator, opname, *, allow_measure_transfo
 def _compare_plain(left, right, operator):
     if operator not in ["<=", ">=", "<", ">", "==", "in"]:
         runtime_error("unknown operator {}".format(operator))
-    result = []
+    result = MeasureBuilder()
     for left_value, left_probability in left.items():
         for right_value, right_probability in right.items():
             if _is_structured_value(left_value) or _is_structured_value(right_value):
@@ -932,8 +1657,8 @@ def _compare_plain(left, right, operator):
             elif operator == "==":
                 comparison_true = left_value == right_value
             outcome = TRUE if comparison_true else FALSE
-            result.append((outcome, left_probability * right_probability))
-    return Distribution(result)
+            result.add(outcome, left_probability * right_probability)
+    return result.build()
 
 
 def _deterministic_comparison_value(value):
@@ -960,6 +1685,15 @@ def _compare_distribution_to_scalar(distribution, scalar, operator, *, scalar_on
             "comparisons do not support tuple or record values yet",
             hint="Use tuples and records as data values for now, not with comparison operators.",
         )
+    if isinstance(scalar, (int, float)) and isfinite(scalar):
+        thresholds = distribution._threshold_table()
+        interval = None if thresholds is None else thresholds.interval(scalar, operator, scalar_on_left)
+        if interval is not None:
+            true_mass, false_mass = thresholds.masses(*interval)
+            result = MeasureBuilder()
+            result.add(TRUE, true_mass)
+            result.add(FALSE, false_mass)
+            return result.build()
     true_probability = 0.0
     for outcome, probability in distribution.items():
         if _is_structured_value(outcome):
@@ -1013,6 +1747,49 @@ def _compare_cell(left, right, operator):
     return _compare_plain(_coerce_to_distribution_cell(left), _coerce_to_distribution_cell(right), operator)
 
 
+def compare_with(compare_function, left, right, operator):
+    # Threshold sweeps such as d20 + 7 >= [AC:10..20] are answered from the
+    # distribution's threshold table in one pass. Lifting compare_function
+    # would make one cached builtin call per cell instead.
+    swept = _compare_against_thresholds(left, right, operator)
+    if swept is None:
+        return compare_function(left, right)
+    return swept
+
+
+def _compare_against_thresholds(left, right, operator):
+    left_sweep = _coerce_value_to_sweep(left)
+    right_sweep = _coerce_value_to_sweep(right)
+    if left_sweep.is_unswept() == right_sweep.is_unswept():
+        return None
+    scalar_on_left = not left_sweep.is_unswept()
+    distribution, thresholds = (right_sweep, left_sweep) if scalar_on_left else (left_sweep, right_sweep)
+    distribution = distribution.only_value()
+    if not isinstance(distribution, Distribution) or thresholds._values is None:
+        return None
+    if distribution._support_size() < 2 or distribution._threshold_table() is None:
+        return None
+    scalars = []
+    for cell in thresholds._values:
+        scalar = _deterministic_comparison_value(cell)
+        if isinstance(scalar, bool) or not isinstance(scalar, (int, float)) or not isfinite(scalar):
+            return None
+        scalars.append(scalar)
+    results = {}
+    cells = []
+    for scalar in scalars:
+        result = results.get(scalar)
+        if result is None:
+            result = results[scalar] = _compare_distribution_to_scalar(
+                distribution,
+                scalar,
+                operator,
+                scalar_on_left=scalar_on_left,
+            )
+        cells.append(result)
+    return Sweep._from_row_major(thresholds.axes, cells)
+
+
 def _member_cell(left, right):
     left_distribution = _coerce_to_distribution_cell(left)
     domain = _coerce_to_measure_cell(right)
@@ -1029,15 +1806,15 @@ def _member_cell(left, right):
                 hint="Use a finite measure of scalar or nested finite-measure values.",
             )
         support.add(outcome)
-    result = []
+    result = MeasureBuilder()
     for outcome, probability in left_distribution.items():
         if _is_structured_value(outcome):
             runtime_error(
                 "in does not support tuple or record values yet",
                 hint="Use tuples and records as stored values for now, not with membership tests.",
             )
-        result.append((TRUE if outcome in support else FALSE, probability))
-    return Distribution(result)
+        result.add(TRUE if outcome in support else FALSE, probability)
+    return result.build()
 
 
 def _fixed_axis_distribution(axes, coordinates):
@@ -1048,20 +1825,25 @@ def _accumulate_distribution_contributions(contributions):
     if not contributions:
         return Sweep.scalar(_deterministic_distribution(0))
     combined_axes = _union_axes([Sweep(axes, cells) for axes, cells in contributions])
+    getters = [
+        _projected_cell_getter(axes, contribution_cells, combined_axes)
+        for axes, contribution_cells in contributions
+    ]
     cells = {}
     for coordinates in _coordinates_space(combined_axes):
-        merged = {}
-        for axes, contribution_cells in contributions:
-            projected = _lookup_projected(axes, contribution_cells, combined_axes, coordinates, None)
+        check_evaluation_deadline()
+        merged = MeasureBuilder()
+        for get_contribution in getters:
+            projected = get_contribution(coordinates)
             if projected is None:
                 continue
             # Split-heavy workloads keep raw weighted-entry tuples here on
-            # purpose so branch handling canonicalizes only once when the final
-            # Distribution is assembled for this output cell.
+            # purpose so branch handling builds only one Distribution for this
+            # output cell.
             projected_entries = projected.items() if isinstance(projected, FiniteMeasure) else projected
             for outcome, probability in projected_entries:
-                merged[outcome] = merged.get(outcome, 0.0) + probability
-        cells[coordinates] = Distribution(merged)
+                merged.add(outcome, probability)
+        cells[coordinates] = merged.build()
     return Sweep(combined_axes, cells)
 
 
@@ -1199,7 +1981,7 @@ def _mean_reduce_cell(entries):
     if all(isinstance(cell, (int, float)) for cell in cells):
         return sum(cells) / len(cells)
 
-    normalized_entries = []
+    normalized_entries = MeasureBuilder()
     probability_like = True
     for cell in cells:
         if isinstance(cell, (int, float)):
@@ -1215,10 +1997,8 @@ def _mean_reduce_cell(entries):
                 hint="Apply meanover to numeric sweeps or sweeps of measure-like cells.",
             )
         for outcome, weight in measure.items():
-            normalized_entries.append((outcome, weight / len(cells)))
-    if probability_like:
-        return Distribution(normalized_entries)
-    return FiniteMeasure(normalized_entries)
+            normalized_entries.add(outcome, weight / len(cells))
+    return normalized_entries.build(Distribution if probability_like else FiniteMeasure)
 
 
 def _max_key(cell, opname):
@@ -1347,7 +2127,6 @@ def sweep_index(value, clauses):
                     hint="Keep the selector's dependency axes visible, or reduce them first.",
                 )
 
-    source_cells = sweep.cells
     output_index = {axis.key: idx for idx, axis in enumerate(output_axes)}
     cells = {}
     for output_coordinates in _coordinates_space(output_axes):
@@ -1362,7 +2141,7 @@ def sweep_index(value, clauses):
                 source_coordinates.append(selected_value)
                 continue
             source_coordinates.append(output_coordinates[output_index[axis.key]])
-        cells[output_coordinates] = source_cells[tuple(source_coordinates)]
+        cells[output_coordinates] = sweep.cell(tuple(source_coordinates))
     return Sweep(output_axes, cells)
 
 
@@ -1381,12 +2160,12 @@ def res(condition: Any, distrib: Any):
 
 @dicefunction(cache=True)
 def mean(value: Any):
-    return _deterministic_distribution(_coerce_to_distribution_cell(value).average())
+    return _deterministic_distribution(_statistic_value(_coerce_to_distribution_cell(value).average()))
 
 
 @dicefunction(cache=True)
 def var(value: Any):
-    return _deterministic_distribution(_coerce_to_distribution_cell(value).variance())
+    return _deterministic_distribution(_statistic_value(_coerce_to_distribution_cell(value).variance()))
 
 
 @dicefunction(cache=True)
@@ -1404,8 +2183,8 @@ def cum(value: Any):
     distrib = _coerce_to_distribution_cell(value)
     cumulative = 0.0
     entries = []
-    for outcome in _ordered_numeric_outcomes(distrib, "cum"):
-        cumulative += distrib[outcome]
+    for outcome, probability in _ordered_numeric_items(distrib, "cum"):
+        cumulative += probability
         if abs(cumulative - 1.0) <= PROBABILITY_TOLERANCE:
             cumulative = 1.0
         entries.append((outcome, cumulative))
@@ -1417,8 +2196,8 @@ def surv(value: Any):
     distrib = _coerce_to_distribution_cell(value)
     remaining = distrib.total_weight
     entries = []
-    for outcome in _ordered_numeric_outcomes(distrib, "surv"):
-        remaining -= distrib[outcome]
+    for outcome, probability in _ordered_numeric_items(distrib, "surv"):
+        remaining -= probability
         if abs(remaining) <= PROBABILITY_TOLERANCE:
             remaining = 0.0
         entries.append((outcome, remaining))
@@ -1431,12 +2210,10 @@ def reselse(condition: Any, distrib_if: Any, distrib_else: Any):
     true_mass, false_mass = _bool_mass(condition_distribution)
     if_distribution = _coerce_to_distribution_cell(distrib_if)
     else_distribution = _coerce_to_distribution_cell(distrib_else)
-    entries = []
-    for outcome, probability in if_distribution.items():
-        entries.append((outcome, true_mass * probability))
-    for outcome, probability in else_distribution.items():
-        entries.append((outcome, false_mass * probability))
-    return Distribution(entries)
+    entries = MeasureBuilder()
+    entries.add_scaled(if_distribution, true_mass)
+    entries.add_scaled(else_distribution, false_mass)
+    return entries.build()
 
 
 @dicefunction(cache=True)
@@ -1453,7 +2230,15 @@ def reselsefloordiv(condition: Any, distrib: Any):
 def roll(n: Any, s: Any):
     n_distribution = _coerce_to_distribution_cell(n)
     s_distribution = _coerce_to_distribution_cell(s)
-    entries = []
+    if len(n_distribution.items()) == 1 and len(s_distribution.items()) == 1:
+        dice_count = n_distribution.keys()[0]
+        sides = s_distribution.keys()[0]
+        _require_int(dice_count, "roll")
+        _require_int(sides, "roll")
+        # Plain NdS keeps the dense repeat_sum result as-is instead of
+        # re-weighting every outcome by a deterministic outer probability.
+        return _coerce_to_distribution_cell(repeat_sum(dice_count, rollsingle(sides)))
+    entries = MeasureBuilder()
     for dice_count, dice_count_probability in n_distribution.items():
         _require_int(dice_count, "roll")
         for sides, sides_probability in s_distribution.items():
@@ -1462,10 +2247,8 @@ def roll(n: Any, s: Any):
             # exact-add machinery is exercised by both explicit repeat_sum(...)
             # and ordinary dice syntax.
             rolled = _coerce_to_distribution_cell(repeat_sum(dice_count, rollsingle(sides)))
-            outer = dice_count_probability * sides_probability
-            for outcome, probability in rolled.items():
-                entries.append((outcome, outer * probability))
-    return Distribution(entries)
+            entries.add_scaled(rolled, dice_count_probability * sides_probability)
+    return entries.build()
 
 
 @dicefunction(cache=True)
@@ -1473,41 +2256,75 @@ def rollsingle(dice: Any):
     if isinstance(dice, FiniteMeasure) and not isinstance(dice, Distribution):
         return _normalize_measure_cell(dice)
     sides_distribution = _coerce_to_distribution_cell(dice)
-    entries = []
+    if len(sides_distribution.items()) == 1:
+        return _uniform_die_distribution(sides_distribution.keys()[0])
+    entries = MeasureBuilder()
     for sides, probability in sides_distribution.items():
         _require_int(sides, "roll")
-        die_distribution = _uniform_die_distribution(sides)
-        for outcome, inner_probability in die_distribution.items():
-            entries.append((outcome, probability * inner_probability))
-    return Distribution(entries)
+        entries.add_scaled(_uniform_die_distribution(sides), probability)
+    return entries.build()
 
 
 @dicefunction(cache=True)
 def rolladvantage(dice: Any):
     dice_distribution = _coerce_to_distribution_cell(dice)
-    entries = []
+    entries = MeasureBuilder()
     for dice_sides, dice_probability in dice_distribution.items():
         _require_int(dice_sides, "advantage")
         if dice_sides <= 0:
             runtime_error("can't roll advantage with non-positive dice sides")
         for outcome in range(1, dice_sides + 1):
-            probability = 2 / dice_sides ** 2 * (outcome - 1) + (1 / dice_sides) ** 2
-            entries.append((outcome, dice_probability * probability))
-    return Distribution(entries)
+            if _exact_probabilities:
+                probability = ExactProbability(2 * outcome - 1, dice_sides ** 2)
+            else:
+                probability = 2 / dice_sides ** 2 * (outcome - 1) + (1 / dice_sides) ** 2
+            entries.add(outcome, dice_probability * probability)
+    return entries.build()
 
 
 @dicefunction(cache=True)
 def rolldisadvantage(dice: Any):
     dice_distribution = _coerce_to_distribution_cell(dice)
-    entries = []
+    entries = MeasureBuilder()
     for dice_sides, dice_probability in dice_distribution.items():
         _require_int(dice_sides, "disadvantage")
         if dice_sides <= 0:
             runtime_error("can't roll disadvantage with non-positive dice sides")
         for outcome in range(1, dice_sides + 1):
-            probability = 2 / dice_sides ** 2 * (dice_sides - outcome) + (1 / dice_sides) ** 2
-            entries.append((outcome, dice_probability * probability))
-    return Distribution(entries)
+            if _exact_probabilities:
+                probability = ExactProbability(2 * (dice_sides - outcome) + 1, dice_sides ** 2)
+            else:
+                probability = 2 / dice_sides ** 2 * (dice_sides - outcome) + (1 / dice_sides) ** 2
+            entries.add(outcome, dice_probability * probability)
+    return entries.build()
+
+
+def _keep_sum_counts(n, s, keep, highest):
+    # Order-statistics DP: visit face values from the kept end inward and count
+    # how many of the still-unassigned dice show each face with comb(...).
+    # Once `keep` dice are assigned the kept sum is final, and the remaining
+    # dice may show any face that has not been visited yet.
+    if keep == 0:
+        return {0: s ** n}
+    faces = range(s, 0, -1) if highest else range(1, s + 1)
+    counts = {}
+    states = {(0, 0): 1}
+    for visited, face in enumerate(faces, start=1):
+        next_states = {}
+        for (assigned, kept_sum), ways in states.items():
+            remaining = n - assigned
+            still_kept = keep - assigned
+            for showing in range(remaining + 1):
+                next_assigned = assigned + showing
+                next_sum = kept_sum + min(showing, still_kept) * face
+                next_ways = ways * comb(remaining, showing)
+                if next_assigned >= keep:
+                    counts[next_sum] = counts.get(next_sum, 0) + next_ways * (s - visited) ** (n - next_assigned)
+                else:
+                    key = (next_assigned, next_sum)
+                    next_states[key] = next_states.get(key, 0) + next_ways
+        states = next_states
+    return counts
 
 
 def _rollhigh_plain(n, s, nh):
@@ -1516,23 +2333,9 @@ def _rollhigh_plain(n, s, nh):
     _require_keep_count(n, nh, "rollhigh")
     if n < 0 or s <= 0 or nh < 0:
         runtime_error("rollhigh expects positive sides and non-negative counts")
-
-    def count_children(sides, n_left, results, distrib):
-        if n_left == 0:
-            distrib.append((sum(results), 1))
-            return
-        for value in range(1, sides + 1):
-            results_min = min(results)
-            new_results = results.copy()
-            if value > results_min:
-                new_results[results.index(results_min)] = value
-            count_children(sides, n_left - 1, new_results, distrib)
-
-    combinations = []
-    count_children(s, n, [0] * nh, combinations)
-    counts = FiniteMeasure(combinations)
     total = s ** n
-    return Distribution(((outcome, weight / total) for outcome, weight in counts.items()))
+    counts = _keep_sum_counts(n, s, nh, highest=True)
+    return Distribution._from_weights({outcome: _count_probability(weight, total) for outcome, weight in sorted(counts.items()) if weight})
 
 
 def _rolllow_plain(n, s, nl):
@@ -1541,23 +2344,9 @@ def _rolllow_plain(n, s, nl):
     _require_keep_count(n, nl, "rolllow")
     if n < 0 or s <= 0 or nl < 0:
         runtime_error("rolllow expects positive sides and non-negative counts")
-
-    def count_children(sides, n_left, results, distrib):
-        if n_left == 0:
-            distrib.append((sum(results), 1))
-            return
-        for value in range(1, sides + 1):
-            results_max = max(results)
-            new_results = results.copy()
-            if value < results_max:
-                new_results[results.index(results_max)] = value
-            count_children(sides, n_left - 1, new_results, distrib)
-
-    combinations = []
-    count_children(s, n, [inf] * nl, combinations)
-    counts = FiniteMeasure(combinations)
     total = s ** n
-    return Distribution(((outcome, weight / total) for outcome, weight in counts.items()))
+    counts = _keep_sum_counts(n, s, nl, highest=False)
+    return Distribution._from_weights({outcome: _count_probability(weight, total) for outcome, weight in sorted(counts.items()) if weight})
 
 
 @dicefunction(cache=True)
@@ -1565,15 +2354,13 @@ def rollhigh(n: Any, s: Any, nh: Any):
     n_distribution = _coerce_to_distribution_cell(n)
     s_distribution = _coerce_to_distribution_cell(s)
     keep_distribution = _coerce_to_distribution_cell(nh)
-    entries = []
+    entries = MeasureBuilder()
     for dice_count, dice_count_probability in n_distribution.items():
         for sides, sides_probability in s_distribution.items():
             for keep_count, keep_probability in keep_distribution.items():
                 rolled = _rollhigh_plain(dice_count, sides, keep_count)
-                outer = dice_count_probability * sides_probability * keep_probability
-                for outcome, probability in rolled.items():
-                    entries.append((outcome, outer * probability))
-    return Distribution(entries)
+                entries.add_scaled(rolled, dice_count_probability * sides_probability * keep_probability)
+    return entries.build()
 
 
 @dicefunction(cache=True)
@@ -1581,15 +2368,13 @@ def rolllow(n: Any, s: Any, nl: Any):
     n_distribution = _coerce_to_distribution_cell(n)
     s_distribution = _coerce_to_distribution_cell(s)
     keep_distribution = _coerce_to_distribution_cell(nl)
-    entries = []
+    entries = MeasureBuilder()
     for dice_count, dice_count_probability in n_distribution.items():
         for sides, sides_probability in s_distribution.items():
             for keep_count, keep_probability in keep_distribution.items():
                 rolled = _rolllow_plain(dice_count, sides, keep_count)
-                outer = dice_count_probability * sides_probability * keep_probability
-                for outcome, probability in rolled.items():
-                    entries.append((outcome, outer * probability))
-    return Distribution(entries)
+                entries.add_scaled(rolled, dice_count_probability * sides_probability * keep_probability)
+    return entries.build()
 
 
 @dicefunction(cache=True)
@@ -1674,14 +2459,18 @@ def repeat_sum(count: Any, value: Any):
         return 0
     if count_outcome == 1:
         return value
-    # Recurse through the decorated builtin itself so the lru_cache attached by
-    # @dicefunction(cache=True) is shared across the whole execution.
+    if isinstance(value, Distribution):
+        dense = value._dense_integer_view()
+        if dense is not None:
+            return Distribution._from_dense(*_dense_power(dense, count_outcome))
+    # Recurse through the decorated builtin itself so the shared result cache
+    # behind @dicefunction(cache=True) is reused across the whole execution.
     half = repeat_sum(count_outcome // 2, value)
     doubled = add(half, half)
     return doubled if count_outcome % 2 == 0 else add(doubled, value)
 
 
-@dicefunction
+@dicefunction(pure=True)
 def sumover(value: Sweep[Any], axes=_OMITTED):
     return sumover_with(add, value, axes)
 
@@ -1698,22 +2487,45 @@ def sumover_with(add_function, value, axes=_OMITTED):
 
 
 def _sumover_reduce_entries(add_function, entries):
-    reduced = 0
-    for _, cell in entries:
-        reduced = add_function(reduced, cell)
+    cells = [cell for _, cell in entries]
+    if len(cells) > 2 and all(isinstance(cell, FiniteMeasure) for cell in cells):
+        reduced = _balanced_sum(add_function, cells)
+    else:
+        reduced = 0
+        for cell in cells:
+            reduced = add_function(reduced, cell)
     reduced_sweep = _coerce_value_to_sweep(reduced)
     if not reduced_sweep.is_unswept():
         runtime_error("sumover reduction produced an unexpected sweep")
     return reduced_sweep.only_value()
 
-@dicefunction
+
+def _balanced_sum(add_function, cells):
+    # Folding left to right convolves an ever wider partial sum against one
+    # small cell per step. Always adding the two smallest supports instead
+    # keeps both operands of each convolution of similar width, so N equal
+    # cells cost about log2(N) wide convolutions.
+    heap = [(cell._support_size(), index, cell) for index, cell in enumerate(cells)]
+    heapq.heapify(heap)
+    index = len(heap)
+    while len(heap) > 1:
+        _, _, left = heapq.heappop(heap)
+        _, _, right = heapq.heappop(heap)
+        merged = add_function(left, right)
+        size = merged._support_size() if isinstance(merged, FiniteMeasure) else 1
+        heapq.heappush(heap, (size, index, merged))
+        index += 1
+    return heap[0][2]
+
+
+@dicefunction(pure=True)
 def meanover(value: Sweep[Any], axes=_OMITTED):
     sweep = _coerce_value_to_sweep(value)
     targets = _resolve_reduction_targets(sweep, axes, "meanover")
     return _apply_reduction(sweep, targets, "meanover", lambda _targets, entries: _mean_reduce_cell(entries))
 
 
-@dicefunction
+@dicefunction(pure=True)
 def maxover(value: Sweep[Any], axes=_OMITTED):
     sweep = _coerce_value_to_sweep(value)
     targets = _resolve_reduction_targets(sweep, axes, "maxover")
@@ -1725,7 +2537,7 @@ def maxover(value: Sweep[Any], axes=_OMITTED):
     )
 
 
-@dicefunction
+@dicefunction(pure=True)
 def argmaxover(value: Sweep[Any], axes=_OMITTED):
     sweep = _coerce_value_to_sweep(value)
     targets = _resolve_reduction_targets(sweep, axes, "argmaxover")
@@ -1750,7 +2562,7 @@ def total_with(add_function, value):
         lambda _targets, entries: _sumover_reduce_entries(add_function, entries),
     )
 
-@dicefunction
+@dicefunction(pure=True)
 def total(value: Sweep[Any]):
     return total_with(add, value)
 
@@ -1829,6 +2641,32 @@ def _normalize_render_export(path=None, format=None, dpi=None):
     return path, format, dpi
 
 
+def _with_float_weights(value):
+    # Renderers work on float arrays, so exact weights are converted when a
+    # chart is planned.
+    if isinstance(value, FiniteMeasure):
+        if not any(isinstance(weight, ExactProbability) for _, weight in value.items()):
+            return value
+        return type(value)._from_weights({outcome: float(weight) for outcome, weight in value.items()})
+    if isinstance(value, Sweep):
+        cells = [(coordinates, _with_float_weights(cell)) for coordinates, cell in value.items()]
+        if all(converted is cell for (_, converted), (_, cell) in zip(cells, value.items())):
+            return value
+        return Sweep(value.axes, cells)
+    if isinstance(value, ChartSpec):
+        payload = _with_float_weights(value.payload)
+        return value if payload is value.payload else replace(value, payload=payload)
+    if isinstance(value, TupleValue):
+        items = _with_float_weights(value.items)
+        return value if items is value.items else TupleValue(items)
+    if isinstance(value, (tuple, list)):
+        items = [_with_float_weights(item) for item in value]
+        if all(converted is item for converted, item in zip(items, value)):
+            return value
+        return type(value)(items)
+    return value
+
+
 def render_report(report, render_config=None, path=None, format=None, dpi=None):
     report = report if report is not None else ReportSpec()
     if report.is_empty():
@@ -198,7 +198,6 @@ class Parser(object):
         return (
             self.current_token,
             self.peek_token,
-            self.lexer.string_input,
             self.lexer.location,
             self.lexer.line,
             self.lexer.column,
@@ -208,7 +207,6 @@ class Parser(object):
         (
             self.current_token,
             self.peek_token,
-            self.lexer.string_input,
             self.lexer.location,
             self.lexer.line,
             self.lexer.column,
@@ -754,7 +752,7 @@ class DiceParser(Parser):
             header_text = "{}{}{}".format(
                 state[0].value or "",
                 state[1].value or "",
-                state[2],
+                self.lexer.original_text[state[2]:],
             )
             if "reserved name" in error.message and self._looks_like_function_header_text(header_text):
                 raise
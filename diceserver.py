@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+
+"""Line-delimited JSON evaluation server backed by warm dice sessions.
+
+Each request is one JSON object per line, for example
+`{"id": 1, "program": "d20 + 5", "bindings": {"bonus": 5}}`, where bindings
+are optional globals assigned before the program runs. Each response is one JSON object per line
+with the same id and either `"ok": true` and a `resultjson.serialize_result`
+payload, or `"ok": false` and a formatted diagnostic. The same protocol is
+served over stdin/stdout, a Unix socket or HTTP POST bodies.
+
+Requests run on a pool of `DiceSession`s that are reset to their preloaded
+state afterwards. Parsed imports, builtin result caches and shared values of
+closed subexpressions survive between requests, so repeated queries against
+the stdlib skip parsing and most evaluation."""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import queue
+import socketserver
+import sys
+import threading
+from time import perf_counter
+
+import dice
+from astcache import AST_CACHE
+from diagnostics import DiagnosticError, format_diagnostic
+from diceengine import Sweep, SweepValues
+from hostfunctions import RESULT_CACHE, EvaluationTimeout, evaluation_deadline
+from resultjson import resolve_probability_mode, serialize_result
+
+
+DEFAULT_POOL_SIZE = 4
+REQUEST_SOURCE_NAME = "<request>"
+
+
+class ServerRequestError(Exception):
+    """Raised for malformed server requests."""
+
+
+class WarmSession(object):
+    """A DiceSession that is reset to its preloaded state after each request."""
+
+    def __init__(self, session, preload=()):
+        self.session = session
+        for source in preload:
+            session(source)
+        interpreter = session.interpreter
+        self._baseline = (
+            dict(interpreter.global_scope),
+            dict(interpreter.callable_scope),
+            set(interpreter.imported_files),
+            dict(interpreter._compiled),
+            dict(interpreter._closed_keys),
+            dict(interpreter._split_plans),
+            dict(interpreter._split_lowerings),
+        )
+
+    def evaluate(self, text, bindings=None):
+        interpreter = self.session.interpreter
+        outputs = []
+        interpreter.output_callback = outputs.append
+        on_main_thread = threading.current_thread() is threading.main_thread()
+        try:
+            for name, value in (bindings or {}).items():
+                if isinstance(value, list):
+                    # Lists bind as a named sweep over their values.
+                    value = Sweep.from_values(SweepValues(value, name=name))
+                self.session.assign(name, value)
+            if on_main_thread:
+                result = dice.interpret_statement(
+                    text,
+                    interpreter=interpreter,
+                    current_dir=self.session.current_dir,
+                    source_name=REQUEST_SOURCE_NAME,
+                    jobs=self.session.jobs,
+                )
+            else:
+                # The timeout alarm is a signal, which only the main thread
+                # can arm, so threaded listeners stop at the interpreter's
+                # next safe point after the deadline instead.
+                with evaluation_deadline(dice.timeout_seconds):
+                    result = dice._interpret_ast(
+                        dice._parse_command(text, REQUEST_SOURCE_NAME),
+                        interpreter=interpreter,
+                        current_dir=self.session.current_dir,
+                        jobs=self.session.jobs,
+                    )
+            return result, outputs, list(interpreter.warnings)
+        finally:
+            interpreter.output_callback = None
+            self.reset()
+
+    def reset(self):
+        interpreter = self.session.interpreter
+        global_scope, callable_scope, imported_files, compiled, closed_keys, split_plans, split_lowerings = self._baseline
+        if (
+            interpreter.global_scope.keys() != global_scope.keys()
+            or interpreter.callable_scope.keys() != callable_scope.keys()
+            or interpreter.imported_files != imported_files
+        ):
+            interpreter.global_scope = dict(global_scope)
+            interpreter.callable_scope = dict(callable_scope)
+            interpreter.imported_files = set(imported_files)
+            interpreter._invalidate_function_cache()
+        # Per-node caches hold on to the request's syntax tree, so they are
+        # trimmed back to the preloaded nodes.
+        if interpreter._compiled.keys() != compiled.keys() or interpreter._closed_keys.keys() != closed_keys.keys():
+            interpreter._compiled = dict(compiled)
+            interpreter._closed_keys = dict(closed_keys)
+        if interpreter._split_plans.keys() != split_plans.keys() or interpreter._split_lowerings.keys() != split_lowerings.keys():
+            interpreter._split_plans = dict(split_plans)
+            interpreter._split_lowerings = dict(split_lowerings)
+        interpreter.local_scopes = []
+        interpreter.call_stack = []
+        interpreter.import_stack = []
+
+
+class SessionPool(object):
+    """Answers requests on a fixed set of warm sessions."""
+
+    def __init__(self, session_factory, size=DEFAULT_POOL_SIZE, preload=(), roundlevel=0):
+        if size < 1:
+            raise ValueError("session pool size must be at least 1")
+        self.roundlevel = roundlevel
+        self.size = size
+        self.requests = 0
+        self._lock = threading.Lock()
+        # Most recently used first, so repeated queries land on the warmest session.
+        self._sessions = queue.LifoQueue()
+        for _ in range(size):
+            self._sessions.put(WarmSession(session_factory(), preload))
+
+    @contextmanager
+    def session(self):
+        warm_session = self._sessions.get()
+        try:
+            yield warm_session
+        finally:
+            self._sessions.put(warm_session)
+
+    def stats(self):
+        return {
+            "sessions": self.size,
+            "requests": self.requests,
+            "result_cache": RESULT_CACHE.stats(),
+            "ast_cache": AST_CACHE.stats(),
+        }
+
+    def handle(self, request):
+        """Return the response object for one decoded request."""
+        start = perf_counter()
+        request_id = request.get("id") if isinstance(request, dict) else None
+        try:
+            response = self._dispatch(request)
+        except DiagnosticError as error:
+            response = {"ok": False, "error": format_diagnostic(error)}
+        except EvaluationTimeout:
+            response = {"ok": False, "error": "error: request timed out after {} seconds".format(dice.timeout_seconds)}
+        except Exception as error:
+            response = {"ok": False, "error": "error: {}".format(error)}
+        with self._lock:
+            self.requests += 1
+        response = dict({"id": request_id}, **response)
+        response["elapsed_ms"] = round((perf_counter() - start) * 1000, 3)
+        return response
+
+    def handle_line(self, line):
+        """Return the JSON response line for one request line."""
+        try:
+            request = json.loads(line)
+        except ValueError as error:
+            response = {"id": None, "ok": False, "error": "error: invalid JSON request: {}".format(error)}
+        else:
+            response = self.handle(request)
+        return json.dumps(response)
+
+    def _dispatch(self, request):
+        if not isinstance(request, dict):
+            raise ServerRequestError("request must be a JSON object")
+        op = request.get("op", "eval")
+        if op == "stats":
+            return {"ok": True, "stats": self.stats()}
+        if op != "eval":
+            raise ServerRequestError("unknown op {!r}".format(op))
+        program = request.get("program")
+        if not isinstance(program, str):
+            raise ServerRequestError('"program" must be a string')
+        bindings = request.get("bindings", {})
+        if not isinstance(bindings, dict):
+            raise ServerRequestError('"bindings" must be a JSON object')
+        roundlevel = request.get("roundlevel", self.roundlevel)
+        with self.session() as warm_session:
+            result, outputs, warnings = warm_session.evaluate(program, bindings)
+            probability_mode = resolve_probability_mode(
+                request.get("probability_mode", warm_session.session.interpreter.executor.render_config.probability_mode),
+                json_output=True,
+            )
+        response = {
+            "ok": True,
+            "result": None if result is None else serialize_result(result, roundlevel, probability_mode=probability_mode),
+        }
+        if outputs:
+            response["output"] = [serialize_result(value, roundlevel, probability_mode=probability_mode) for value in outputs]
+        if warnings:
+            response["warnings"] = [format_diagnostic(warning) for warning in warnings]
+        return response
+
+
+def serve_stream(pool, input_stream, output_stream):
+    """Answer request lines from input_stream until it is exhausted."""
+    for line in input_stream:
+        if not line.strip():
+            continue
+        output_stream.write(pool.handle_line(line) + "\n")
+        output_stream.flush()
+
+
+class _UnixRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            self.wfile.write((self.server.pool.handle_line(line.decode("utf-8")) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class _HttpRequestHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8")
+        lines = [self.server.pool.handle_line(line) for line in body.splitlines() if line.strip()]
+        self._reply("\n".join(lines) + "\n")
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/stats":
+            self.send_error(404)
+            return
+        self._reply(json.dumps(self.server.pool.stats()) + "\n")
+
+    def _reply(self, text):
+        payload = text.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(pool, address):
+    """Return a listening server for "unix:PATH" or "http://HOST:PORT"."""
+    if address.startswith("unix:"):
+        if not hasattr(socketserver, "ThreadingUnixStreamServer"):
+            raise ServerRequestError("Unix sockets are not supported on this platform")
+        server = socketserver.ThreadingUnixStreamServer(address[len("unix:"):], _UnixRequestHandler)
+    elif address.startswith("http://"):
+        host, _, port = address[len("http://"):].rstrip("/").rpartition(":")
+        if not port.isdigit():
+            raise ServerRequestError("expected http://HOST:PORT, got {!r}".format(address))
+        server = ThreadingHTTPServer((host or "127.0.0.1", int(port)), _HttpRequestHandler)
+    else:
+        raise ServerRequestError('unknown server address {!r}; use "stdio", "unix:PATH" or "http://HOST:PORT"'.format(address))
+    server.daemon_threads = True
+    server.pool = pool
+    return server
+
+
+def serve(address, pool):
+    """Serve pool on address until stdin closes or the process is interrupted."""
+    if address == "stdio":
+        serve_stream(pool, sys.stdin, sys.stdout)
+        return 0
+    server = make_server(pool, address)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if address.startswith("unix:"):
+            try:
+                os.unlink(address[len("unix:"):])
+            except OSError:
+                pass
+    return 0
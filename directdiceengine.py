@@ -2,7 +2,8 @@
 
 """Sampling-based reference executor and stochastic validation helpers."""
 
-from collections import defaultdict
+from collections import Counter, defaultdict
+from dataclasses import dataclass
 import random
 import time
 
@@ -23,7 +24,34 @@ from diceengine import (
 from diceparser import DiceParser
 from executor import ExactExecutor, Executor
 from interpreter import Interpreter
-from lexer import Lexer
+from lexer import (
+    ADV,
+    CARET,
+    DIS,
+    DIV,
+    ELSE,
+    EQUAL,
+    FLOORDIV,
+    GREATER,
+    GREATER_OR_EQUAL,
+    ID,
+    LESS,
+    LESS_OR_EQUAL,
+    Lexer,
+    MINUS,
+    MUL,
+    PLUS,
+    RES,
+    ROLL,
+)
+
+
+# Operators the batch backend evaluates sample by sample. A split may bind its
+# name to a whole batch only if the bound value reaches nothing else.
+_ELEMENTWISE_BINARY_OPS = frozenset(
+    (PLUS, MINUS, MUL, DIV, FLOORDIV, ROLL, GREATER_OR_EQUAL, LESS_OR_EQUAL, GREATER, LESS, EQUAL, RES)
+)
+_ELEMENTWISE_UNARY_OPS = frozenset((ROLL, ADV, DIS, MINUS))
 
 
 class SampledDistrib(Distrib):
@@ -38,8 +66,95 @@ def _degenerate(outcome):
     return Distrib({outcome: 1})
 
 
+@dataclass(frozen=True, eq=False)
+class _Recipe:
+    """How to draw an unaligned batch again: operation(*inputs).
+
+    Inputs that are unaligned batches themselves are stored as their own
+    recipes, so a recipe keeps no sample arrays alive. Recipes compare by
+    identity: an input shared by several operations is drawn once per replay.
+    """
+
+    operation: object
+    inputs: tuple
+
+
+class SampleBatch(Distrib):
+    """A batch of independent samples of one cell.
+
+    The distribution entries are the empirical histogram of the batch, so
+    generic exact operations still see a valid distribution. Sample positions
+    are aligned across batches of the same run: position i of every batch
+    belongs to the same simulated execution. `valid` marks positions that were
+    not filtered out by `res`; filtered positions count as a None outcome, as
+    in the one-sample backend.
+
+    `alignment` names the vectorized split bindings the samples are tied to.
+    An unaligned batch is an ordinary random variable and is redrawn on every
+    reference; an aligned one must keep its positions. `_recipe` replays the
+    operations that produced the batch to draw it again.
+    """
+
+    @classmethod
+    def _from_samples(cls, numpy, samples, valid=None, exact=None, alignment=frozenset(), recipe=None):
+        count = len(samples)
+        if valid is not None and valid.all():
+            valid = None
+        kept = samples if valid is None else samples[valid]
+        span = int(kept.max()) - int(kept.min()) + 1 if kept.dtype.kind in "iu" and len(kept) else 0
+        if valid is None and 0 < span <= max(4 * count, 256):
+            # Integer batches are histogrammed straight into the dense
+            # offset + weights form used by the exact engine.
+            offset = int(kept.min())
+            weights = tuple((numpy.bincount(kept - offset, minlength=span) / count).tolist())
+            instance = cls._from_dense(offset, weights)
+        else:
+            instance = cls.__new__(cls)
+            if kept.dtype == object:
+                counted = Counter(kept.tolist())
+            else:
+                outcomes, counts = numpy.unique(kept, return_counts=True)
+                counted = dict(zip(outcomes.tolist(), counts.tolist()))
+            entries = [(outcome, occurrences / count) for outcome, occurrences in counted.items()]
+            if valid is not None:
+                entries.append((None, (count - len(kept)) / count))
+            Distrib.__init__(instance, entries)
+        object.__setattr__(instance, "samples", samples)
+        object.__setattr__(instance, "valid", valid)
+        object.__setattr__(instance, "_exact", exact)
+        object.__setattr__(instance, "alignment", alignment)
+        object.__setattr__(instance, "_recipe", recipe)
+        return instance
+
+    def _realigned(self, samples, valid, alignment):
+        instance = SampleBatch.__new__(SampleBatch)
+        for name, value in vars(self).items():
+            object.__setattr__(instance, name, value)
+        object.__setattr__(instance, "samples", samples)
+        object.__setattr__(instance, "valid", valid)
+        object.__setattr__(instance, "alignment", alignment)
+        return instance
+
+    # Two batches with the same histogram are still different random
+    # variables, so batches compare and hash by identity. This keeps function
+    # caches from substituting one batch for another.
+    __eq__ = object.__eq__
+    __hash__ = object.__hash__
+
+    @property
+    def exact(self):
+        exact = self._exact
+        if callable(exact):
+            exact = exact()
+            object.__setattr__(self, "_exact", exact)
+        if exact is None:
+            exact = Distrib(self.entries)
+            object.__setattr__(self, "_exact", exact)
+        return exact
+
+
 def _exact_of(distrib):
-    return distrib.exact if isinstance(distrib, SampledDistrib) else distrib
+    return distrib.exact if isinstance(distrib, (SampledDistrib, SampleBatch)) else distrib
 
 
 def _exactify(value):
@@ -82,11 +197,13 @@ def _repeat_sum_with_linear(add_function, count, value):
         repeated_sweep = diceengine._coerce_value_to_sweep(repeated)
         count_selection = diceengine._fixed_axis_distribution(count_sweep.axes, count_coordinates)
         combined_axes = diceengine._union_axes([count_selection, repeated_sweep])
+        selected = diceengine._projected_cell_getter(count_sweep.axes, {count_coordinates: 1}, combined_axes, 0)
+        get_repeated = diceengine._cell_projector(repeated_sweep, combined_axes)
         cells = {}
         for coordinates in diceengine._coordinates_space(combined_axes):
-            if diceengine._lookup_projected(count_sweep.axes, {count_coordinates: 1}, combined_axes, coordinates, 0) != 1:
+            if selected(coordinates) != 1:
                 continue
-            cells[coordinates] = repeated_sweep.lookup(combined_axes, coordinates)
+            cells[coordinates] = get_repeated(coordinates)
         contributions.append((combined_axes, cells))
     if not contributions:
         return 0
@@ -100,6 +217,9 @@ def _repeat_sum_with_linear(add_function, count, value):
 class DirectExecutor(ExactExecutor):
     """Sampling backend mirroring the exact executor one execution at a time."""
 
+    # Every call draws fresh samples, so function results must not be reused.
+    is_exact = False
+
     def __init__(self, seed=None, rng=None):
         self.rng = rng if rng is not None else random.Random(seed)
         super().__init__()
@@ -146,10 +266,12 @@ class DirectExecutor(ExactExecutor):
         left_sweep = diceengine._coerce_to_distributions(left)
         right_sweep = diceengine._coerce_to_measure_sweep(right)
         combined_axes = diceengine._union_axes([left_sweep, right_sweep])
+        get_left = diceengine._cell_projector(left_sweep, combined_axes)
+        get_right = diceengine._cell_projector(right_sweep, combined_axes)
         cells = {}
         for coordinates in diceengine._coordinates_space(combined_axes):
-            left_cell = left_sweep.lookup(combined_axes, coordinates)
-            right_cell = right_sweep.lookup(combined_axes, coordinates)
+            left_cell = get_left(coordinates)
+            right_cell = get_right(coordinates)
             exact = _exact_call(diceengine.member, _exact_of(left_cell), right_cell)
             sampled_value = next(iter(_sample_from_distribution(exact, self.rng).keys()), None)
             cells[coordinates] = _sampled_result(sampled_value, exact)
@@ -423,6 +545,664 @@ class DirectExecutor(ExactExecutor):
         )
 
 
+class BatchDirectExecutor(DirectExecutor):
+    """Sampling backend evaluating one execution over a batch of samples.
+
+    Every random cell is a SampleBatch holding `samples` aligned draws, so a
+    program is interpreted once per batch instead of once per sample. Exact
+    leaf distributions are drawn by vectorized inverse-CDF lookups. Requires
+    NumPy.
+    """
+
+    def __init__(self, samples, seed=None, rng=None):
+        numpy = diceengine._optional_module("numpy")
+        if numpy is None:
+            raise DiceRuntimeError("batch sampling requires NumPy")
+        if samples <= 0:
+            raise DiceRuntimeError("batch sampling expects a positive sample count")
+        self.numpy = numpy
+        self.samples = samples
+        self._sampling_tables = {}
+        self._elementwise_splits = {}
+        super().__init__(rng=rng if rng is not None else numpy.random.default_rng(seed))
+
+    def _outcome_array(self, outcomes):
+        outcomes = list(outcomes)
+        if all(type(outcome) is int for outcome in outcomes) and all(abs(outcome) < 2**62 for outcome in outcomes):
+            return self.numpy.array(outcomes, dtype=self.numpy.int64)
+        if all(type(outcome) in (int, float) for outcome in outcomes):
+            return self.numpy.array(outcomes, dtype=self.numpy.float64)
+        # Filled element by element so tuple-like outcomes stay scalars.
+        array = self.numpy.empty(len(outcomes), dtype=object)
+        for index, outcome in enumerate(outcomes):
+            array[index] = outcome
+        return array
+
+    def _draw(self, distrib):
+        distrib = diceengine._coerce_to_distribution_cell(distrib)
+        table = self._sampling_tables.get(distrib)
+        if table is None:
+            outcomes = self._outcome_array(distrib.keys())
+            cumulative = self.numpy.cumsum(self.numpy.array(distrib.weights(), dtype=self.numpy.float64))
+            table = (outcomes, cumulative)
+            self._sampling_tables[distrib] = table
+        outcomes, cumulative = table
+        if len(outcomes) == 1:
+            return self.numpy.repeat(outcomes, self.samples)
+        thresholds = self.rng.random(self.samples) * cumulative[-1]
+        indexes = self.numpy.searchsorted(cumulative, thresholds, side="right")
+        self.numpy.minimum(indexes, len(outcomes) - 1, out=indexes)
+        return outcomes[indexes]
+
+    def _arrays(self, cell):
+        if isinstance(cell, SampleBatch):
+            return cell.samples, cell.valid
+        return self._draw(cell), None
+
+    def _batch(self, samples, valid=None, exact=None, alignment=frozenset(), recipe=None):
+        return SampleBatch._from_samples(self.numpy, samples, valid, exact, alignment, recipe)
+
+    def _recipe(self, operation, cells):
+        return _Recipe(
+            operation,
+            tuple(
+                cell._recipe
+                if isinstance(cell, SampleBatch) and not cell.alignment and cell._recipe is not None
+                else cell
+                for cell in cells
+            ),
+        )
+
+    def _exact_draw(self, exact):
+        return self._batch(self._draw(exact), exact=exact, recipe=_Recipe(self._exact_draw, (exact,)))
+
+    def _alignment(self, cells):
+        alignment = frozenset()
+        for cell in cells:
+            if isinstance(cell, SampleBatch):
+                alignment |= cell.alignment
+        return alignment
+
+    def redraw(self, value):
+        # Every reference to a distribution is an independent draw in the
+        # exact semantics, so unaligned batches are drawn again from scratch.
+        if isinstance(value, SampleBatch):
+            if value.alignment:
+                return value
+            return self._replay(value)
+        if isinstance(value, Sweep) and any(isinstance(cell, SampleBatch) for cell in value.cells.values()):
+            return Sweep(value.axes, {coordinates: self.redraw(cell) for coordinates, cell in value.cells.items()})
+        return value
+
+    def _replay(self, batch):
+        # Recipes grow with the program (x ^ 1000 chains one addition per
+        # summand), so they are replayed bottom-up with an explicit stack.
+        fresh = {}
+
+        def replayed(item):
+            if isinstance(item, _Recipe):
+                return fresh[id(item)]
+            if isinstance(item, SampleBatch) and not item.alignment:
+                # Batches merged back from a split have no recipe; they are
+                # resampled with replacement, which still gives independent
+                # draws from their empirical distribution.
+                if id(item) not in fresh:
+                    order = self.rng.integers(0, self.samples, size=self.samples)
+                    fresh[id(item)] = item._realigned(
+                        item.samples[order], None if item.valid is None else item.valid[order], item.alignment
+                    )
+                return fresh[id(item)]
+            return item
+
+        root = batch._recipe if batch._recipe is not None else batch
+        stack = [root]
+        while stack:
+            recipe = stack[-1]
+            if not isinstance(recipe, _Recipe) or id(recipe) in fresh:
+                stack.pop()
+                continue
+            pending = [item for item in recipe.inputs if isinstance(item, _Recipe) and id(item) not in fresh]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            fresh[id(recipe)] = recipe.operation(*[replayed(item) for item in recipe.inputs])
+        return replayed(root)
+
+    def _combined_valid(self, valids):
+        combined = None
+        for valid in valids:
+            if valid is None:
+                continue
+            combined = valid if combined is None else combined & valid
+        return combined
+
+    def _lift_arrays(self, operation, exact_operation, *values, pure=False):
+        def apply(*cells):
+            arrays = [self._arrays(cell) for cell in cells]
+            valid = self._combined_valid(valid for _, valid in arrays)
+            samples, valid = operation(valid, *[samples for samples, _ in arrays])
+            exact = None
+            if exact_operation is not None:
+                exact = lambda: exact_operation(*[_exact_of(cell) for cell in cells])
+            return self._batch(samples, valid, exact, self._alignment(cells), self._recipe(apply, cells))
+
+        # Pure operations only transform existing samples, so cells that share
+        # their operands can share the result; rolls draw fresh samples per cell.
+        return diceengine._lift_cellwise(apply, *values, pure=pure)
+
+    def _lift_elementwise(self, function, exact_function, *values):
+        return self._lift_arrays(
+            lambda valid, *arrays: (function(*arrays), valid),
+            None if exact_function is None else lambda *cells: _exact_call(exact_function, *cells),
+            *values,
+            pure=True,
+        )
+
+    def _lift_exact_draw(self, exact_function, value, *extra):
+        # Summary operations are deterministic functions of the exact cell;
+        # the batch is drawn from that exact result.
+        def apply(*cells):
+            return self._exact_draw(exact_function(*cells))
+
+        return diceengine._lift_cellwise(apply, value, *extra)
+
+    def _comparison(self, function, exact_function, left, right):
+        numpy = self.numpy
+        return self._lift_elementwise(
+            lambda a, b: numpy.where(function(a, b), TRUE, FALSE),
+            exact_function,
+            left,
+            right,
+        )
+
+    def _checked_divisor(self, valid, divisor):
+        zero = divisor == 0
+        if valid is not None:
+            zero &= valid
+        if self.numpy.any(zero):
+            diceengine.runtime_error("can't divide by zero")
+        return self.numpy.where(divisor == 0, 1, divisor)
+
+    def _grouped_draws(self, valid, parameters, draw):
+        # Dice counts and sides are usually constant across a batch; when they
+        # vary, samples are grouped by their distinct parameter tuples.
+        numpy = self.numpy
+        result = numpy.zeros(self.samples, dtype=numpy.int64)
+        stacked = numpy.stack([numpy.asarray(parameter) for parameter in parameters], axis=1)
+        if valid is not None:
+            stacked = numpy.where(valid[:, None], stacked, stacked[numpy.argmax(valid)] if valid.any() else 1)
+        if (stacked == stacked[0]).all():
+            groups, inverse = stacked[:1], None
+        else:
+            groups, inverse = numpy.unique(stacked, axis=0, return_inverse=True)
+            inverse = inverse.reshape(-1)
+        for group_index, group in enumerate(groups.tolist()):
+            if any(int(value) != value for value in group):
+                diceengine.runtime_error("roll expects integer dice counts and sides")
+            if inverse is None:
+                return draw(self.samples, *[int(value) for value in group])
+            mask = inverse == group_index
+            result[mask] = draw(int(mask.sum()), *[int(value) for value in group])
+        return result
+
+    def _integers(self, count, dice_count, sides):
+        if dice_count < 0 or sides <= 0:
+            diceengine.runtime_error("roll expects positive sides and a non-negative dice count")
+        return self.rng.integers(1, sides + 1, size=(count, dice_count))
+
+    def member(self, left, right):
+        return self._lift_exact_draw(
+            lambda left_cell, right_cell: _exact_call(diceengine.member, _exact_of(left_cell), right_cell),
+            left,
+            right,
+        )
+
+    def res(self, condition, distrib):
+        return self._lift_arrays(
+            lambda valid, condition_samples, samples: (
+                samples,
+                condition_samples == TRUE if valid is None else valid & (condition_samples == TRUE),
+            ),
+            lambda cond, dist: _exact_call(diceengine.res, cond, dist),
+            condition,
+            distrib,
+            pure=True,
+        )
+
+    def mean(self, value):
+        return self._lift_exact_draw(lambda cell: _exact_call(diceengine.mean, _exact_of(cell)), value)
+
+    def mass(self, value):
+        return self._lift_exact_draw(lambda cell: _exact_call(diceengine.mass, _exact_of(cell)), value)
+
+    def var(self, value):
+        return self._lift_exact_draw(lambda cell: _exact_call(diceengine.var, _exact_of(cell)), value)
+
+    def std(self, value):
+        return self._lift_exact_draw(lambda cell: _exact_call(diceengine.std, _exact_of(cell)), value)
+
+    def sample(self, value):
+        return self._lift_exact_draw(lambda cell: _exact_of(diceengine._coerce_to_distribution_cell(cell)), value)
+
+    def reselse(self, condition, distrib_if, distrib_else):
+        numpy = self.numpy
+
+        def apply(*cells):
+            (condition_samples, condition_valid), (if_samples, if_valid), (else_samples, else_valid) = [
+                self._arrays(cell) for cell in cells
+            ]
+            chosen = condition_samples == TRUE
+            valid = None
+            if if_valid is not None or else_valid is not None:
+                valid = numpy.where(
+                    chosen,
+                    True if if_valid is None else if_valid,
+                    True if else_valid is None else else_valid,
+                )
+            valid = self._combined_valid((condition_valid, valid))
+            exact = lambda: _exact_call(diceengine.reselse, *[_exact_of(cell) for cell in cells])
+            return self._batch(
+                numpy.where(chosen, if_samples, else_samples),
+                valid,
+                exact,
+                self._alignment(cells),
+                self._recipe(apply, cells),
+            )
+
+        return diceengine._lift_cellwise(apply, condition, distrib_if, distrib_else)
+
+    def roll(self, n, s):
+        return self._lift_arrays(
+            lambda valid, counts, sides: (
+                self._grouped_draws(
+                    valid,
+                    (counts, sides),
+                    lambda size, dice_count, dice_sides: self._integers(size, dice_count, dice_sides).sum(axis=1),
+                ),
+                valid,
+            ),
+            lambda left, right: _exact_call(diceengine.roll, left, right),
+            n,
+            s,
+        )
+
+    def _roll_die(self, dice, exact_function, count, reduce):
+        def apply(cell):
+            if not isinstance(cell, SampleBatch):
+                return self._exact_draw(_exact_call(exact_function, cell))
+            samples = self._grouped_draws(
+                cell.valid,
+                (cell.samples,),
+                lambda size, sides: reduce(self._integers(size, count, sides), axis=1),
+            )
+            return self._batch(
+                samples,
+                cell.valid,
+                lambda: _exact_call(exact_function, _exact_of(cell)),
+                cell.alignment,
+                self._recipe(apply, (cell,)),
+            )
+
+        return diceengine._lift_cellwise(apply, dice)
+
+    def rollsingle(self, dice):
+        return self._roll_die(dice, diceengine.rollsingle, 1, self.numpy.sum)
+
+    def rolladvantage(self, dice):
+        return self._roll_die(dice, diceengine.rolladvantage, 2, self.numpy.max)
+
+    def rolldisadvantage(self, dice):
+        return self._roll_die(dice, diceengine.rolldisadvantage, 2, self.numpy.min)
+
+    def _roll_keep(self, n, s, keep, opname, highest, exact_function):
+        def draw(size, dice_count, sides, keep_count):
+            _require_keep_count(dice_count, keep_count, opname)
+            rolls = self.numpy.sort(self._integers(size, dice_count, sides), axis=1)
+            kept = rolls[:, dice_count - keep_count:] if highest else rolls[:, :keep_count]
+            return kept.sum(axis=1)
+
+        return self._lift_arrays(
+            lambda valid, counts, sides, keeps: (self._grouped_draws(valid, (counts, sides, keeps), draw), valid),
+            lambda left, middle, right: _exact_call(exact_function, left, middle, right),
+            n,
+            s,
+            keep,
+        )
+
+    def rollhigh(self, n, s, nh):
+        return self._roll_keep(n, s, nh, "rollhigh", True, diceengine.rollhigh)
+
+    def rolllow(self, n, s, nl):
+        return self._roll_keep(n, s, nl, "rolllow", False, diceengine.rolllow)
+
+    def repeat_sum(self, count, value):
+        # Every summand is an independent draw of value, not the same batch
+        # added to itself.
+        return _repeat_sum_with_linear(lambda total, addend: self.add(total, self.redraw(addend)), count, value)
+
+    def add(self, left, right):
+        return self._lift_elementwise(self.numpy.add, diceengine.add, left, right)
+
+    def sub(self, left, right):
+        return self._lift_elementwise(self.numpy.subtract, diceengine.sub, left, right)
+
+    def mul(self, left, right):
+        return self._lift_elementwise(self.numpy.multiply, diceengine.mul, left, right)
+
+    def div(self, left, right):
+        return self._lift_arrays(
+            lambda valid, a, b: (self.numpy.true_divide(a, self._checked_divisor(valid, b)), valid),
+            lambda l, r: _exact_call(diceengine.div, l, r),
+            left,
+            right,
+            pure=True,
+        )
+
+    def floordiv(self, left, right):
+        return self._lift_arrays(
+            lambda valid, a, b: (self.numpy.floor_divide(a, self._checked_divisor(valid, b)), valid),
+            lambda l, r: _exact_call(diceengine.floordiv, l, r),
+            left,
+            right,
+            pure=True,
+        )
+
+    def neg(self, value):
+        return self._lift_elementwise(self.numpy.negative, diceengine.neg, value)
+
+    def greaterorequal(self, left, right):
+        return self._comparison(self.numpy.greater_equal, diceengine.greaterorequal, left, right)
+
+    def greater(self, left, right):
+        return self._comparison(self.numpy.greater, diceengine.greater, left, right)
+
+    def equal(self, left, right):
+        return self._comparison(self.numpy.equal, diceengine.equal, left, right)
+
+    def lessorequal(self, left, right):
+        return self._comparison(self.numpy.less_equal, diceengine.lessorequal, left, right)
+
+    def less(self, left, right):
+        return self._comparison(self.numpy.less, diceengine.less, left, right)
+
+    def split_samples(self, interpreter, node, matched_value):
+        # Vectorized counterpart of Interpreter._evaluate_split. Instead of
+        # weighting each bound outcome by its probability, every clause
+        # selects the sample positions where the bound value took that outcome
+        # and the guard held; result samples are copied into those positions.
+        # When the bound name is only used elementwise, it is bound to the
+        # whole batch and each clause is evaluated once.
+        contributions = []
+        binding = object()
+        elementwise = self._split_is_elementwise(interpreter, node)
+        for matched_coordinates, matched_cell in matched_value.items():
+            for outcome, outcome_mask in self._split_bindings(matched_cell, elementwise, binding):
+                interpreter.local_scopes.append({node.name.value: outcome})
+                try:
+                    remaining_axes = matched_value.axes
+                    remaining_cells = {matched_coordinates: outcome_mask}
+                    for clause in node.clauses:
+                        condition_value = None
+                        if not clause.otherwise:
+                            condition_value = diceengine._coerce_value_to_sweep(interpreter.visit(clause.condition))
+                        result_value = diceengine._coerce_value_to_sweep(interpreter.visit(clause.result))
+                        operands = [Sweep(remaining_axes, {coordinates: 1 for coordinates in remaining_cells}), result_value]
+                        if condition_value is not None:
+                            operands.append(condition_value)
+                        clause_axes = diceengine._union_axes(operands)
+                        get_remaining = diceengine._projected_cell_getter(remaining_axes, remaining_cells, clause_axes)
+                        get_result = diceengine._cell_projector(result_value, clause_axes)
+                        get_condition = (
+                            diceengine._cell_projector(condition_value, clause_axes) if condition_value is not None else None
+                        )
+                        clause_cells = {}
+                        next_remaining = {}
+                        for coordinates in diceengine._coordinates_space(clause_axes):
+                            remaining = get_remaining(coordinates)
+                            if remaining is None or not remaining.any():
+                                continue
+                            matched = remaining
+                            if get_condition is not None:
+                                condition_samples, condition_valid = self._arrays(get_condition(coordinates))
+                                truth = condition_samples == TRUE
+                                falsity = condition_samples == FALSE
+                                decided = remaining if condition_valid is None else remaining & condition_valid
+                                invalid = decided & ~(truth | falsity)
+                                if invalid.any():
+                                    interpreter.exception(
+                                        "split guards must evaluate to Bernoulli outcomes 0 or 1, got {}".format(
+                                            sorted(set(condition_samples[invalid].tolist()), key=repr)
+                                        ),
+                                        node=clause.condition,
+                                        hint="Use a comparison like 'roll >= 15' or convert each guard to 0 or 1.",
+                                    )
+                                matched = decided & truth
+                                unmatched = decided & falsity
+                                if unmatched.any():
+                                    next_remaining[coordinates] = unmatched
+                            if matched.any():
+                                result_cell = get_result(coordinates)
+                                clause_cells[coordinates] = (
+                                    (matched,) + self._arrays(result_cell) + (self._alignment((result_cell, matched_cell)),)
+                                )
+                        contributions.append((clause_axes, clause_cells))
+                        if clause.otherwise:
+                            remaining_cells = {}
+                            break
+                        remaining_axes = clause_axes
+                        remaining_cells = next_remaining
+
+                    if remaining_cells:
+                        interpreter.exception(
+                            "split expression left unmatched cases for {}".format(node.name.value),
+                            node=node,
+                            hint="Add an 'otherwise -> ...' clause to cover the remaining cases.",
+                        )
+                finally:
+                    interpreter.local_scopes.pop()
+        return self._merge_split_contributions(contributions, binding)
+
+    def _split_bindings(self, matched_cell, elementwise, binding):
+        numpy = self.numpy
+        samples, valid = self._arrays(matched_cell)
+        if elementwise and isinstance(matched_cell, SampleBatch):
+            # The bound batch is tied to this split's positions until the
+            # clause results are merged back.
+            bound = matched_cell._realigned(samples, valid, matched_cell.alignment | {binding})
+            yield bound, numpy.ones(self.samples, dtype=bool) if valid is None else valid
+            return
+        kept = samples if valid is None else samples[valid]
+        outcomes = dict.fromkeys(kept.tolist()) if kept.dtype == object else numpy.unique(kept).tolist()
+        for outcome in outcomes:
+            mask = samples == outcome
+            if valid is not None:
+                mask &= valid
+            yield outcome, mask
+
+    def _split_is_elementwise(self, interpreter, node):
+        verdict = self._elementwise_splits.get(id(node))
+        if verdict is None:
+            names = frozenset((node.name.value,))
+            verdict = all(
+                (clause.otherwise or self._elementwise_uses(interpreter, clause.condition, names, names, frozenset()))
+                and self._elementwise_uses(interpreter, clause.result, names, names, frozenset())
+                for clause in node.clauses
+            )
+            self._elementwise_splits[id(node)] = verdict
+        return verdict
+
+    def _is_fixed(self, node, fixed):
+        # Deterministic given the fixed names: these values may be referenced
+        # any number of times without correlating independent draws.
+        kind = type(node).__name__
+        if kind == "Val":
+            return node.token.type != ID or node.value in fixed
+        if kind == "BinOp":
+            return (
+                node.op.type in _ELEMENTWISE_BINARY_OPS
+                and node.op.type not in (ROLL, RES)
+                and self._is_fixed(node.left, fixed)
+                and self._is_fixed(node.right, fixed)
+            )
+        if kind == "UnOp":
+            return node.op.type == MINUS and self._is_fixed(node.value, fixed)
+        return False
+
+    def _references(self, node, name):
+        if node is None:
+            return 0
+        count = 1 if type(node).__name__ == "Val" and node.token.type == ID and node.value == name else 0
+        for value in getattr(node, "__dict__", {}).values():
+            for item in value if isinstance(value, list) else (value,):
+                count += self._references(item, name)
+        return count
+
+    def _rebinds(self, name, value_node, region, tainted, fixed, interpreter):
+        # Returns the (tainted, fixed) name sets after binding name to
+        # value_node, or None when a tainted random value would be referenced
+        # more than once in region. Each exact reference is an independent
+        # draw, which aligned samples cannot reproduce.
+        if not interpreter._identifier_names(value_node) & tainted:
+            return tainted - {name}, fixed - {name}
+        if self._is_fixed(value_node, fixed):
+            return tainted | {name}, fixed | {name}
+        if self._references(region, name) > 1:
+            return None
+        return tainted | {name}, fixed - {name}
+
+    def _elementwise_uses(self, interpreter, node, tainted, fixed, active):
+        # Conservative check that every use of a tainted name below node is
+        # evaluated sample by sample; taint follows arguments into dice-language
+        # function bodies and local assignments.
+        def depends(child):
+            return bool(interpreter._identifier_names(child) & tainted)
+
+        def uses(child, child_tainted=tainted, child_fixed=fixed, child_active=active):
+            return self._elementwise_uses(interpreter, child, child_tainted, child_fixed, child_active)
+
+        if node is None or not depends(node):
+            return True
+        kind = type(node).__name__
+        if kind == "Val":
+            return True
+        if kind == "BinOp":
+            if node.op.type in _ELEMENTWISE_BINARY_OPS:
+                return uses(node.left) and uses(node.right)
+            if node.op.type == CARET:
+                # repeat_sum needs a deterministic count, and aligned random
+                # summands cannot be redrawn.
+                return not depends(node.right) and (not depends(node.left) or self._is_fixed(node.left, fixed))
+            return False
+        if kind == "UnOp":
+            return node.op.type in _ELEMENTWISE_UNARY_OPS and uses(node.value)
+        if kind == "TenOp":
+            if not (uses(node.left) and uses(node.middle)):
+                return False
+            if node.op1.type == RES and node.op2.type == ELSE:
+                rebound = self._rebinds("@", node.middle, node.right, tainted, fixed, interpreter)
+                return rebound is not None and uses(node.right, *rebound)
+            return uses(node.right)
+        if kind == "Split":
+            if not uses(node.value):
+                return False
+            # A split-bound name is one outcome per branch, never a fresh draw.
+            if depends(node.value):
+                inner = (tainted | {node.name.value}, fixed | {node.name.value})
+            else:
+                inner = (tainted - {node.name.value}, fixed - {node.name.value})
+            return all(
+                (clause.otherwise or uses(clause.condition, *inner)) and uses(clause.result, *inner)
+                for clause in node.clauses
+            )
+        if kind == "Call":
+            entry = interpreter.callable_scope.get(node.name.value)
+            if entry is None or entry.name in active:
+                return False
+            body_tainted = frozenset()
+            body_fixed = frozenset()
+            for index, arg in enumerate(node.args):
+                if not depends(arg.value):
+                    continue
+                if not uses(arg.value):
+                    return False
+                if arg.name is not None:
+                    name = arg.name.value
+                elif index < len(entry.parameters):
+                    name = entry.parameters[index].name
+                else:
+                    return False
+                rebound = self._rebinds(name, arg.value, entry.node.body, tainted, fixed, interpreter)
+                if rebound is None:
+                    return False
+                body_tainted |= rebound[0] & {name}
+                body_fixed |= rebound[1] & {name}
+            return uses(entry.node.body, body_tainted, body_fixed, active | {entry.name})
+        if kind == "BlockBody":
+            for index, statement in enumerate(node.statements):
+                if not uses(statement.value):
+                    return False
+                region = list(node.statements[index + 1:]) + [node.result]
+                rebound = self._rebinds(statement.name.value, statement.value, region, tainted, fixed, interpreter)
+                if rebound is None:
+                    return False
+                tainted, fixed = rebound
+            return uses(node.result)
+        return False
+
+    def _merge_split_contributions(self, contributions, binding):
+        numpy = self.numpy
+        # Clauses that claimed no samples still contribute their axes, as in
+        # the exact split.
+        combined_axes = diceengine._union_axes([Sweep(axes, cells) for axes, cells in contributions])
+        getters = [
+            diceengine._projected_cell_getter(axes, cells, combined_axes)
+            for axes, cells in contributions
+            if cells
+        ]
+        merged_cells = {}
+        for coordinates in diceengine._coordinates_space(combined_axes):
+            samples = None
+            covered = numpy.zeros(self.samples, dtype=bool)
+            valid = numpy.zeros(self.samples, dtype=bool)
+            alignment = frozenset()
+            for get_contribution in getters:
+                projected = get_contribution(coordinates)
+                if projected is None:
+                    continue
+                mask, result_samples, result_valid, result_alignment = projected
+                samples = result_samples if samples is None else numpy.where(mask, result_samples, samples)
+                valid |= mask if result_valid is None else mask & result_valid
+                covered |= mask
+                alignment |= result_alignment
+            if samples is None:
+                merged_cells[coordinates] = 0
+                continue
+            # Positions no clause claimed were dropped by a partial guard, the
+            # sampled counterpart of mass missing from an exact split. Once
+            # merged, the result no longer depends on this split's binding.
+            merged_cells[coordinates] = self._batch(samples, valid & covered, alignment=alignment - {binding})
+        return Sweep(combined_axes, merged_cells)
+
+
+class BatchInterpreter(Interpreter):
+    """Interpreter front end for BatchDirectExecutor.
+
+    Name lookups redraw sample batches, because every reference to a
+    distribution is an independent draw, and split is evaluated over sample
+    masks by the executor.
+    """
+
+    def visit_Val(self, node):
+        value = super().visit_Val(node)
+        if node.token.type != ID:
+            return value
+        return self.executor.redraw(value)
+
+    def _evaluate_split(self, node, matched_value):
+        return self.executor.split_samples(self, node, matched_value)
+
+
 def _parse_text(text):
     parser = DiceParser(Lexer(text))
     return parser.parse() if (";" in text or "\n" in text) else parser.statement()
@@ -445,13 +1225,21 @@ def direct_sample(text, seed=None):
     return Interpreter(ast, executor=executor).interpret()
 
 
-def _accumulate_sample_counts(counts, sampled, samples_seen):
+def direct_sample_batch(text, samples, seed=None):
+    _reset_sweeps()
+    ast = _parse_text(text)
+    executor = BatchDirectExecutor(samples, seed=seed)
+    return BatchInterpreter(ast, executor=executor).interpret()
+
+
+def _accumulate_sample_counts(counts, sampled, samples_seen, batch_samples=1):
+    sampled = diceengine._coerce_value_to_sweep(sampled)
     if counts["axes"] is None:
         counts["axes"] = sampled.axes
     for coordinates, distrib in sampled.cells.items():
         cell_counts = counts["cells"][coordinates]
         for outcome, probability in distrib.items():
-            cell_counts[outcome] += probability
+            cell_counts[outcome] += probability * batch_samples
     counts["samples"] = samples_seen
 
 
@@ -466,6 +1254,8 @@ def _normalize_counts(counts):
 
 
 def distribution_metrics(expected, empirical):
+    expected = diceengine._coerce_to_distributions(expected)
+    empirical = diceengine._coerce_to_distributions(empirical)
     max_abs = 0
     l1 = 0
     all_coordinates = set(expected.cells.keys()) | set(empirical.cells.keys())
@@ -484,14 +1274,27 @@ def distribution_metrics(expected, empirical):
     }
 
 
-def monte_carlo_validate(text, min_samples=2000, max_samples=40000, batch_size=2000, timeout_seconds=10, tolerance=0.05, seed=0):
+def monte_carlo_validate(
+    text,
+    min_samples=2000,
+    max_samples=40000,
+    batch_size=2000,
+    timeout_seconds=10,
+    tolerance=0.05,
+    seed=0,
+    vectorized=None,
+):
+    # vectorized=None picks the batch backend whenever NumPy is available and
+    # falls back to interpreting the program once per sample otherwise.
+    if vectorized is None:
+        vectorized = diceengine._optional_module("numpy") is not None
     expected = exact_evaluate(text)
     counts = {
         "axes": None,
         "cells": defaultdict(lambda: defaultdict(float)),
         "samples": 0,
     }
-    rng = random.Random(seed)
+    rng = diceengine._optional_module("numpy").random.default_rng(seed) if vectorized else random.Random(seed)
     start = time.monotonic()
     history = []
     samples_seen = 0
@@ -500,8 +1303,15 @@ def monte_carlo_validate(text, min_samples=2000, max_samples=40000, batch_size=2
         if time.monotonic() - start > timeout_seconds:
             break
 
-        batch_executor = DirectExecutor(rng=rng)
         batch_end = min(samples_seen + batch_size, max_samples)
+        if vectorized:
+            _reset_sweeps()
+            batch_executor = BatchDirectExecutor(batch_end - samples_seen, rng=rng)
+            sampled = BatchInterpreter(_parse_text(text), executor=batch_executor).interpret()
+            _accumulate_sample_counts(counts, sampled, batch_end, batch_samples=batch_end - samples_seen)
+            samples_seen = batch_end
+        else:
+            batch_executor = DirectExecutor(rng=rng)
         while samples_seen < batch_end:
             _reset_sweeps()
             ast = _parse_text(text)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+
+"""Exact rational probabilities and integer-count dense weights."""
+
+from __future__ import annotations
+
+from fractions import Fraction
+from math import gcd
+
+
+class ExactProbability(Fraction):
+    """Fraction that stays exact when mixed with float literals.
+
+    Engine code seeds sums and masses with literals such as 0.0 and 1.0. Plain
+    Fraction arithmetic would degrade to float there, so float operands are
+    converted exactly instead, and results keep this type."""
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return "ExactProbability({}, {})".format(self.numerator, self.denominator)
+
+    def __str__(self):
+        return str(Fraction(self.numerator, self.denominator))
+
+    def __format__(self, format_spec):
+        # Report formatting uses float specs such as ".2f".
+        if not format_spec:
+            return str(self)
+        return format(float(self), format_spec)
+
+
+def _exact_operand(value):
+    if isinstance(value, float):
+        return Fraction(value)
+    return value
+
+
+def _wrap(value):
+    if type(value) is Fraction:
+        return ExactProbability(value)
+    return value
+
+
+def _exact_binary(name):
+    operator = getattr(Fraction, name)
+
+    def method(self, other):
+        return _wrap(operator(self, _exact_operand(other)))
+
+    method.__name__ = name
+    return method
+
+
+def _exact_unary(name):
+    operator = getattr(Fraction, name)
+
+    def method(self, *args):
+        return _wrap(operator(self, *args))
+
+    method.__name__ = name
+    return method
+
+
+for _name in (
+    "__add__",
+    "__radd__",
+    "__sub__",
+    "__rsub__",
+    "__mul__",
+    "__rmul__",
+    "__truediv__",
+    "__rtruediv__",
+    "__pow__",
+):
+    setattr(ExactProbability, _name, _exact_binary(_name))
+for _name in ("__neg__", "__pos__", "__abs__", "__round__"):
+    setattr(ExactProbability, _name, _exact_unary(_name))
+del _name
+
+
+def exact_probability(value):
+    # User-written float weights such as 0.3 mean 3/10, so floats are read from
+    # their shortest repr rather than their binary expansion.
+    if isinstance(value, ExactProbability):
+        return value
+    if isinstance(value, float):
+        return ExactProbability(repr(value))
+    return ExactProbability(value)
+
+
+class CountWeights:
+    """Dense probability weights stored as integer counts over one denominator.
+
+    Count-aware paths use counts and denominator directly. Generic readers of
+    dense weights see a sequence of ExactProbability values, which is only
+    built when they index, slice or iterate it."""
+
+    __slots__ = ("counts", "denominator", "_weights")
+
+    def __init__(self, counts, denominator):
+        common = denominator
+        for count in counts:
+            common = gcd(common, count)
+            if common == 1:
+                break
+        if common > 1:
+            counts = tuple(count // common for count in counts)
+            denominator //= common
+        self.counts = tuple(counts)
+        self.denominator = denominator
+        self._weights = None
+
+    def __reduce__(self):
+        return (CountWeights, (self.counts, self.denominator))
+
+    def _probabilities(self):
+        weights = self._weights
+        if weights is None:
+            denominator = self.denominator
+            weights = self._weights = tuple(ExactProbability(count, denominator) for count in self.counts)
+        return weights
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._probabilities()[index]
+        return ExactProbability(self.counts[index], self.denominator)
+
+    def __iter__(self):
+        return iter(self._probabilities())
+
+    def total(self):
+        return ExactProbability(sum(self.counts), self.denominator)
+
+    def trimmed(self, start, end):
+        return CountWeights(self.counts[start:end], self.denominator)
+
+    def reversed(self):
+        return CountWeights(self.counts[::-1], self.denominator)
+
+
+def count_weights(weights):
+    # Exact dense weights that did not come out of a count-aware path, e.g.
+    # zero-filled windows built from entries, are brought onto one denominator.
+    if isinstance(weights, CountWeights):
+        return weights
+    fractions = [Fraction(weight) if weight else None for weight in weights]
+    denominator = 1
+    for fraction in fractions:
+        if fraction is not None:
+            denominator = denominator * fraction.denominator // gcd(denominator, fraction.denominator)
+    counts = [
+        0 if fraction is None else fraction.numerator * (denominator // fraction.denominator)
+        for fraction in fractions
+    ]
+    return CountWeights(counts, denominator)
+
+
+def _pack(counts, width):
+    return int.from_bytes(b"".join(count.to_bytes(width, "little") for count in counts), "little")
+
+
+def _unpack(value, width, size):
+    data = value.to_bytes(width * size, "little")
+    return [int.from_bytes(data[index:index + width], "little") for index in range(0, width * size, width)]
+
+
+def _slot_width(bound):
+    # Every coefficient of the packed product is at most bound, so one slot of
+    # this many bytes never carries into its neighbour.
+    return bound.bit_length() // 8 + 1
+
+
+def convolve_counts(left, right):
+    """Convolve two CountWeights with one big-integer multiplication."""
+    size = len(left.counts) + len(right.counts) - 1
+    width = _slot_width(sum(left.counts) * sum(right.counts))
+    product = _pack(left.counts, width) * _pack(right.counts, width)
+    return CountWeights(_unpack(product, width, size), left.denominator * right.denominator)
+
+
+def power_counts(weights, count):
+    """count-fold self-convolution of CountWeights as one big-integer power."""
+    size = count * (len(weights.counts) - 1) + 1
+    width = _slot_width(sum(weights.counts) ** count)
+    powered = _pack(weights.counts, width) ** count
+    return CountWeights(_unpack(powered, width, size), weights.denominator ** count)
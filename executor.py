@@ -12,6 +12,7 @@ import diceengine
 from hostfunctions import (
     D,
     DiceDefault,
+    RESULT_CACHE,
     ParameterSpec,
     callable_parameters,
     dicefunction,
@@ -32,11 +33,16 @@ class HostFunction:
 class Executor(ABC):
     """Abstract interpreter backend plus named host-callable registry."""
 
+    # Exact backends return the same value for the same pure expression, which
+    # is what lets the interpreter memoize dice-language function calls.
+    is_exact = False
+
     def __init__(self, render_config=None):
         self.functions = {}
         self.render_config = render_config if render_config is not None else diceengine.RenderConfig()
         self.pending_report = diceengine.ReportSpec()
         self._register_builtin_functions()
+        self.builtin_function_names = frozenset(self.functions)
 
     def _callable_parameters(self, function, variadic=False):
         metadata = get_dicefunction_metadata(function)
@@ -168,6 +174,15 @@ class Executor(ABC):
     def register_function(self, function, name=None):
         return self._register_host_function(function, name=name, require_decorated=True)
 
+    def clear_result_cache(self):
+        RESULT_CACHE.clear()
+
+    def result_cache_stats(self):
+        return RESULT_CACHE.stats()
+
+    def set_result_cache_budget(self, budget):
+        RESULT_CACHE.set_budget(budget)
+
     def repeat_sum(self, count, value):
         return diceengine.repeat_sum(count, value)
 
@@ -414,6 +429,8 @@ class Executor(ABC):
 class ExactExecutor(Executor):
     """Exact backend delegating to pure functions in diceengine."""
 
+    is_exact = True
+
     def _register_builtin_functions(self):
         for value in diceengine.__dict__.values():
             metadata = get_dicefunction_metadata(value)
@@ -548,16 +565,16 @@ class ExactExecutor(Executor):
         return diceengine.neg(value)
 
     def greaterorequal(self, left, right):
-        return diceengine.greaterorequal(left, right)
+        return diceengine.compare_with(diceengine.greaterorequal, left, right, ">=")
 
     def greater(self, left, right):
-        return diceengine.greater(left, right)
+        return diceengine.compare_with(diceengine.greater, left, right, ">")
 
     def equal(self, left, right):
-        return diceengine.equal(left, right)
+        return diceengine.compare_with(diceengine.equal, left, right, "==")
 
     def lessorequal(self, left, right):
-        return diceengine.lessorequal(left, right)
+        return diceengine.compare_with(diceengine.lessorequal, left, right, "<=")
 
     def less(self, left, right):
-        return diceengine.less(left, right)
+        return diceengine.compare_with(diceengine.less, left, right, "<")
@@ -4,10 +4,15 @@
 
 from __future__ import annotations
 
+from collections import OrderedDict
+from contextlib import contextmanager
 from dataclasses import dataclass
+from fractions import Fraction
 import functools
 import inspect
 from itertools import product
+import threading
+from time import perf_counter
 from typing import Any, get_origin, get_type_hints
 
 from diceparser import DiceParser
@@ -16,6 +21,9 @@ from lexer import Lexer, ASSIGN, SEMI, PRINT
 
 MISSING = object()
 _DICEFUNCTION_ATTR = "_dicefunction_metadata"
+# Budget for the shared exact-result cache, measured in stored support
+# entries (distribution outcomes, sweep cells, scalars) across keys and values.
+DEFAULT_RESULT_CACHE_BUDGET = 1_000_000
 
 
 def _diceengine():
@@ -24,6 +32,37 @@ def _diceengine():
     return diceengine
 
 
+class EvaluationTimeout(BaseException):
+    """Raised at a safe point once the evaluation deadline has passed.
+
+    It derives from BaseException so that handlers for evaluation errors
+    cannot swallow it."""
+
+
+# Deadlines are per thread, because server listener threads evaluate
+# requests concurrently.
+_deadline = threading.local()
+
+
+@contextmanager
+def evaluation_deadline(seconds):
+    """Stop evaluation in this thread at the next safe point after seconds."""
+    previous = getattr(_deadline, "value", None)
+    _deadline.value = perf_counter() + seconds if seconds else None
+    try:
+        yield
+    finally:
+        _deadline.value = previous
+
+
+def check_evaluation_deadline():
+    # Safe points are between cells, calls and split outcomes, where no
+    # shared cache is halfway through an update.
+    deadline = getattr(_deadline, "value", None)
+    if deadline is not None and perf_counter() > deadline:
+        raise EvaluationTimeout()
+
+
 @dataclass(frozen=True)
 class DiceDefault:
     source: str
@@ -91,6 +130,10 @@ def validate_runtime_value(value):
         ),
     ):
         return value
+    if isinstance(value, Fraction):
+        # Exact-mode probabilities, e.g. from .average(), are plain numbers in
+        # the language.
+        return float(value)
     raise Exception("Unsupported host value type {}".format(type(value)))
 
 
@@ -237,7 +280,160 @@ def _build_argument_binder(parameters, export_name):
     return bind_arguments
 
 
-def _lifted_python_call(function, parameters, values):
+def _cache_weight(value):
+    diceengine = _diceengine()
+    if isinstance(value, diceengine.FiniteMeasure):
+        return max(value._support_size(), 1)
+    if isinstance(value, diceengine.Sweep):
+        return sum(_cache_weight(cell) for cell in value.values())
+    if isinstance(value, tuple):
+        return sum(_cache_weight(item) for item in value) + 1
+    return 1
+
+
+def _sweep_axis_keys(value, keys):
+    """Add the keys of every sweep axis inside value to keys and return them."""
+    diceengine = _diceengine()
+    if isinstance(value, diceengine.SweepValues):
+        keys.add(value.key)
+    elif isinstance(value, diceengine.Sweep):
+        keys.update(axis.key for axis in value.axes)
+        for cell in value.values():
+            _sweep_axis_keys(cell, keys)
+    elif isinstance(value, (diceengine.TupleValue, list, tuple)):
+        for item in value:
+            _sweep_axis_keys(item, keys)
+    elif isinstance(value, diceengine.RecordValue):
+        for item in value.values():
+            _sweep_axis_keys(item, keys)
+    return keys
+
+
+class ResultCache:
+    """Bounded LRU cache shared by every @dicefunction(cache=True) builtin.
+
+    Entries are evicted least-recently-used first once the summed support size
+    of cached arguments and results exceeds `budget`. Counters are kept per
+    exported function name.
+
+    When a persistent store is attached (see `dice.py --cache-dir`), in-memory
+    misses fall back to it and freshly computed results are written through.
+    """
+
+    def __init__(self, budget=DEFAULT_RESULT_CACHE_BUDGET):
+        self.budget = budget
+        self.persistent_store = None
+        self._entries = OrderedDict()
+        self._weight = 0
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def set_persistent_store(self, store):
+        self.persistent_store = store
+
+    def _counters_for(self, name):
+        counters = self._counters.get(name)
+        if counters is None:
+            counters = self._counters.setdefault(name, {"hits": 0, "misses": 0, "evictions": 0})
+        return counters
+
+    def call(self, name, function, args):
+        key = (function, args)
+        try:
+            hash(key)
+        except TypeError:
+            return function(*args)
+        result = self._lookup(name, key)
+        if result is not MISSING:
+            return result
+        store = self.persistent_store
+        store_key = None
+        result = MISSING
+        if store is not None:
+            # The store module (and sqlite3) is only loaded once a store is
+            # attached.
+            import resultstore
+
+            store_key = store.key("builtin", name, resultstore.function_fingerprint(function), args)
+            if store_key is not None:
+                result = store.get(store_key)
+                if result is resultstore.MISSING:
+                    result = MISSING
+        if result is MISSING:
+            # The lock is not held while computing: cached builtins such as
+            # repeat_sum recurse through the cache themselves.
+            result = function(*args)
+            # Axis keys are only meaningful in this process, so results with
+            # axes created inside the call (not passed in) are not persisted.
+            if store_key is not None and _sweep_axis_keys(result, set()) <= _sweep_axis_keys(args, set()):
+                store.put(store_key, result)
+        self._insert(name, key, result, _cache_weight(args) + _cache_weight(result))
+        return result
+
+    def get_or_compute(self, name, key, compute):
+        """Return the cached value for key, or compute() it and cache it.
+
+        For callers that build their own structural keys, such as shared
+        closed subexpressions. Nothing is written to the persistent store."""
+        result = self._lookup(name, key)
+        if result is MISSING:
+            result = compute()
+            self._insert(name, key, result, _cache_weight(result))
+        return result
+
+    def _lookup(self, name, key):
+        counters = self._counters_for(name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                counters["misses"] += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            counters["hits"] += 1
+            return entry[0]
+
+    def _insert(self, name, key, result, weight):
+        if weight > self.budget:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._weight -= previous[1]
+            self._entries[key] = (result, weight, name)
+            self._weight += weight
+            self._evict_locked()
+
+    def _evict_locked(self):
+        while self._weight > self.budget and self._entries:
+            _, (_, weight, name) = self._entries.popitem(last=False)
+            self._weight -= weight
+            self._counters_for(name)["evictions"] += 1
+
+    def set_budget(self, budget):
+        with self._lock:
+            self.budget = budget
+            self._evict_locked()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._weight = 0
+            self._counters.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "weight": self._weight,
+                "budget": self.budget,
+                "functions": {name: dict(counters) for name, counters in sorted(self._counters.items())},
+            }
+
+
+RESULT_CACHE = ResultCache()
+
+
+def _lifted_python_call(function, parameters, values, pure=False):
     diceengine = _diceengine()
     projected_arguments = []
     combined_sweeps = []
@@ -258,22 +454,45 @@ def _lifted_python_call(function, parameters, values):
                 continue
             projected.append(_convert_projected_argument(value.only_value(), parameter))
         return validate_runtime_value(function(*projected))
-    cells = {}
-    for coordinates in ([()] if not combined_axes else product(*(axis.values for axis in combined_axes))):
-        projected = []
-        for is_projected, value, parameter in projected_arguments:
-            if not is_projected:
-                projected.append(value)
+    projectors = []
+    for is_projected, value, parameter in projected_arguments:
+        if is_projected:
+            projectors.append(diceengine._cell_projector(value, combined_axes))
+        else:
+            projectors.append(lambda coordinates, value=value: value)
+    # Pure functions are evaluated once per distinct tuple of projected argument
+    # objects and the result is broadcast, so operands that were broadcast over
+    # axes they do not depend on do not multiply the work.
+    results_by_arguments = {} if pure else None
+    cells = []
+    for coordinates in product(*(axis.values for axis in combined_axes)):
+        check_evaluation_deadline()
+        raw_arguments = [project(coordinates) for project in projectors]
+        if pure:
+            argument_key = tuple(map(id, raw_arguments))
+            result = results_by_arguments.get(argument_key, MISSING)
+            if result is not MISSING:
+                cells.append(result)
                 continue
-            projected.append(_convert_projected_argument(value.lookup(combined_axes, coordinates), parameter))
+        projected = [
+            _convert_projected_argument(argument, parameter) if is_projected else argument
+            for argument, (is_projected, _, parameter) in zip(raw_arguments, projected_arguments)
+        ]
         result = validate_runtime_value(function(*projected))
         if isinstance(result, diceengine.Sweep) and result.is_unswept():
             result = result.only_value()
-        cells[coordinates] = result
-    return diceengine.Sweep(combined_axes, cells)
+        if pure:
+            results_by_arguments[argument_key] = result
+        cells.append(result)
+    return diceengine.Sweep._from_row_major(combined_axes, cells)
 
 
-def dicefunction(function=None, *, name=None, cache=False):
+def dicefunction(function=None, *, name=None, cache=False, pure=None):
+    # Cached functions are pure by definition. pure=True alone marks functions
+    # that cannot be cached (sweep reductions) as safe to evaluate once per
+    # distinct tuple of projected arguments.
+    pure = cache if pure is None else pure
+
     def decorate(raw_function):
         export_name = name if name is not None else raw_function.__name__
         if not export_name:
@@ -284,7 +503,13 @@ def dicefunction(function=None, *, name=None, cache=False):
         bind_arguments = _build_argument_binder(parameters, export_name)
         if cache and requests_sweep:
             raise Exception("@dicefunction(cache=True) is not supported for sweep functions")
-        wrapped_function = functools.lru_cache(maxsize=None)(raw_function) if cache else raw_function
+        if cache and not pure:
+            raise Exception("@dicefunction(cache=True) functions must be pure")
+        if cache:
+            def wrapped_function(*args):
+                return RESULT_CACHE.call(export_name, raw_function, args)
+        else:
+            wrapped_function = raw_function
 
         @functools.wraps(raw_function)
         def wrapped(*args, **kwargs):
@@ -293,7 +518,7 @@ def dicefunction(function=None, *, name=None, cache=False):
                 if isinstance(value, DiceDefault):
                     raise Exception("D(...) defaults are only resolved by dice-session invocation")
                 values.append(value)
-            return _lifted_python_call(wrapped_function, parameters, values)
+            return _lifted_python_call(wrapped_function, parameters, values, pure=pure)
 
         setattr(
             wrapped,
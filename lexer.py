@@ -73,15 +73,78 @@ class Token(object):
     def __repr__(self):
         return "Token: {type}, {value}".format(type=self.type, value=self.value)
 
+
+# All regular expressions for tokens and functions generating them from the
+# matched string. They are joined into one master regex whose alternatives are
+# tried in this order.
+# NOTE: more complex symbols need to be matched first if they contain less complex symbols
+# e.g. -> before -
+# NOTE: patterns must not contain capturing groups, the alternative that
+# matched is found through match.lastindex
+TOKEN_PATTERNS = (
+    (r'".*?"', lambda x: Token(STRING, x[1:-1])),
+    (r"print\b", lambda x: Token(PRINT, x)),
+    (r"match\b", lambda x: Token(MATCH, x)),
+    (r"split\b", lambda x: Token(SPLIT, x)),
+    (r"as\b", lambda x: Token(AS, x)),
+    (r"otherwise\b", lambda x: Token(OTHERWISE, x)),
+    (r"import\b", lambda x: Token(IMPORT, x)),
+    (r"in\b", lambda x: Token(IN, x)),
+    # d+ needed to not confuse indexing (d20.20)
+    (r"\n",    lambda x: Token(SEMI, x)),
+    (r"\;",    lambda x: Token(SEMI, x)),
+    (r"h(?=\b|\s|\d|\(|\[|\{|\"|\!|\~|\-)", lambda x: Token(HIGH, x)),
+    (r"l(?=\b|\s|\d|\(|\[|\{|\"|\!|\~|\-)", lambda x: Token(LOW, x)),
+    (r"\|\|", lambda x: Token(SPLITZERO, x)),
+    (r"\(",   lambda x: Token(LPAREN, x)),
+    (r"\)",   lambda x: Token(RPAREN, x)),
+    (r"\{",   lambda x: Token(LBRACE, x)),
+    (r"\}",   lambda x: Token(RBRACE, x)),
+    (r"d\-",  lambda x: Token(DIS, x)),
+    (r"d\+",  lambda x: Token(ADV, x)),
+    (r"\.\.<", lambda x: Token(RANGE_EXCLUSIVE, x)),
+    (r"\.\.", lambda x: Token(RANGE, x)),
+    (r"//",   lambda x: Token(FLOORDIV, x)),
+    (r"\:",   lambda x: Token(COLON, x)),
+    (r"@",    lambda x: Token(AT, x)),
+    (r"\,",   lambda x: Token(COMMA, x)),
+    (r"\[",   lambda x: Token(LBRACK, x)),
+    (r"\]",   lambda x: Token(RBRACK, x)),
+    (r"\-\>", lambda x: Token(RES, x)),
+    (r"\$",   lambda x: Token(PIPE, x)),
+    (r"~",    lambda x: Token(AVG, x)),
+    (r"\!",   lambda x: Token(PROP, x)),
+    (r"\|",   lambda x: Token(ELSE, x)),
+    (r"d(?=\b|\s|\d|\(|\[|\{|\"|\!|\~|\-)", lambda x: Token(ROLL, x)),
+    (r"\>=",  lambda x: Token(GREATER_OR_EQUAL, x)),
+    (r"\<=",  lambda x: Token(LESS_OR_EQUAL, x)),
+    (r"\<",   lambda x: Token(LESS, x)),
+    (r">",    lambda x: Token(GREATER, x)),
+    (r"==",   lambda x: Token(EQUAL, x)),
+    (r"\+",   lambda x: Token(PLUS, x)),
+    (r"\-",   lambda x: Token(MINUS, x)),
+    (r"\*",   lambda x: Token(MUL, x)),
+    (r"\^",   lambda x: Token(CARET, x)),
+    (r"/",    lambda x: Token(DIV, x)),
+    (r"\=",   lambda x: Token(ASSIGN, x)),
+    # try to match anything else to a variable or number
+    (r"\d+\.\d+",  lambda x: Token(FLOAT, float(x))),
+    (r"\d+",  lambda x: Token(INTEGER, int(x))),
+    (r"\w+",  lambda x: Token(ID, x)),
+)
+TOKEN_RE = re.compile("|".join("({})".format(regex) for regex, _ in TOKEN_PATTERNS))
+# Indexed by match.lastindex, which is 1-based.
+TOKEN_GENERATORS = (None,) + tuple(token_gen for _, token_gen in TOKEN_PATTERNS)
+BLANKS_RE = re.compile(r"[ \t]*")
+
+
 class Lexer(object):
     """Generate tokensteam from string input for dice language"""
 
     def __init__(self, string_input, source_name=DEFAULT_SOURCE_NAME):
         """test = complete text to be interpreted"""
         normalized_text = self.normalize_input(string_input)
-        # stores the string that has yet to interpreted
-        self.string_input = normalized_text
-        # keep the original text in case needed
+        # the whole input; tokens are scanned from self.location onwards
         self.original_text = normalized_text
         self.source_document = SourceDocument(source_name, normalized_text)
         self.location = 0
@@ -112,20 +175,20 @@ class Lexer(object):
             self.column,
         )
 
-    def _advance(self, text):
-        for char in text:
-            self.location += 1
-            if char == "\n":
-                self.line += 1
-                self.column = 1
-            else:
-                self.column += 1
+    def _advance_to(self, end):
+        text = self.original_text
+        newlines = text.count("\n", self.location, end)
+        if newlines:
+            self.line += newlines
+            self.column = end - text.rfind("\n", self.location, end)
+        else:
+            self.column += end - self.location
+        self.location = end
 
     def _consume(self, count):
-        consumed = self.string_input[:count]
-        self.string_input = self.string_input[count:]
-        self._advance(consumed)
-        return consumed
+        start = self.location
+        self._advance_to(start + count)
+        return self.original_text[start:self.location]
 
     def _span_from_consumed(self, start_index, start_line, start_column, consumed):
         if not consumed:
@@ -162,26 +225,24 @@ class Lexer(object):
         return Token(DEDENT, None, span=self.current_span())
 
     def _consume_line_comment(self):
-        comment_end = 0
-        while comment_end < len(self.string_input) and self.string_input[comment_end] != "\n":
-            comment_end += 1
-        self._consume(comment_end)
+        comment_end = self.original_text.find("\n", self.location)
+        self._advance_to(len(self.original_text) if comment_end == -1 else comment_end)
 
     def _consume_indentation(self):
-        indentation = 0
-        while indentation < len(self.string_input) and self.string_input[indentation] in [" ", "\t"]:
-            indentation += 1
-        return self.string_input[:indentation], indentation
+        end = BLANKS_RE.match(self.original_text, self.location).end()
+        return self.original_text[self.location:end], end - self.location
 
     def _handle_line_start(self):
+        text = self.original_text
         while True:
-            if not self.string_input:
+            if self.location >= len(text):
                 if len(self.indent_stack) > 1:
                     return self._emit_pending_dedent()
                 return None
 
             indentation_text, indentation_count = self._consume_indentation()
-            next_char = self.string_input[indentation_count:indentation_count + 1]
+            next_index = self.location + indentation_count
+            next_char = text[next_index:next_index + 1]
 
             if next_char == "#":
                 if indentation_count:
@@ -234,106 +295,51 @@ class Lexer(object):
             if token is not None:
                 return token
 
-        while self.string_input and self.string_input[0] in [" ", "\t"]:
-            self._consume(1)
+        text = self.original_text
+        # Blanks never contain newlines, so only the column moves.
+        blanks_end = BLANKS_RE.match(text, self.location).end()
+        self.column += blanks_end - self.location
+        self.location = blanks_end
 
-        if self.string_input.startswith("#"):
+        if text.startswith("#", self.location):
             self._consume_line_comment()
             return self.next_token()
 
-        if self.string_input.startswith('"'):
-            next_quote = self.string_input.find('"', 1)
-            next_newline = self.string_input.find("\n", 1)
+        if text.startswith('"', self.location):
+            next_quote = text.find('"', self.location + 1)
+            next_newline = text.find("\n", self.location + 1)
             if next_quote == -1 or (next_newline != -1 and next_quote > next_newline):
                 self.exception(
                     "unterminated string literal",
                     hint='Close the string with a matching double quote, for example "fire bolt".',
                 )
 
-        # Matches tokens with regex
-
-        # all regular expressions for tokens and funcitons generating them from the matched string
-        # NOTE: more complex symbols need to be matched first if they contain less complex symbols
-        # e.g. -> before -
-        # NOTE: no need to match beginning of string because re.match is used
-        token_re_list = [
-            [r'".*?"', lambda x: Token(STRING, x[1:-1])],
-            [r"print\b", lambda x: Token(PRINT, x)],
-            [r"match\b", lambda x: Token(MATCH, x)],
-            [r"split\b", lambda x: Token(SPLIT, x)],
-            [r"as\b", lambda x: Token(AS, x)],
-            [r"otherwise\b", lambda x: Token(OTHERWISE, x)],
-            [r"import\b", lambda x: Token(IMPORT, x)],
-            [r"in\b", lambda x: Token(IN, x)],
-            # d+ needed to not confuse indexing (d20.20)
-            [r"\n",    lambda x: Token(SEMI, x)],
-            [r"\;",    lambda x: Token(SEMI, x)],
-            [r"h(?=\b|\s|\d|\(|\[|\{|\"|\!|\~|\-)", lambda x: Token(HIGH, x)],
-            [r"l(?=\b|\s|\d|\(|\[|\{|\"|\!|\~|\-)", lambda x: Token(LOW, x)],
-            [r"\|\|", lambda x: Token(SPLITZERO, x)],
-            [r"\(",   lambda x: Token(LPAREN, x)],
-            [r"\)",   lambda x: Token(RPAREN, x)],
-            [r"\{",   lambda x: Token(LBRACE, x)],
-            [r"\}",   lambda x: Token(RBRACE, x)],
-            [r"d\-",  lambda x: Token(DIS, x)],
-            [r"d\+",  lambda x: Token(ADV, x)],
-            [r"\.\.<", lambda x: Token(RANGE_EXCLUSIVE, x)],
-            [r"\.\.", lambda x: Token(RANGE, x)],
-            [r"//",   lambda x: Token(FLOORDIV, x)],
-            [r"\:",   lambda x: Token(COLON, x)],
-            [r"@",    lambda x: Token(AT, x)],
-            [r"\,",   lambda x: Token(COMMA, x)],
-            [r"\[",   lambda x: Token(LBRACK, x)],
-            [r"\]",   lambda x: Token(RBRACK, x)],
-            [r"\-\>", lambda x: Token(RES, x)],
-            [r"\$",   lambda x: Token(PIPE, x)],
-            [r"~",    lambda x: Token(AVG, x)],
-            [r"\!",   lambda x: Token(PROP, x)],
-            [r"\|",   lambda x: Token(ELSE, x)],
-            [r"d(?=\b|\s|\d|\(|\[|\{|\"|\!|\~|\-)", lambda x: Token(ROLL, x)],
-            [r"\>=",  lambda x: Token(GREATER_OR_EQUAL, x)],
-            [r"\<=",  lambda x: Token(LESS_OR_EQUAL, x)],
-            [r"\<",   lambda x: Token(LESS, x)],
-            [r">",    lambda x: Token(GREATER, x)],
-            [r"==",   lambda x: Token(EQUAL, x)],
-            [r"\+",   lambda x: Token(PLUS, x)],
-            [r"\-",   lambda x: Token(MINUS, x)],
-            [r"\*",   lambda x: Token(MUL, x)],
-            [r"\^",   lambda x: Token(CARET, x)],
-            [r"/",    lambda x: Token(DIV, x)],
-            [r"\=",   lambda x: Token(ASSIGN, x)],
-            # try to match anything else to a variable or number
-            [r"\d+\.\d+",  lambda x: Token(FLOAT, float(x))],
-            [r"\d+",  lambda x: Token(INTEGER, int(x))],
-            [r"\w+",  lambda x: Token(ID, x)],
-        ]
-
-        # check tokens in order
-        for regex, token_gen in token_re_list:
-            # match only matches from the beginning of the string
-            match = re.match(regex, self.string_input)
-            if match:
-                start_index = self.location
-                start_line = self.line
-                start_column = self.column
-                consumed = self._consume(len(match[0]))
-                span = self._span_from_consumed(start_index, start_line, start_column, consumed)
-                # generate token from generating function
-                token = token_gen(match.group(0))
-                token.span = span
-                if token.type == SEMI:
-                    self.at_line_start = True
-                elif token.type == COLON:
-                    self.at_line_start = False
-                    self.expect_indent = True
-                else:
-                    self.at_line_start = False
-                    self.expect_indent = False
-                return token
+        # one scan of the master regex from the current position; the first
+        # alternative that matches wins, as in TOKEN_PATTERNS
+        match = TOKEN_RE.match(text, self.location)
+        if match:
+            start_index = self.location
+            start_line = self.line
+            start_column = self.column
+            consumed = match.group()
+            self._advance_to(match.end())
+            span = self._span_from_consumed(start_index, start_line, start_column, consumed)
+            # generate token from generating function
+            token = TOKEN_GENERATORS[match.lastindex](consumed)
+            token.span = span
+            if token.type == SEMI:
+                self.at_line_start = True
+            elif token.type == COLON:
+                self.at_line_start = False
+                self.expect_indent = True
+            else:
+                self.at_line_start = False
+                self.expect_indent = False
+            return token
 
         # can't find anything anymore but still input string
-        if self.string_input:
-            snippet = self.string_input.split("\n", 1)[0]
+        if self.location < len(text):
+            snippet = text[self.location:].split("\n", 1)[0]
             self.exception(
                 "could not tokenize input starting at {!r}".format(snippet),
                 hint="Check for an unsupported character or a missing quote.",
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+
+"""Process-pool evaluation of large exact sweeps.
+
+The final expression of a program is evaluated once per shard of its
+outermost named sweep literals, each shard in its own worker process with a
+fresh exact executor. The shard results are reassembled into one Sweep.
+Programs that cannot be sharded safely are evaluated serially instead."""
+
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+import pickle
+
+from diceengine import Sweep, SweepValues, exact_probabilities_enabled, set_exact_probabilities
+from executor import ExactExecutor
+from interpreter import Interpreter, _sweep_axis_keys
+from lexer import ASSIGN, FLOAT, INTEGER, MINUS, STRING
+
+
+class _SessionState(object):
+    """What a worker needs to reproduce the interpreter before this program."""
+
+    def __init__(self, interpreter):
+        self.current_dir = interpreter.current_dir
+        self.imported_files = tuple(interpreter.imported_files)
+        self.global_scope = dict(interpreter.global_scope)
+        self.functions = tuple(entry.node for entry in interpreter.callable_scope.values())
+        self.exact_probabilities = exact_probabilities_enabled()
+        self.sweep_counter = SweepValues.counter
+
+
+def interpret_parallel(interpreter, ast, jobs):
+    """Interpret ast on interpreter, sharding its final expression over jobs processes."""
+    plan = _plan(interpreter, ast, jobs)
+    if plan is None:
+        return interpreter.interpret()
+    literals, statements, final = plan
+    state = _SessionState(interpreter)
+    try:
+        payload = pickle.dumps((ast, state), protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return interpreter.interpret()
+    # Definitions, imports and assignments still run here, so the session
+    # ends up in the same state as after a serial run.
+    interpreter.ast = type(ast)(ast.op, statements) if statements else None
+    if interpreter.ast is not None:
+        interpreter.interpret()
+    tasks = _shard_tasks([values for _, values in literals], jobs)
+    try:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as pool:
+            outcomes = list(pool.map(_evaluate_shard, [payload] * len(tasks), tasks))
+    except Exception:
+        outcomes = None
+    merged = None
+    if outcomes is not None:
+        inherited_keys = _sweep_axis_keys(list(state.global_scope.values()), set())
+        merged = _merge(literals, [result for result, _ in outcomes], inherited_keys)
+    if merged is None:
+        # Errors and results that do not reassemble are reproduced serially,
+        # so diagnostics keep their usual spans.
+        return interpreter._evaluate_in_global_scope(final)
+    seen = set()
+    for _, warnings in outcomes:
+        for warning in warnings:
+            if str(warning) not in seen:
+                seen.add(str(warning))
+                interpreter.warnings.append(warning)
+    return merged
+
+
+def _plan(interpreter, ast, jobs):
+    if jobs <= 1 or type(interpreter) is not Interpreter or type(interpreter.executor) is not ExactExecutor:
+        return None
+    if set(interpreter.executor.functions) != interpreter.executor.builtin_function_names:
+        # Python functions registered on this session cannot be shipped to
+        # workers.
+        return None
+    statements = _statements(ast)
+    if not statements:
+        return None
+    final = statements.pop()
+    kind = type(final).__name__
+    if kind in ("FunctionDef", "Import") or (kind == "BinOp" and final.op.type == ASSIGN):
+        return None
+    if any(_has_effects(interpreter, statement) for statement in statements + [final]):
+        return None
+    literals = _shard_literals(final)
+    if not literals:
+        return None
+    return literals, statements, final
+
+
+def _statements(ast):
+    # Programs parse to a VarOp of statements, single commands to one node.
+    if type(ast).__name__ == "VarOp":
+        return list(ast.nodes)
+    return [ast]
+
+
+def _has_effects(interpreter, node):
+    # Charts and printing would be emitted once per worker.
+    if interpreter._has_side_effects(node):
+        return True
+    for name in interpreter._identifier_names(node):
+        if name.startswith("r_"):
+            return True
+    return False
+
+
+def _shard_literals(final):
+    # Named sweep literals with static values, outermost first. Literals inside
+    # split clauses may be evaluated more than once, repeated names are
+    # separate axes, and axes named by a string such as sumover(..., "p") are
+    # reduced across shards, so none of those is sharded.
+    found = []
+    names = {}
+    strings = set()
+
+    def walk(node):
+        kind = type(node).__name__
+        if kind == "Split":
+            return
+        if kind == "Val" and node.token.type == STRING:
+            strings.add(node.value)
+            return
+        if kind == "SweepLiteral" and node.name is not None:
+            values = _static_values(node)
+            if values is not None and len(values) > 1:
+                found.append((node, values))
+            names[node.name.value] = names.get(node.name.value, 0) + 1
+            return
+        for value in getattr(node, "__dict__", {}).values():
+            for item in value if isinstance(value, list) else (value,):
+                if hasattr(item, "__dict__") and not isinstance(item, type):
+                    walk(item)
+
+    walk(final)
+    return [
+        (node, values)
+        for node, values in found
+        if names[node.name.value] == 1 and node.name.value not in strings
+    ]
+
+
+def _static_values(node):
+    if type(node.values).__name__ == "RangeLiteral":
+        start = _static_scalar(node.values.start)
+        end = _static_scalar(node.values.end)
+        if not isinstance(start, int) or not isinstance(end, int):
+            return None
+        return tuple(range(start, end + 1 if node.values.inclusive_end else end))
+    values = []
+    for child in node.values:
+        value = _static_scalar(child)
+        if value is None:
+            return None
+        values.append(value)
+    return tuple(dict.fromkeys(values))
+
+
+def _static_scalar(node):
+    kind = type(node).__name__
+    if kind == "Val" and node.token.type in (INTEGER, FLOAT, STRING):
+        return node.value
+    if kind == "UnOp" and node.op.type == MINUS:
+        value = _static_scalar(node.value)
+        if isinstance(value, (int, float)):
+            return -value
+    return None
+
+
+def _shard_tasks(value_lists, jobs):
+    # Rectangular shards: outer axes are pinned one value at a time and the
+    # next axis is split into contiguous chunks, until there are at least
+    # jobs shards or no axes are left.
+    tasks = [()]
+    for values in value_lists:
+        per_task = -(-jobs // len(tasks))
+        if per_task <= 1:
+            break
+        if per_task >= len(values):
+            chunks = [(value,) for value in values]
+        else:
+            chunks = [values[index * len(values) // per_task:(index + 1) * len(values) // per_task] for index in range(per_task)]
+        tasks = [task + (chunk,) for task in tasks for chunk in chunks]
+    return tasks
+
+
+def _evaluate_shard(payload, task):
+    ast, state = pickle.loads(payload)
+    set_exact_probabilities(state.exact_probabilities)
+    # New axes must not reuse the keys of axes inherited from the session.
+    SweepValues.counter = max(SweepValues.counter, state.sweep_counter)
+    interpreter = Interpreter(None, current_dir=state.current_dir, imported_files=set(state.imported_files))
+    interpreter.global_scope.update(state.global_scope)
+    for node in state.functions:
+        interpreter.register_function_definition(node)
+    literals = _shard_literals(_statements(ast)[-1])
+    interpreter.sweep_shards = {node: frozenset(chunk) for (node, _), chunk in zip(literals, task)}
+    interpreter.ast = ast
+    return interpreter.interpret(), interpreter.warnings
+
+
+def _merge(literals, results, inherited_keys=frozenset()):
+    shard_values = {node.name.value: values for node, values in literals}
+    first = results[0]
+    if not all(isinstance(result, Sweep) for result in results):
+        return None
+    names = [axis.name for axis in first.axes]
+    if len(set(names)) != len(names) or not set(shard_values) <= set(names):
+        return None
+    cells = {}
+    for result in results:
+        if [axis.name for axis in result.axes] != names:
+            return None
+        for axis, reference in zip(result.axes, first.axes):
+            if axis.name not in shard_values and axis.values != reference.values:
+                return None
+        cells.update(result.items())
+    # Axes inherited from session globals keep their keys, so the result still
+    # lines up with those values. Axes the workers created were keyed by other
+    # processes' counters and get fresh keys here.
+    axes = [
+        axis
+        if axis.key in inherited_keys and axis.name not in shard_values
+        else SweepValues(shard_values.get(axis.name, axis.values), name=None if axis.name == axis.key else axis.name).axis()
+        for axis in first.axes
+    ]
+    ordered = []
+    for coordinates in product(*(axis.values for axis in axes)):
+        if coordinates not in cells:
+            return None
+        ordered.append(cells[coordinates])
+    return Sweep._from_row_major(axes, ordered)
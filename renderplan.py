@@ -14,6 +14,7 @@ from diceengine import (
     ReportSpec,
     TupleValue,
     _coerce_to_distributions,
+    _with_float_weights,
 )
 
 
@@ -194,6 +195,7 @@ def build_chart_plan(chart_spec, render_config=None):
     if not isinstance(chart_spec, ChartSpec):
         raise Exception("expected a chart spec")
     render_config = render_config if render_config is not None else RenderConfig()
+    chart_spec = _with_float_weights(chart_spec)
 
     intent = chart_spec.intent
     payload = chart_spec.payload
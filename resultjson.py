@@ -5,6 +5,7 @@
 from __future__ import annotations
 
 import json
+from fractions import Fraction
 
 from diceengine import (
     Distributions,
@@ -20,6 +21,9 @@ def is_numeric(value):
 
 
 def round_numeric(value, roundlevel):
+    if isinstance(value, Fraction):
+        # Exact probabilities are reported as floats.
+        value = float(value)
     if roundlevel and isinstance(value, float):
         return round(value, roundlevel)
     return value
@@ -121,85 +125,102 @@ def serialize_measure(measure, roundlevel=0):
     return entries
 
 
-def serialize_result(result, roundlevel=0, probability_mode="raw"):
-    if isinstance(result, Distributions):
-        distribution_only = all(isinstance(distrib, Distribution) for distrib in result.cells.values())
-        axes = [
+def _axis_name(axis):
+    return axis.name if not axis.name.startswith("sweep_") else None
+
+
+def _is_distribution_only(result):
+    return all(isinstance(distrib, Distribution) for distrib in result.values())
+
+
+def serialize_axes(result, roundlevel=0, probability_mode="raw"):
+    return [
+        {
+            "key": axis.key,
+            "name": _axis_name(axis),
+            "values": [
+                serialize_embedded_value(
+                    value,
+                    roundlevel,
+                    probability_mode=probability_mode,
+                )
+                for value in axis.values
+            ],
+        }
+        for axis in result.axes
+    ]
+
+
+def serialize_cell(axes, coordinates, distrib, distribution_only, roundlevel=0, probability_mode="raw"):
+    coordinate_entries = []
+    for axis, value in zip(axes, coordinates):
+        coordinate_entries.append(
             {
-                "key": axis.key,
-                "name": axis.name if not axis.name.startswith("sweep_") else None,
-                "values": [
-                    serialize_embedded_value(
-                        value,
-                        roundlevel,
-                        probability_mode=probability_mode,
-                    )
-                    for value in axis.values
-                ],
+                "axis_key": axis.key,
+                "axis_name": _axis_name(axis),
+                "value": serialize_embedded_value(
+                    value,
+                    roundlevel,
+                    probability_mode=probability_mode,
+                ),
             }
-            for axis in result.axes
-        ]
-        cells = []
-        for coordinates, distrib in result.cells.items():
-            coordinate_entries = []
-            for axis, value in zip(result.axes, coordinates):
-                coordinate_entries.append(
-                    {
-                        "axis_key": axis.key,
-                        "axis_name": axis.name if not axis.name.startswith("sweep_") else None,
-                        "value": serialize_embedded_value(
-                            value,
-                            roundlevel,
-                            probability_mode=probability_mode,
-                        ),
-                    }
-                )
-            if distribution_only:
-                cells.append(
-                    {
-                        "coordinates": coordinate_entries,
-                        "distribution": serialize_distribution(
-                            distrib,
-                            roundlevel,
-                            probability_mode=probability_mode,
-                        ),
-                    }
-                )
-            else:
-                cells.append(
-                    {
-                        "coordinates": coordinate_entries,
-                        "value": (
-                            {
-                                "kind": "measure",
-                                "measure": serialize_measure(distrib, roundlevel),
-                            }
-                            if isinstance(distrib, FiniteMeasure)
-                            else {
-                                "kind": (
-                                    "scalar"
-                                    if is_numeric(distrib)
-                                    else "string"
-                                    if isinstance(distrib, str)
-                                    else "tuple"
-                                    if isinstance(distrib, TupleValue)
-                                    else "record"
-                                    if isinstance(distrib, RecordValue)
-                                    else type(distrib).__name__
-                                ),
-                                "value": serialize_embedded_value(
-                                    distrib,
-                                    roundlevel,
-                                    probability_mode=probability_mode,
-                                ),
-                            }
-                        ),
-                    }
-                )
+        )
+    if distribution_only:
+        return {
+            "coordinates": coordinate_entries,
+            "distribution": serialize_distribution(
+                distrib,
+                roundlevel,
+                probability_mode=probability_mode,
+            ),
+        }
+    return {
+        "coordinates": coordinate_entries,
+        "value": (
+            {
+                "kind": "measure",
+                "measure": serialize_measure(distrib, roundlevel),
+            }
+            if isinstance(distrib, FiniteMeasure)
+            else {
+                "kind": (
+                    "scalar"
+                    if is_numeric(distrib)
+                    else "string"
+                    if isinstance(distrib, str)
+                    else "tuple"
+                    if isinstance(distrib, TupleValue)
+                    else "record"
+                    if isinstance(distrib, RecordValue)
+                    else type(distrib).__name__
+                ),
+                "value": serialize_embedded_value(
+                    distrib,
+                    roundlevel,
+                    probability_mode=probability_mode,
+                ),
+            }
+        ),
+    }
+
+
+def serialize_result(result, roundlevel=0, probability_mode="raw"):
+    if isinstance(result, Distributions):
+        distribution_only = _is_distribution_only(result)
         return {
             "type": "distributions" if distribution_only else "sweep",
-            "axes": axes,
-            "cells": cells,
+            "axes": serialize_axes(result, roundlevel, probability_mode=probability_mode),
+            "cells": [
+                serialize_cell(
+                    result.axes,
+                    coordinates,
+                    distrib,
+                    distribution_only,
+                    roundlevel,
+                    probability_mode=probability_mode,
+                )
+                for coordinates, distrib in result.cells.items()
+            ],
         }
     if isinstance(result, Distribution):
         return {
@@ -223,6 +244,42 @@ def serialize_result(result, roundlevel=0, probability_mode="raw"):
     return {"type": type(result).__name__, "value": str(result)}
 
 
+def iter_result_json_lines(result, roundlevel=0, probability_mode="raw"):
+    """Yield the result as compact NDJSON lines, one cell at a time.
+
+    Sweeps start with a header line holding the type, the axes and the cell
+    count, followed by one line per cell in serialize_result's cell format.
+    Other results are a single serialize_result line. Only one cell is
+    serialized at a time, so memory stays flat for large sweeps."""
+    if not isinstance(result, Distributions):
+        yield json.dumps(serialize_result(result, roundlevel, probability_mode=probability_mode), separators=(",", ":"))
+        return
+    distribution_only = _is_distribution_only(result)
+    cell_count = 1
+    for axis in result.axes:
+        cell_count *= len(axis.values)
+    yield json.dumps(
+        {
+            "type": "distributions" if distribution_only else "sweep",
+            "axes": serialize_axes(result, roundlevel, probability_mode=probability_mode),
+            "cell_count": cell_count,
+        },
+        separators=(",", ":"),
+    )
+    for coordinates, distrib in result.iter_items():
+        yield json.dumps(
+            serialize_cell(
+                result.axes,
+                coordinates,
+                distrib,
+                distribution_only,
+                roundlevel,
+                probability_mode=probability_mode,
+            ),
+            separators=(",", ":"),
+        )
+
+
 def format_result_json(result, roundlevel=0, probability_mode="raw"):
     return json.dumps(
         serialize_result(result, roundlevel, probability_mode=probability_mode),
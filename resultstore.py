@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+
+"""Opt-in persistent store for exact results across CLI runs."""
+
+from __future__ import annotations
+
+import hashlib
+import inspect
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import types
+
+from lexer import Token
+from syntaxtree import AST
+
+
+STORE_FORMAT_VERSION = 1
+STORE_FILENAME = "results.sqlite3"
+# Writes are batched into one transaction and committed every this many rows
+# and when the store is closed.
+STORE_COMMIT_INTERVAL = 256
+# Results depend on these modules' semantics, so their sources are part of the
+# engine version baked into every key.
+ENGINE_SOURCE_MODULES = (
+    "diceengine.py",
+    "exactprobability.py",
+    "hostfunctions.py",
+    "interpreter.py",
+    "executor.py",
+    "diceparser.py",
+    "lexer.py",
+    "syntaxtree.py",
+    "resultstore.py",
+)
+MISSING = object()
+_engine_version = None
+_function_fingerprints = {}
+_module_source_digests = {}
+
+
+class UnstableValueError(Exception):
+    """Raised when a value has no process-independent structural form."""
+
+
+def engine_version():
+    global _engine_version
+    if _engine_version is None:
+        digest = hashlib.sha256("store-format-{}".format(STORE_FORMAT_VERSION).encode("utf-8"))
+        root = os.path.dirname(os.path.abspath(__file__))
+        for module_name in ENGINE_SOURCE_MODULES:
+            with open(os.path.join(root, module_name), "rb") as handle:
+                digest.update(module_name.encode("utf-8"))
+                digest.update(handle.read())
+        _engine_version = digest.hexdigest()
+    return _engine_version
+
+
+def stable_form(value):
+    # Python's hash() is salted per process for strings, so persistent keys are
+    # derived from this canonical nested-tuple form instead.
+    import diceengine
+
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return (type(value).__name__, repr(value))
+    if isinstance(value, tuple):
+        return ("tuple", tuple(stable_form(item) for item in value))
+    if isinstance(value, diceengine.FiniteMeasure):
+        return (
+            type(value).__name__,
+            tuple((stable_form(outcome), repr(weight)) for outcome, weight in value.items()),
+        )
+    if isinstance(value, diceengine.Sweep):
+        return (
+            "Sweep",
+            tuple((axis.key, axis.name, stable_form(axis.values)) for axis in value.axes),
+            tuple((stable_form(coordinates), stable_form(cell)) for coordinates, cell in value.items()),
+        )
+    if isinstance(value, diceengine.SweepValues):
+        return ("SweepValues", value.key, value.name, stable_form(value.values))
+    if isinstance(value, diceengine.TupleValue):
+        return ("TupleValue", stable_form(value.items))
+    if isinstance(value, diceengine.RecordValue):
+        return ("RecordValue", tuple((key, stable_form(entry)) for key, entry in value.items()))
+    raise UnstableValueError(type(value).__name__)
+
+
+def stable_ast_form(node):
+    if isinstance(node, AST):
+        fields = []
+        for name, child in sorted(vars(node).items()):
+            fields.append((name, stable_ast_form(child)))
+        return (type(node).__name__, tuple(fields))
+    if isinstance(node, (list, tuple)):
+        return tuple(stable_ast_form(item) for item in node)
+    if isinstance(node, Token):
+        # Spans only locate the source text; they do not change semantics.
+        return ("Token", node.type, repr(node.value))
+    return repr(node)
+
+
+def stable_digest(value):
+    return hashlib.sha256(repr(stable_form(value)).encode("utf-8")).hexdigest()
+
+
+def _module_source_digest(module):
+    path = getattr(module, "__file__", None)
+    if not path or not path.endswith(".py"):
+        return None
+    try:
+        stat = os.stat(path)
+        cache_key = (path, stat.st_mtime_ns, stat.st_size)
+        digest = _module_source_digests.get(cache_key)
+        if digest is None:
+            with open(path, "rb") as handle:
+                digest = hashlib.sha256(handle.read()).hexdigest()
+            _module_source_digests[cache_key] = digest
+    except OSError:
+        return None
+    return digest
+
+
+def _dependency_modules(function):
+    # A function's own source does not cover the helpers it calls, so the
+    # modules of its globals (and its own module) are fingerprinted too.
+    modules = {}
+    module = sys.modules.get(getattr(function, "__module__", None) or "")
+    if module is not None:
+        modules[module.__name__] = module
+    code = getattr(function, "__code__", None)
+    function_globals = getattr(function, "__globals__", {})
+    pending = [code] if code is not None else []
+    names = set()
+    while pending:
+        code = pending.pop()
+        names.update(code.co_names)
+        pending.extend(const for const in code.co_consts if isinstance(const, types.CodeType))
+    for name in names:
+        value = function_globals.get(name)
+        if isinstance(value, types.ModuleType):
+            module = value
+        else:
+            module = sys.modules.get(getattr(value, "__module__", None) or "")
+        if module is not None:
+            modules[module.__name__] = module
+    return [modules[name] for name in sorted(modules)]
+
+
+def function_fingerprint(function):
+    fingerprint = _function_fingerprints.get(function)
+    if fingerprint is None:
+        try:
+            source = inspect.getsource(function)
+        except (OSError, TypeError):
+            code = getattr(function, "__code__", None)
+            source = repr((code.co_code, code.co_consts)) if code is not None else repr(function)
+        identity = "{}.{}".format(getattr(function, "__module__", ""), getattr(function, "__qualname__", ""))
+        digest = hashlib.sha256((identity + "\n" + source).encode("utf-8"))
+        for module in _dependency_modules(function):
+            module_digest = _module_source_digest(module)
+            if module_digest is not None:
+                digest.update("\0{}:{}".format(module.__name__, module_digest).encode("utf-8"))
+        fingerprint = digest.hexdigest()
+        _function_fingerprints[function] = fingerprint
+    return fingerprint
+
+
+class PersistentResultStore:
+    """SQLite-backed result store keyed by engine version, function and arguments."""
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, STORE_FILENAME)
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, payload BLOB NOT NULL)")
+        self._connection.commit()
+        self._lock = threading.Lock()
+        self._pending_writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def key(self, namespace, name, fingerprint, arguments):
+        try:
+            arguments_form = stable_form(tuple(arguments))
+        except UnstableValueError:
+            return None
+        import diceengine
+
+        # Exact and float probability modes produce different weights for the
+        # same call.
+        weights = "exact" if diceengine.exact_probabilities_enabled() else "float"
+        digest = hashlib.sha256()
+        for part in (engine_version(), weights, namespace, name, fingerprint, repr(arguments_form)):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            row = self._connection.execute("SELECT payload FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return MISSING
+        try:
+            value = pickle.loads(row[0])
+        except Exception:
+            self.misses += 1
+            return MISSING
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        try:
+            payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return
+        with self._lock:
+            self._connection.execute("INSERT OR REPLACE INTO results (key, payload) VALUES (?, ?)", (key, payload))
+            self.writes += 1
+            self._pending_writes += 1
+            if self._pending_writes >= STORE_COMMIT_INTERVAL:
+                self._connection.commit()
+                self._pending_writes = 0
+
+    def flush(self):
+        with self._lock:
+            self._connection.commit()
+            self._pending_writes = 0
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._connection.close()
+
+    def stats(self):
+        return {"path": self.path, "hits": self.hits, "misses": self.misses, "writes": self.writes}
+
+
+def open_result_store(directory):
+    return PersistentResultStore(directory)
@@ -224,6 +224,18 @@ class Named(AST):
         return result
 
 
+class Hoisted(AST):
+    """Split subexpression evaluated once and reused across bound outcomes."""
+    def __init__(self, value):
+        self.value = value
+        self.token = getattr(value, "token", getattr(value, "token1", None))
+
+    def __repr__(self):
+        result = "Hoisted:"
+        result += '\t|'.join(('\n' + "value: " + str(self.value).lstrip()).splitlines(True))
+        return result
+
+
 class RangeLiteral(AST):
     """Finite range literal with configurable end inclusivity."""
 
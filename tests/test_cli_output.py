@@ -1,8 +1,10 @@
 import io
 import json
 import os
+import subprocess
 import sys
 import tempfile
+import threading
 import unittest
 from pathlib import Path
 from types import SimpleNamespace
@@ -20,8 +22,8 @@ if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
 import dice
-from dice import interpret_statement
-from diceengine import Distribution, FiniteMeasure, Sweep
+from dice import interpret_file, interpret_statement
+from diceengine import Distribution, FiniteMeasure, Sweep, SweepValues
 from interpreter import Interpreter
 
 
@@ -475,6 +477,25 @@ class CliMainIntegrationTest(unittest.TestCase):
         finally:
             os.unlink(path)
 
+    def test_main_cache_dir_persists_results_and_detaches_store(self):
+        from hostfunctions import RESULT_CACHE
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            path = Path(tempdir) / "cached.dice"
+            path.write_text("best(bonus): (d20 + bonus) ^ 2\nbest(3)\n", encoding="utf-8")
+            cache_dir = Path(tempdir) / "cache"
+            outputs = []
+            for _ in range(2):
+                RESULT_CACHE.clear()
+                with mock.patch.object(sys, "argv", ["dice.py", "--json", "--cache-dir", str(cache_dir), "-f", str(path)]):
+                    with mock.patch("sys.stdout", new=io.StringIO()) as stdout:
+                        exit_code = dice.main()
+                self.assertEqual(exit_code, 0)
+                outputs.append(json.loads(stdout.getvalue()))
+            self.assertEqual(outputs[0], outputs[1])
+            self.assertTrue((cache_dir / "results.sqlite3").exists())
+            self.assertIsNone(RESULT_CACHE.persistent_store)
+
     def test_main_prints_formatted_errors_for_bad_commands(self):
         with mock.patch.object(sys, "argv", ["dice.py", "1", "+"]):
             with mock.patch("sys.stdout", new=io.StringIO()) as stdout:
@@ -486,6 +507,181 @@ class CliMainIntegrationTest(unittest.TestCase):
         self.assertIn("<command>:1:4", stderr.getvalue())
         self.assertIn("hint:", stderr.getvalue())
 
+    def test_serve_answers_json_lines_on_warm_isolated_sessions(self):
+        requests = [
+            {"id": 1, "program": "bonus = 2\nd20 + bonus"},
+            {"id": 2, "program": "bonus = 3\nlongsword_attack(16, 7, 4) $ mean"},
+            {"id": 3, "program": "1 +"},
+            {"op": "stats"},
+        ]
+        stdin = io.StringIO("".join(json.dumps(request) + "\n" for request in requests) + "not json\n")
+        with mock.patch.object(sys, "argv", ["dice.py", "--serve", "--sessions", "1", "--preload", 'import "std:dnd/weapons"']):
+            with mock.patch("sys.stdin", new=stdin), mock.patch("sys.stdout", new=io.StringIO()) as stdout:
+                exit_code = dice.main()
+        self.assertEqual(exit_code, 0)
+        responses = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual([response["id"] for response in responses], [1, 2, 3, None, None])
+        self.assertEqual(responses[0]["result"]["distribution"][0], {"outcome": 3, "probability": 0.05})
+        expected = dice._serialize_result(
+            interpret_file('import "std:dnd/weapons"\nlongsword_attack(16, 7, 4) $ mean'),
+            probability_mode="raw",
+        )
+        self.assertEqual(responses[1]["result"], expected)
+        self.assertFalse(responses[2]["ok"])
+        self.assertIn("<request>:1:4", responses[2]["error"])
+        self.assertEqual(responses[3]["stats"]["sessions"], 1)
+        self.assertIn("invalid JSON request", responses[4]["error"])
+
+    def test_serve_http_listener_answers_posted_requests(self):
+        from urllib.request import urlopen
+
+        from diceserver import SessionPool, make_server
+
+        pool = SessionPool(lambda: dice.DiceSession(), size=2)
+        server = make_server(pool, "http://127.0.0.1:0")
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            url = "http://127.0.0.1:{}/".format(server.server_address[1])
+            body = b'{"id": "a", "program": "d6 $ mean"}\n{"id": "b", "program": "x ="}\n'
+            with urlopen(url, data=body) as reply:
+                responses = [json.loads(line) for line in reply.read().decode("utf-8").splitlines()]
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(responses[0]["result"], {"type": "distribution", "distribution": [{"outcome": 3.5, "probability": 1.0}]})
+        self.assertEqual(responses[1]["id"], "b")
+        self.assertFalse(responses[1]["ok"])
+
+    def test_threaded_requests_stop_at_the_timeout_and_free_their_session(self):
+        from diceserver import SessionPool
+
+        pool = SessionPool(dice.DiceSession, size=1)
+        responses = []
+
+        def run():
+            for program in ("[1..300] + [1..300] + d100", "split d 20000 as r | r >= 2 -> r + d6 | otherwise -> 0"):
+                responses.append(pool.handle({"id": "slow", "program": program}))
+            responses.append(pool.handle({"id": "next", "program": "d6 $ mean"}))
+
+        with mock.patch.object(dice, "timeout_seconds", 0.2):
+            thread = threading.Thread(target=run)
+            thread.start()
+            thread.join(30)
+        self.assertFalse(thread.is_alive())
+        for response in responses[:2]:
+            self.assertFalse(response["ok"])
+            self.assertIn("timed out", response["error"])
+            self.assertLess(response["elapsed_ms"], 3000)
+        self.assertEqual(responses[2]["result"]["distribution"], [{"outcome": 3.5, "probability": 1.0}])
+
+    def test_batch_streams_results_with_bindings_and_worker_pool(self):
+        from dicebatch import run_batch
+
+        lines = [
+            json.dumps({"id": "fighter", "program": "d20 + bonus >= ac", "bindings": {"bonus": 5, "ac": 16}}),
+            json.dumps({"program": "d20 + bonus >= ac", "bindings": {"bonus": 2, "ac": [10, 15]}}),
+            "",
+            json.dumps({"program": "1 +"}),
+        ]
+        with tempfile.TemporaryDirectory() as tempdir:
+            path = Path(tempdir) / "builds.jsonl"
+            path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+            with mock.patch.object(sys, "argv", ["dice.py", "--batch", str(path)]):
+                with mock.patch("sys.stdout", new=io.StringIO()) as stdout, mock.patch("sys.stderr", new=io.StringIO()) as stderr:
+                    exit_code = dice.main()
+        self.assertEqual(exit_code, 1)
+        self.assertIn("batch: 3 items, 1 failed", stderr.getvalue())
+        responses = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual([response["id"] for response in responses], ["fighter", 2, 4])
+        self.assertEqual(responses[0]["result"]["distribution"][1]["outcome"], 1)
+        self.assertAlmostEqual(responses[0]["result"]["distribution"][1]["probability"], 0.5)
+        self.assertEqual(responses[1]["result"]["axes"][0]["values"], [10, 15])
+        self.assertIn("<request>:1:4", responses[2]["error"])
+        self.assertTrue(all(response["elapsed_ms"] >= 0 for response in responses))
+
+        output = io.StringIO()
+        items, failures = run_batch(io.StringIO("\n".join(lines)), output, dice.DiceSession, workers=2)
+        self.assertEqual((items, failures), (3, 1))
+        # Timings and per-process sweep axis keys differ between runs.
+        def strip(value):
+            if isinstance(value, dict):
+                return {key: strip(item) for key, item in value.items() if key not in ("elapsed_ms", "key", "axis_key")}
+            if isinstance(value, list):
+                return [strip(item) for item in value]
+            return value
+
+        self.assertEqual(
+            [strip(json.loads(line)) for line in output.getvalue().splitlines()],
+            [strip(response) for response in responses],
+        )
+
+    def test_warm_sessions_keep_cached_sweep_axes_apart_from_new_literals(self):
+        from dicebatch import run_batch
+        from diceserver import SessionPool
+
+        pool = SessionPool(dice.DiceSession, size=1, preload=["f(x): x + [1..3]"])
+        pool.handle({"id": 1, "program": "f(1)"})
+        response = pool.handle({"id": 2, "program": "[10, 20] + f(1)"})
+        self.assertTrue(response["ok"], response.get("error"))
+        self.assertEqual([axis["values"] for axis in response["result"]["axes"]], [[10, 20], [1, 2, 3]])
+        self.assertEqual(len(response["result"]["cells"]), 6)
+
+        lines = "\n".join(json.dumps({"program": program}) for program in ("f(1)", "[10, 20] + f(1)"))
+        output = io.StringIO()
+        self.assertEqual(run_batch(io.StringIO(lines), output, dice.DiceSession, preload=["f(x): x + [1..3]"]), (2, 0))
+        self.assertEqual(len(json.loads(output.getvalue().splitlines()[1])["result"]["cells"]), 6)
+
+    def test_exact_probabilities_text_output_reports_float_weights(self):
+        outputs = {}
+        for flags in ([], ["--exact-probabilities"]):
+            for program in ("cum(2d6)", "surv(d4 + [A:1, 2] + [B:0, 1])"):
+                with mock.patch.object(sys, "argv", ["dice.py"] + flags + [program]):
+                    with mock.patch("sys.stdout", new=io.StringIO()) as stdout:
+                        try:
+                            self.assertEqual(dice.main(), 0)
+                        finally:
+                            dice.set_exact_probabilities(False)
+                outputs[tuple(flags), program] = stdout.getvalue()
+        self.assertIn("2: 0.027777777777777776", outputs[("--exact-probabilities",), "cum(2d6)"])
+        self.assertEqual(
+            outputs[("--exact-probabilities",), "surv(d4 + [A:1, 2] + [B:0, 1])"],
+            outputs[(), "surv(d4 + [A:1, 2] + [B:0, 1])"],
+        )
+        for output in outputs.values():
+            self.assertNotIn("ExactProbability", output)
+
+    def test_json_stream_writes_axis_header_then_one_line_per_cell(self):
+        outputs = {}
+        for flag in ("--json", "--json-stream"):
+            SweepValues.counter = 0
+            with mock.patch.object(sys, "argv", ["dice.py", flag, "d4 + [LEVEL:1..3] + [BONUS:0, 10]"]):
+                with mock.patch("sys.stdout", new=io.StringIO()) as stdout:
+                    self.assertEqual(dice.main(), 0)
+            outputs[flag] = stdout.getvalue()
+        full = json.loads(outputs["--json"])
+        lines = outputs["--json-stream"].splitlines()
+        header = json.loads(lines[0])
+        self.assertEqual(header, {"type": full["type"], "axes": full["axes"], "cell_count": 6})
+        self.assertEqual([json.loads(line) for line in lines[1:]], full["cells"])
+        self.assertNotIn("\n ", outputs["--json-stream"])
+
+    def test_one_shot_text_and_json_runs_skip_renderer_and_readline_imports(self):
+        script = (
+            "import sys; sys.argv = ['dice.py'] + sys.argv[1:]; import dice; code = dice.main(); "
+            "heavy = sorted({'matplotlib', 'numpy', 'readline', 'timeout_decorator'} & set(sys.modules)); "
+            "print(heavy); sys.exit(code)"
+        )
+        for arguments in (["d20 + 5"], ["--json", "d20 + 5"]):
+            completed = subprocess.run(
+                [sys.executable, "-c", script] + arguments,
+                cwd=ROOT,
+                capture_output=True,
+                text=True,
+            )
+            self.assertEqual(completed.returncode, 0, completed.stderr)
+            self.assertEqual(completed.stdout.splitlines()[-1], "[]")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,8 +1,10 @@
 import os
 import sys
+from fractions import Fraction
 import tempfile
 import unittest
 from pathlib import Path
+from unittest import mock
 
 
 ROOT = Path(__file__).resolve().parents[1]
@@ -15,7 +17,8 @@ os.environ.setdefault("MPLCONFIGDIR", str(mpl_config))
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from diceengine import FALSE, TRUE, Distribution, FiniteMeasure, Sweep, SweepValues, add, cum, greaterorequal, mean, repeat_sum, rollsingle, std, surv, total, var
+import diceengine
+from diceengine import FALSE, TRUE, Distribution, FiniteMeasure, Sweep, SweepValues, add, cum, greater, greaterorequal, mean, mul, repeat_sum, rollsingle, std, sub, surv, total, var
 
 
 def only_distribution(result):
@@ -77,6 +80,184 @@ class DiceengineLibraryTest(unittest.TestCase):
         self.assertAlmostEqual(result[1], 0.75)
         self.assertAlmostEqual(result[4], 0.0)
 
+    def test_dense_sub_and_scalar_mul_keep_integer_support(self):
+        difference = only_distribution(sub(rollsingle(6), rollsingle(4)))
+        self.assertAlmostEqual(difference[-3], 1 / 24)
+        self.assertAlmostEqual(difference[5], 1 / 24)
+        self.assertAlmostEqual(difference[1], 4 / 24)
+        scaled = only_distribution(mul(-3, rollsingle(4)))
+        self.assertEqual(sorted(scaled.keys()), [-12, -9, -6, -3])
+        self.assertAlmostEqual(scaled[-6], 0.25)
+
+    def test_dense_comparison_masses_stay_non_negative(self):
+        damage = repeat_sum(40, rollsingle(10))
+        result = only_distribution(greater(damage, 220))
+        self.assertGreaterEqual(result[TRUE], 0.0)
+        self.assertGreaterEqual(result[FALSE], 0.0)
+        self.assertAlmostEqual(result[TRUE] + result[FALSE], 1.0)
+        self.assertAlmostEqual(only_distribution(greater(damage, 400))[FALSE], 1.0)
+
+    def test_dense_distribution_equals_entry_built_distribution(self):
+        dense = only_distribution(rollsingle(4))
+        explicit = Distribution(((1, 0.25), (2, 0.25), (3, 0.25), (4, 0.25)))
+        self.assertEqual(dense, explicit)
+        self.assertEqual(hash(dense), hash(explicit))
+        self.assertEqual(dense.entries, explicit.entries)
+
+    def test_fft_convolution_matches_direct_convolution(self):
+        left = tuple(1 / 300 for _ in range(300))
+        right = tuple((index + 1) / 45150 for index in range(300))
+        direct = [0.0] * 599
+        for left_index, left_weight in enumerate(left):
+            for right_index, right_weight in enumerate(right):
+                direct[left_index + right_index] += left_weight * right_weight
+        for numpy_module in (diceengine._optional_module("numpy"), None):
+            with mock.patch.dict(diceengine._optional_modules, {"numpy": numpy_module}):
+                result = diceengine._fft_convolve_dense_weights(left, right)
+            self.assertEqual(len(result), len(direct))
+            self.assertTrue(all(weight >= 0.0 for weight in result))
+            for actual, wanted in zip(result, direct):
+                self.assertAlmostEqual(actual, wanted, delta=1e-13)
+
+    def test_large_repeat_sum_uses_normalized_fft_result(self):
+        result = only_distribution(repeat_sum(40, rollsingle(100)))
+        self.assertAlmostEqual(result.average(), 40 * 50.5, places=6)
+        self.assertAlmostEqual(sum(weight for _, weight in result.entries), 1.0, places=9)
+        self.assertTrue(all(weight > 0.0 for _, weight in result.entries))
+
+    def test_large_repeat_sum_keeps_tail_mass(self):
+        result = only_distribution(repeat_sum(2000, rollsingle(6)))
+        self.assertAlmostEqual(sum(weight for _, weight in result.entries), 1.0, places=12)
+        self.assertAlmostEqual(result.average(), 7000, places=6)
+
+    def test_repeat_sum_power_matches_repeated_add_with_holes(self):
+        attack = Distribution(((0, 0.4), (3, 0.3), (4, 0.2), (9, 0.1)))
+        expected = attack
+        for _ in range(6):
+            expected = only_distribution(add(expected, attack))
+        result = only_distribution(repeat_sum(7, attack))
+        self.assertEqual(sorted(result.keys()), sorted(expected.keys()))
+        for outcome in expected.keys():
+            self.assertAlmostEqual(result[outcome], expected[outcome], places=12)
+
+    def test_sweep_lookup_covers_row_major_and_explicit_cells(self):
+        rows = SweepValues([1, 2], name="row").axis()
+        cols = SweepValues(["a", "b", "c"], name="col").axis()
+        row_major = Sweep((rows, cols), {(row, col): "{}{}".format(row, col) for row in (1, 2) for col in "abc"})
+        reordered = Sweep((rows, cols), {(row, col): "{}{}".format(row, col) for col in "abc" for row in (1, 2)})
+        for sweep in (row_major, reordered):
+            self.assertEqual(sweep.cells[(2, "b")], "2b")
+            self.assertEqual(sweep.lookup((cols, rows), ("c", 1)), "1c")
+            self.assertEqual(len(sweep.items()), 6)
+        self.assertEqual(row_major.values(), ("1a", "1b", "1c", "2a", "2b", "2c"))
+        self.assertEqual(row_major.items()[4], ((2, "b"), "2b"))
+        cells = row_major.cells
+        cells[(1, "a")] = "changed"
+        self.assertEqual(row_major.cell((1, "a")), "1a")
+
+    def test_row_major_sweep_lookups_do_not_build_cell_pairs(self):
+        rows = SweepValues([1, 2], name="row").axis()
+        cols = SweepValues(["a", "b", "c"], name="col").axis()
+        sweep = Sweep._from_row_major((rows, cols), ("1a", "1b", "1c", "2a", "2b", "2c"))
+        self.assertEqual(sweep.cell((2, "a")), "2a")
+        self.assertEqual(sweep.lookup((cols, rows), ("c", 1)), "1c")
+        project = diceengine._cell_projector(sweep, (cols, rows))
+        self.assertEqual([project((col, 2)) for col in "abc"], ["2a", "2b", "2c"])
+        self.assertEqual(sweep, Sweep((rows, cols), dict(zip(diceengine._coordinates_space((rows, cols)), sweep.values()))))
+        self.assertIsNone(sweep._cells)
+        self.assertIsNone(sweep._cell_index)
+        with self.assertRaises(KeyError):
+            sweep.cell((3, "a"))
+
+    def test_pure_lifts_run_once_per_distinct_projected_cells(self):
+        shared = Distribution(((4, 0.5), (8, 0.5)))
+        levels = SweepValues([1, 2, 3], name="level").axis()
+        broadcast = Sweep((levels,), {(level,): shared for level in (1, 2, 3)})
+        factors = Sweep.from_values(SweepValues([10, 100], name="factor"))
+        for pure, expected_calls in ((True, 2), (False, 6)):
+            calls = []
+
+            def scaled(value, factor):
+                calls.append((value, factor))
+                return mul(value, factor)
+
+            result = diceengine._lift_cellwise(scaled, broadcast, factors, pure=pure)
+            self.assertEqual(len(calls), expected_calls)
+            self.assertEqual(result.cell((3, 100)), mul(shared, 100))
+
+    def test_dice_and_constants_are_interned_by_type(self):
+        self.assertIs(diceengine._uniform_die_distribution(20), diceengine._uniform_die_distribution(20))
+        integer_constant = diceengine._deterministic_distribution(1)
+        float_constant = diceengine._deterministic_distribution(1.0)
+        self.assertIs(integer_constant, diceengine._deterministic_distribution(1))
+        self.assertIsNot(integer_constant, float_constant)
+        self.assertIsInstance(integer_constant.keys()[0], int)
+        self.assertIsInstance(float_constant.keys()[0], float)
+
+    def test_structural_hash_is_computed_once(self):
+        distribution = Distribution(((1, 0.25), (2, 0.5), (3, 0.25)))
+        self.assertIsNone(distribution._hash)
+        first = hash(distribution)
+        self.assertEqual(distribution._hash, first)
+        self.assertEqual(hash(Distribution(distribution.entries)), first)
+
+    def test_measure_builder_matches_canonical_construction(self):
+        entries = ((2, 0.25), (1, 0.0), (1, 0.25), (2, 0.25), (3, 0.25))
+        builder = diceengine.MeasureBuilder()
+        for outcome, weight in entries:
+            builder.add(outcome, weight)
+        built = builder.build()
+        canonical = Distribution(entries)
+        self.assertEqual(built, canonical)
+        self.assertEqual(built.entries, ((2, 0.5), (1, 0.25), (3, 0.25)))
+        self.assertIsInstance(builder.build(FiniteMeasure), FiniteMeasure)
+        builder.add(4, 0.5)
+        with self.assertRaises(Exception):
+            builder.build()
+        with self.assertRaisesRegex(diceengine.DiceRuntimeError, "measure outcomes must be hashable"):
+            Distribution(((["unhashable"], 1.0),))
+        with self.assertRaisesRegex(diceengine.DiceRuntimeError, "measure outcomes must be hashable"):
+            diceengine.MeasureBuilder().add(["unhashable"], 1.0)
+
+    def test_threshold_sweep_comparison_matches_cellwise_lifting(self):
+        damage = add(repeat_sum(3, rollsingle(6)), Distribution(((0, 0.5), (2.5, 0.5))))
+        thresholds = SweepValues(list(range(0, 25)) + [7.5], name="AC")
+        for operator, function in ((">=", greaterorequal), (">", greater), ("<=", diceengine.lessorequal), ("<", diceengine.less), ("==", diceengine.equal)):
+            for left, right in ((damage, thresholds), (thresholds, damage)):
+                swept = diceengine.compare_with(function, left, right, operator)
+                lifted = function(left, right)
+                self.assertEqual(swept.axes, lifted.axes)
+                for (_, swept_cell), (_, lifted_cell) in zip(swept.items(), lifted.items()):
+                    self.assertEqual(set(swept_cell.keys()), set(lifted_cell.keys()))
+                    for outcome in lifted_cell.keys():
+                        self.assertAlmostEqual(swept_cell[outcome], lifted_cell[outcome], places=12)
+        scaled = mul(rollsingle(20), 1.5)
+        swept = diceengine.compare_with(greaterorequal, scaled, SweepValues(range(1, 40), name="AC"), ">=")
+        self.assertTrue(all(weight >= 0 for cell in swept.values() for _, weight in cell.items()))
+        self.assertAlmostEqual(swept.cells[(15,)][TRUE], 0.55)
+
+    def test_exact_probabilities_keep_rational_weights(self):
+        with diceengine.exact_probabilities():
+            three_d_six = only_distribution(repeat_sum(3, rollsingle(6)))
+            self.assertEqual(three_d_six[10], Fraction(1, 8))
+            self.assertEqual(three_d_six.total_weight, 1)
+            self.assertTrue(all(isinstance(weight, Fraction) for _, weight in three_d_six.items()))
+            summed = only_distribution(add(add(rollsingle(6), rollsingle(6)), rollsingle(6)))
+            self.assertEqual(summed, three_d_six)
+            mixed = only_distribution(add(Distribution(((0, 0.3), (1, 0.7))), rollsingle(4)))
+            self.assertEqual(mixed[1], Fraction(3, 40))
+            hit = only_distribution(greaterorequal(three_d_six, 10))
+            self.assertEqual(hit[TRUE], Fraction(5, 8))
+            self.assertEqual(only_distribution(mean(three_d_six))[10.5], 1)
+        self.assertFalse(diceengine.exact_probabilities_enabled())
+        self.assertIsInstance(only_distribution(rollsingle(6))[1], float)
+
+    def test_axis_positions_cache_stays_bounded(self):
+        with mock.patch.object(diceengine, "AXIS_POSITIONS_CACHE_LIMIT", 8):
+            for _ in range(20):
+                add(Sweep.from_values(SweepValues([1, 2])), Sweep.from_values(SweepValues([3, 4])))
+            self.assertLessEqual(len(diceengine._axis_positions_cache), 8)
+
 
 if __name__ == "__main__":
     unittest.main()
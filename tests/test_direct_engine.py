@@ -15,9 +15,9 @@ os.environ.setdefault("MPLCONFIGDIR", str(mpl_config))
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from directdiceengine import DirectExecutor, direct_sample
+from directdiceengine import BatchDirectExecutor, DirectExecutor, direct_sample, direct_sample_batch, exact_evaluate, monte_carlo_validate
 from dice import interpret_statement
-from diceengine import FALSE, TRUE, Distribution, FiniteMeasure, Sweep
+from diceengine import FALSE, TRUE, Distribution, FiniteMeasure, Sweep, SweepValues, _optional_module
 
 
 def only_distribution(result):
@@ -92,5 +92,57 @@ class DirectEngineSmokeTest(unittest.TestCase):
         self.assertTrue(set(distrib.keys()).issubset({TRUE, FALSE}))
 
 
+@unittest.skipUnless(_optional_module("numpy") is not None, "batch sampling requires NumPy")
+class BatchDirectEngineTest(unittest.TestCase):
+    def test_batch_backend_preserves_sweep_shape(self):
+        result = direct_sample_batch("d20 >= [5..7]", 500, seed=123)
+        self.assertEqual(result.axes[0].values, (5, 6, 7))
+        for distrib in result.cells.values():
+            self.assertAlmostEqual(distrib.total_probability(), 1)
+            self.assertTrue(set(distrib.keys()).issubset({TRUE, FALSE}))
+
+    def test_batch_backend_redraws_each_variable_reference(self):
+        result = only_distribution(direct_sample_batch("x = d6; x + x", 20000, seed=123))
+        expected = only_distribution(exact_evaluate("x = d6; x + x"))
+        self.assertIn(3, result.keys())
+        self.assertAlmostEqual(result[7], expected[7], delta=0.02)
+
+    def test_batch_backend_sums_independent_repeats(self):
+        result = only_distribution(direct_sample_batch("d6 ^ 3", 20000, seed=123))
+        self.assertIn(4, result.keys())
+        self.assertAlmostEqual(result[10], 27 / 216, delta=0.02)
+
+    def test_batch_elementwise_lifts_share_results_but_rolls_draw_per_cell(self):
+        executor = BatchDirectExecutor(200, seed=123)
+        levels = SweepValues([1, 2, 3], name="level").axis()
+        shared = executor.roll(1, 6).only_value()
+        result = executor.add(Sweep((levels,), {(level,): shared for level in (1, 2, 3)}), 2)
+        self.assertIs(result.cell((1,)), result.cell((3,)))
+        rolls = executor.roll(Sweep((levels,), {(level,): 1 for level in (1, 2, 3)}), 6)
+        self.assertIsNot(rolls.cell((1,)), rolls.cell((3,)))
+        self.assertFalse((rolls.cell((1,)).samples == rolls.cell((3,)).samples).all())
+
+    def test_batch_redraws_are_fresh_samples(self):
+        executor = BatchDirectExecutor(300, seed=123)
+        original = executor.add(executor.roll(1, 6), executor.roll(1, 4)).only_value()
+        redrawn = executor.redraw(original)
+        self.assertNotEqual(sorted(original.samples.tolist()), sorted(redrawn.samples.tolist()))
+        self.assertTrue(set(redrawn.samples.tolist()) <= set(range(2, 11)))
+        deep = only_distribution(direct_sample_batch("x = d6 ^ 1500; x + x", 50, seed=123))
+        self.assertTrue(all(3000 <= outcome <= 18000 for outcome in deep.keys()))
+
+    def test_dense_batch_supports_threshold_lookups(self):
+        result = only_distribution(direct_sample_batch("d20 + 3", 2000, seed=123))
+        self.assertIsNotNone(result._dense_integer_view())
+        self.assertIsNotNone(result._threshold_table())
+        at_least = only_distribution(direct_sample_batch("d20 + 3 >= 13", 2000, seed=123))
+        self.assertAlmostEqual(at_least[TRUE], sum(result[value] for value in result.keys() if value >= 13))
+
+    def test_batch_validation_matches_exact_split(self):
+        text = "f(a): a + a\nsplit d20 as r | r == 20 -> 2d6 + r | r + d4 >= 11 -> f(r + d4) || "
+        report = monte_carlo_validate(text, min_samples=4000, max_samples=20000, tolerance=0.02, seed=5)
+        self.assertTrue(report["passed"], report["metrics"])
+
+
 if __name__ == "__main__":
     unittest.main()
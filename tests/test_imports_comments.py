@@ -15,6 +15,7 @@ os.environ.setdefault("MPLCONFIGDIR", str(mpl_config))
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
+from astcache import AST_CACHE
 from dice import interpret_file, interpret_statement
 from diceengine import Distribution, FiniteMeasure, Sweep, TRUE, FALSE
 
@@ -73,6 +74,27 @@ class ImportAndCommentTest(unittest.TestCase):
             self.assertAlmostEqual(distribution[TRUE], 0.5)
             self.assertAlmostEqual(distribution[FALSE], 0.5)
 
+    def test_import_reuses_cached_tree_until_file_changes(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            root = Path(tempdir)
+            helper = root / "combat.dice"
+            helper.write_text("hit(ac): d20 >= ac\n", encoding="utf-8")
+            AST_CACHE.set_directory(str(root / "cache"))
+            try:
+                interpret_file('import "combat.dice"\nhit(11)', current_dir=root)
+                AST_CACHE.clear()
+                result = interpret_file('import "combat.dice"\nhit(11)', current_dir=root)
+                self.assertEqual(AST_CACHE.stats()["disk_hits"], 1)
+                self.assertAlmostEqual(only_distribution(result)[TRUE], 0.5)
+                result = interpret_file('import "combat.dice"\nhit(11)', current_dir=root)
+                self.assertEqual(AST_CACHE.stats()["hits"], 1)
+                helper.write_text("hit(ac): d20 + 1 >= ac\n", encoding="utf-8")
+                os.utime(helper, ns=(0, 0))
+                result = interpret_file('import "combat.dice"\nhit(11)', current_dir=root)
+                self.assertAlmostEqual(only_distribution(result)[TRUE], 0.55)
+            finally:
+                AST_CACHE.set_directory(None)
+
     def test_nested_import_resolves_from_importing_file_directory(self):
         with tempfile.TemporaryDirectory() as tempdir:
             root = Path(tempdir)
@@ -1,8 +1,11 @@
+import contextlib
+import io
 import os
 import sys
 import tempfile
 import unittest
 from pathlib import Path
+from unittest import mock
 
 
 ROOT = Path(__file__).resolve().parents[1]
@@ -17,6 +20,7 @@ if str(ROOT) not in sys.path:
 
 from diceengine import Distribution, FiniteMeasure, Sweep, FALSE, TRUE
 from diceparser import DiceParser
+from hostfunctions import RESULT_CACHE
 from interpreter import Interpreter
 from lexer import Lexer
 
@@ -132,6 +136,64 @@ class InterpreterFunctionScopeTest(unittest.TestCase):
         self.assertIn("Unknown function bonus", str(error.exception))
         self.assertIn("bonus is a variable, not a function.", str(error.exception))
 
+    def test_compiled_evaluation_matches_visitor_dispatch(self):
+        text = "bonus = 2\nhit(ac): d20 + bonus >= ac\nsplit d6 as roll | roll >= 5 -> d4 ^ 2 + roll | otherwise -> -roll + hit(12)"
+        ast = DiceParser(Lexer(text)).parse()
+        compiled = Interpreter(ast)
+        with contextlib.redirect_stdout(io.StringIO()):
+            visited = Interpreter(ast, debug=True).interpret()
+        self.assertEqual(only_distribution(compiled.interpret()), only_distribution(visited))
+        self.assertTrue(compiled._compiled)
+        compiled_nodes = len(compiled._compiled)
+        compiled.visit(ast.nodes[-1])
+        self.assertEqual(len(compiled._compiled), compiled_nodes)
+
+    def test_per_node_caches_release_earlier_programs(self):
+        interpreter = Interpreter(DiceParser(Lexer("f(x): x + d4")).parse())
+        interpreter.interpret()
+        sizes = []
+        for bonus in range(40):
+            interpreter.ast = DiceParser(Lexer("split d20 as r | r >= 11 -> f(r) + {} | otherwise -> 0".format(bonus))).parse()
+            interpreter.interpret()
+            sizes.append(
+                tuple(len(cache) for cache in (interpreter._compiled, interpreter._closed_keys, interpreter._split_plans, interpreter._split_lowerings))
+            )
+        self.assertEqual(sizes[-1], sizes[1])
+        self.assertAlmostEqual(only_distribution(interpreter.interpret())[0], 0.5)
+
+    def test_identical_closed_subexpressions_are_evaluated_once(self):
+        ast = DiceParser(Lexer("bonus = 1\n(d20 + 2 d 6) + (d20 + 2 d 6) + d20 + bonus + [1..2] + [1..2]")).parse()
+        interpreter = Interpreter(ast)
+        rollsingle = interpreter.executor.rollsingle
+        with mock.patch.object(interpreter.executor, "rollsingle", side_effect=rollsingle) as calls:
+            result = interpreter.interpret()
+        self.assertEqual(calls.call_count, 1)
+        self.assertEqual(len(result.axes), 2)
+        with contextlib.redirect_stdout(io.StringIO()):
+            visited = Interpreter(ast, debug=True).interpret()
+        self.assertEqual(
+            [only_distribution(cell) for _, cell in result.items()],
+            [only_distribution(cell) for _, cell in visited.items()],
+        )
+
+    def test_shared_closed_subexpressions_are_bounded_and_cleared_with_the_result_cache(self):
+        ast = DiceParser(Lexer("(d20 + 2 d 6) + (d20 + 2 d 6)")).parse()
+        interpreter = Interpreter(ast)
+        rollsingle = interpreter.executor.rollsingle
+        with mock.patch.object(interpreter.executor, "rollsingle", side_effect=rollsingle) as calls:
+            interpreter.interpret()
+            interpreter.visit(ast)
+            self.assertEqual(calls.call_count, 1)
+            interpreter.executor.clear_result_cache()
+            interpreter.visit(ast)
+            self.assertEqual(calls.call_count, 2)
+        with mock.patch.object(RESULT_CACHE, "budget", 200):
+            RESULT_CACHE.clear()
+            for sides in range(2, 40):
+                interpret("(d{}) ^ 4".format(sides))
+            self.assertLessEqual(RESULT_CACHE.stats()["weight"], 200)
+        RESULT_CACHE.clear()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -118,6 +118,21 @@ class LexerWhitespaceTest(unittest.TestCase):
             [(ID, "spell"), ("LPAREN", "("), (ID, "slot_level"), ("ASSIGN", "="), (INTEGER, 3), ("RPAREN", ")")],
         )
 
+    def test_token_spans_track_lines_and_columns_across_comments_and_indentation(self):
+        lexer = Lexer('f(x): # note\n\t"a b" + x\n\ny')
+        spans = []
+        while True:
+            token = lexer.next_token()
+            if token.type == EOF:
+                break
+            if token.type in (ID, STRING):
+                span = token.span
+                spans.append((token.value, span.start_index, span.start_line, span.start_column, span.end_column))
+        self.assertEqual(
+            spans,
+            [("f", 0, 1, 1, 2), ("x", 2, 1, 3, 4), ("a b", 14, 2, 2, 7), ("x", 22, 2, 10, 11), ("y", 25, 4, 1, 2)],
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
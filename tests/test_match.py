@@ -15,7 +15,7 @@ os.environ.setdefault("MPLCONFIGDIR", str(mpl_config))
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from dice import interpret_file, interpret_statement
+from dice import dice_interpreter, dicefunction, interpret_file, interpret_statement
 from diceengine import Distribution, FiniteMeasure, Sweep
 from directdiceengine import DirectExecutor
 from interpreter import Interpreter
@@ -105,6 +105,76 @@ class SplitExpressionTest(unittest.TestCase):
         self.assertEqual(distrib.total_probability(), 1)
         self.assertTrue(set(distrib.keys()).issubset({0, 5, 10}))
 
+    def test_split_partitions_literal_range_guards(self):
+        result = only_distribution(
+            interpret_statement("split d20 as roll | roll <= 5 -> roll | 15 <= roll -> 100 | roll == 10 -> 50 | otherwise -> 0")
+        )
+        for outcome in range(1, 6):
+            self.assertAlmostEqual(result[outcome], 0.05)
+        self.assertAlmostEqual(result[100], 0.3)
+        self.assertAlmostEqual(result[50], 0.05)
+        self.assertAlmostEqual(result[0], 0.4)
+
+    def test_split_calls_uncached_host_bodies_for_each_matched_outcome(self):
+        session = dice_interpreter()
+        calls = []
+
+        @dicefunction
+        def damage(value):
+            calls.append(value)
+            return value
+
+        session.register_function(damage)
+        result = only_distribution(session("split d20 as roll | roll >= 11 -> damage(7) | roll + 2 >= 8 -> damage(3) ||"))
+        self.assertAlmostEqual(result[7], 0.5)
+        self.assertAlmostEqual(result[3], 0.25)
+        self.assertAlmostEqual(result[0], 0.25)
+        # Python functions without cache=True may be impure, so they are not
+        # hoisted out of the per-outcome evaluation.
+        self.assertEqual(sorted(calls), [3] * 10 + [7] * 10)
+
+    def test_split_does_not_hoist_uncached_host_calls_across_cells(self):
+        session = dice_interpreter()
+        calls = []
+
+        @dicefunction
+        def ready(value):
+            calls.append(("ready", value))
+            return value
+
+        @dicefunction
+        def damage(value):
+            calls.append(("damage", value))
+            return value
+
+        session.register_function(ready)
+        session.register_function(damage)
+        result = session("split [1..3] d 6 as roll | ready(1) == 1 -> roll + damage(2) ||")
+        self.assertEqual(result.axes[0].values, (1, 2, 3))
+        self.assertAlmostEqual(result.cells[(1,)][3], 1 / 6)
+        # One call per outcome of 1d6, 2d6 and 3d6.
+        self.assertEqual(calls.count(("ready", 1)), 6 + 11 + 16)
+        self.assertEqual(calls.count(("damage", 2)), 6 + 11 + 16)
+
+    def test_split_keeps_sweep_axes_of_unreached_clauses(self):
+        result = interpret_file("bonus = [BONUS:1, 2]\nsplit d6 as roll | roll >= 1 -> 1 | otherwise -> bonus")
+        self.assertEqual(result.axes[0].name, "BONUS")
+        for distrib in result.cells.values():
+            self.assertAlmostEqual(distrib[1], 1)
+
+    def test_split_keeps_sweep_axes_of_guards_that_catch_no_outcome(self):
+        for clauses, expected in (
+            ("| r == 10 -> A | otherwise -> 0", {0: 1}),
+            ("| r == 3 -> 1 | r == 10 -> A | otherwise -> 0", {0: 5 / 6, 1: 1 / 6}),
+            ("| r <= 6 -> 1 | r == 10 -> A", {1: 1}),
+        ):
+            with self.subTest(clauses=clauses):
+                result = interpret_file("A = [A:1, 2]\nsplit d6 as r " + clauses)
+                self.assertEqual([axis.name for axis in result.axes], ["A"])
+                for distrib in result.cells.values():
+                    for outcome, probability in expected.items():
+                        self.assertAlmostEqual(distrib[outcome], probability)
+
 
 if __name__ == "__main__":
     unittest.main()
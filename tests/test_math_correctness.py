@@ -51,6 +51,27 @@ class MathCorrectnessTest(unittest.TestCase):
         with self.assertRaises(Exception):
             interpret_statement("2d6l3")
 
+    def test_rollhigh_matches_known_four_d_six_drop_lowest(self):
+        result = only_distribution(interpret_statement("4d6h3"))
+        self.assertAlmostEqual(result[3], 1 / 1296)
+        self.assertAlmostEqual(result[18], 21 / 1296)
+        self.assertAlmostEqual(result.average(), 15869 / 1296)
+
+    def test_rolllow_matches_rollhigh_mirror(self):
+        high = only_distribution(interpret_statement("5d8h2"))
+        low = only_distribution(interpret_statement("5d8l2"))
+        for outcome in high.keys():
+            self.assertAlmostEqual(low[18 - outcome], high[outcome])
+
+    def test_rollhigh_handles_many_dice(self):
+        result = only_distribution(interpret_statement("10d10h4"))
+        self.assertAlmostEqual(sum(weight for _, weight in result.items()), 1.0)
+        self.assertAlmostEqual(result[40], 1 - 0.9 ** 10 - 10 * 0.1 * 0.9 ** 9 - 45 * 0.01 * 0.9 ** 8 - 120 * 0.001 * 0.9 ** 7)
+
+    def test_keep_zero_dice_is_zero(self):
+        self.assertEqual(only_distribution(interpret_statement("3d6h0"))[0], 1)
+        self.assertEqual(only_distribution(interpret_statement("3d6l0"))[0], 1)
+
 
 if __name__ == "__main__":
     unittest.main()
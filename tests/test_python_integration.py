@@ -1,3 +1,4 @@
+import importlib
 import os
 import sys
 import tempfile
@@ -16,8 +17,11 @@ if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
 from dice import D, dice_interpreter, dicefunction
-from diceengine import Distribution, FiniteMeasure, TRUE, FALSE, Sweep
+from diceengine import Distribution, FiniteMeasure, TRUE, FALSE, Sweep, SweepValues
 from executor import ExactExecutor
+from hostfunctions import RESULT_CACHE
+import resultstore
+from resultstore import open_result_store
 
 
 def only_distribution(result):
@@ -190,6 +194,170 @@ class PythonIntegrationTest(unittest.TestCase):
         self.assertEqual(add_bonus(3), 5)
         self.assertEqual(calls, [(3, 2)])
 
+    def test_lifted_call_broadcasts_operands_over_missing_axes(self):
+        calls = []
+
+        @dicefunction
+        def scaled(value, factor):
+            calls.append((value, factor))
+            return value * factor
+
+        values = Sweep.from_values(SweepValues([1, 2, 3], name="value"))
+        factors = Sweep.from_values(SweepValues([10, 100], name="factor"))
+        result = scaled(values, factors)
+        self.assertEqual([axis.name for axis in result.axes], ["value", "factor"])
+        self.assertEqual(result.cells[(3, 100)], 300)
+        self.assertEqual(len(calls), 6)
+
+    def test_cache_enabled_lifted_call_reuses_shared_cells(self):
+        calls = []
+
+        @dicefunction(cache=True)
+        def halved(value, factor):
+            calls.append((value, factor))
+            return value.average() * factor / 2
+
+        shared = Distribution(((4, 0.5), (8, 0.5)))
+        broadcast = Sweep((SweepValues([1, 2, 3], name="level").axis(),), {(level,): shared for level in (1, 2, 3)})
+        result = halved(broadcast, Sweep.from_values(SweepValues([7], name="factor")))
+        self.assertEqual(len(calls), 1)
+        self.assertIs(result.cells[(1, 7)], result.cells[(3, 7)])
+
+    def test_pure_lifted_call_reuses_shared_cells_without_caching(self):
+        calls = []
+
+        @dicefunction(pure=True)
+        def halved(value, factor):
+            calls.append((value, factor))
+            return value.average() * factor / 2
+
+        shared = Distribution(((4, 0.5), (8, 0.5)))
+        broadcast = Sweep((SweepValues([1, 2, 3], name="level").axis(),), {(level,): shared for level in (1, 2, 3)})
+        result = halved(broadcast, Sweep.from_values(SweepValues([7], name="factor")))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(result.cells[(2, 7)], 21)
+        with self.assertRaisesRegex(Exception, "must be pure"):
+            dicefunction(cache=True, pure=False)(lambda value: value)
+
+    def test_result_cache_is_bounded_and_reports_counters(self):
+        executor = ExactExecutor()
+        calls = []
+
+        @dicefunction(cache=True)
+        def widened(value):
+            calls.append(value)
+            return Distribution(((value, 0.5), (value + 1, 0.5)))
+
+        budget = executor.result_cache_stats()["budget"]
+        executor.clear_result_cache()
+        try:
+            executor.set_result_cache_budget(8)
+            widened(1)
+            widened(1)
+            widened(2)
+            widened(3)
+            stats = executor.result_cache_stats()
+            self.assertEqual(stats["functions"]["widened"], {"hits": 1, "misses": 3, "evictions": 1})
+            self.assertLessEqual(stats["weight"], 8)
+            widened(1)
+            self.assertEqual(calls, [1, 2, 3, 1])
+            executor.clear_result_cache()
+            self.assertEqual(executor.result_cache_stats()["entries"], 0)
+        finally:
+            executor.set_result_cache_budget(budget)
+            executor.clear_result_cache()
+
+    def test_persistent_store_reuses_results_across_sessions(self):
+        calls = []
+
+        @dicefunction(cache=True)
+        def widened(value):
+            calls.append(value)
+            return Distribution(((value, 0.5), (value + 1, 0.5)))
+
+        def run(bonus):
+            session = dice_interpreter()
+            session.register_function(widened)
+            session("bonus = {}\nboosted(value): widened(value) + bonus".format(bonus))
+            return only_distribution(session("boosted(3)"))
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            RESULT_CACHE.clear()
+            RESULT_CACHE.set_persistent_store(open_result_store(tempdir))
+            try:
+                first = run(2)
+                RESULT_CACHE.persistent_store.close()
+                RESULT_CACHE.clear()
+                store = open_result_store(tempdir)
+                RESULT_CACHE.set_persistent_store(store)
+                self.assertEqual(run(2), first)
+                self.assertEqual(calls, [3])
+                self.assertEqual(store.stats()["hits"], 1)
+                # The key covers globals referenced by the function body.
+                self.assertEqual(run(5)[8], 0.5)
+                self.assertEqual(calls, [3])
+                self.assertEqual(store.stats()["hits"], 2)
+            finally:
+                RESULT_CACHE.persistent_store.close()
+                RESULT_CACHE.set_persistent_store(None)
+                RESULT_CACHE.clear()
+
+    def test_persistent_store_skips_results_with_axes_created_in_the_function(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            RESULT_CACHE.clear()
+            try:
+                outputs = []
+                for program in ("f(x): x + [1..3]\nf(1)", "a = [10, 20]\nf(x): x + [1..3]\nf(1) + a"):
+                    # Each run starts numbering sweeps afresh, like a new process.
+                    SweepValues.counter = 0
+                    RESULT_CACHE.set_persistent_store(open_result_store(tempdir))
+                    try:
+                        outputs.append(dice_interpreter()(program))
+                    finally:
+                        RESULT_CACHE.persistent_store.close()
+                        RESULT_CACHE.clear()
+            finally:
+                RESULT_CACHE.set_persistent_store(None)
+        self.assertEqual([axis.values for axis in outputs[1].axes], [(1, 2, 3), (10, 20)])
+        self.assertEqual(only_distribution(outputs[1].cells[(3, 20)])[24], 1)
+
+    def test_persistent_store_skips_builtin_results_with_axes_created_in_the_call(self):
+        @dicefunction(cache=True)
+        def spread(value):
+            return Sweep.from_values(SweepValues([value, value + 1], name="spread"))
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            RESULT_CACHE.clear()
+            store = open_result_store(tempdir)
+            RESULT_CACHE.set_persistent_store(store)
+            try:
+                self.assertEqual(spread(3).cells[(4,)], 4)
+                self.assertEqual(store.stats()["writes"], 0)
+            finally:
+                store.close()
+                RESULT_CACHE.set_persistent_store(None)
+                RESULT_CACHE.clear()
+
+    def test_function_fingerprint_covers_helpers_in_other_modules(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            helper_path = Path(tempdir) / "fingerprint_helper.py"
+            Path(tempdir, "fingerprint_caller.py").write_text(
+                "from fingerprint_helper import bonus\n\n\ndef boosted(value):\n    return bonus(value)\n"
+            )
+            sys.path.insert(0, tempdir)
+            try:
+                fingerprints = []
+                for body in ("value + 1", "value + 10"):
+                    helper_path.write_text("def bonus(value):\n    return {}\n".format(body))
+                    sys.modules.pop("fingerprint_helper", None)
+                    sys.modules.pop("fingerprint_caller", None)
+                    fingerprints.append(resultstore.function_fingerprint(importlib.import_module("fingerprint_caller").boosted))
+            finally:
+                sys.path.remove(tempdir)
+                sys.modules.pop("fingerprint_helper", None)
+                sys.modules.pop("fingerprint_caller", None)
+        self.assertNotEqual(fingerprints[0], fingerprints[1])
+
     def test_cache_enabled_sweep_function_is_rejected(self):
         with self.assertRaisesRegex(Exception, "cache=True"):
             @dicefunction(cache=True)
@@ -212,6 +380,28 @@ class PythonIntegrationTest(unittest.TestCase):
         with self.assertRaisesRegex(Exception, "global reassignment"):
             session("bonus = 2")
 
+    def test_parallel_session_matches_serial_sweep(self):
+        program = "bonus = 2\nhit(ac, extra): d20 + bonus + extra >= ac\nhit([AC:10..14], [EXTRA:0..2])"
+        serial = dice_interpreter()(program)
+        session = dice_interpreter(jobs=2)
+        parallel = session(program)
+        self.assertEqual(
+            [(axis.name, axis.values) for axis in parallel.axes],
+            [(axis.name, axis.values) for axis in serial.axes],
+        )
+        for coordinates, distrib in serial.items():
+            self.assertEqual(parallel.cells[coordinates], distrib)
+        self.assertEqual(only_distribution(session("hit(11, 0)"))[TRUE], 0.6)
+
+    def test_parallel_sweep_keeps_axes_inherited_from_globals(self):
+        for declaration in ("a = [1..3]", "a = [n: 1..3]"):
+            session = dice_interpreter(jobs=3)
+            session(declaration)
+            session.assign("r", session("a + [y: 1..4]"))
+            result = session("r + a")
+            self.assertEqual(len(result.axes), 2)
+            self.assertEqual(len(result.cells), 12)
+
     def test_dsl_function_rejects_sampling_in_body(self):
         session = dice_interpreter()
         session("sample_once(): !d6")
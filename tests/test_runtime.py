@@ -352,6 +352,10 @@ class RuntimeTest(unittest.TestCase):
         self.assertEqual(result.cells[(10,)][23], 1)
         self.assertEqual(result.cells[(11,)][25], 1)
 
+    def test_sumover_keeps_long_convolution_chains_normalized(self):
+        result = only_distribution(interpret_statement("sumover(d6 ^ [N:1..40] >= [T:1..100])"))
+        self.assertAlmostEqual(sum(weight for _, weight in result.entries), 1.0, places=9)
+
     def test_total_reduces_single_named_axis(self):
         result = only_distribution(interpret_statement("total([party:1, 2, 3])"))
         self.assertEqual(result[6], 1)
@@ -374,6 +378,13 @@ class RuntimeTest(unittest.TestCase):
         self.assertAlmostEqual(result[1], 0.5)
         self.assertAlmostEqual(result[2], 0.275)
 
+    def test_sumover_balanced_reduction_matches_sequential_sum(self):
+        reduced = only_distribution(interpret_statement('sumover([party:1, 2, 3, 4, 5] d 6, "party")'))
+        sequential = only_distribution(interpret_statement("1 d 6 + 2 d 6 + 3 d 6 + 4 d 6 + 5 d 6"))
+        self.assertEqual(set(reduced.keys()), set(sequential.keys()))
+        for outcome in sequential.keys():
+            self.assertAlmostEqual(reduced[outcome], sequential[outcome], places=12)
+
     def test_repeat_sum_rejects_non_deterministic_count(self):
         with self.assertRaisesRegex(Exception, "deterministic scalar"):
             interpret_statement("repeat_sum(d2, d6)")
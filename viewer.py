@@ -275,7 +275,7 @@ def _plot_scalar_sweep(ax, result, render_config, x_label=None, y_label=None):
     axis = result.axes[0]
     x_values = axis.values
     positions, tick_labels = _category_positions(x_values)
-    y_values = [_scalar_value(result.cells[(value,)]) for value in x_values]
+    y_values = [_scalar_value(result.cell((value,))) for value in x_values]
     ax.plot(positions, y_values, color=_PALETTE[0], linewidth=2.2)
     ax.scatter(positions, y_values, color=_PALETTE[0], s=18)
     if tick_labels is not None:
@@ -291,7 +291,7 @@ def _plot_distribution_sweep(ax, result, render_config, x_label=None, y_label=No
     all_outcomes = []
     seen = set()
     for value in x_values:
-        for outcome in _ordered_values(result.cells[(value,)].keys()):
+        for outcome in _ordered_values(result.cell((value,)).keys()):
             if outcome not in seen:
                 all_outcomes.append(outcome)
                 seen.add(outcome)
@@ -299,7 +299,7 @@ def _plot_distribution_sweep(ax, result, render_config, x_label=None, y_label=No
     for outcome in all_outcomes:
         row = []
         for value in x_values:
-            row.append(_scale_probability(result.cells[(value,)][outcome], render_config))
+            row.append(_scale_probability(result.cell((value,))[outcome], render_config))
         matrix.append(row)
     image = ax.imshow(matrix, aspect="auto", origin="lower", cmap=_SEQUENTIAL_CMAP)
     ax.set_xticks(range(len(x_values)))
@@ -317,7 +317,7 @@ def _plot_scalar_heatmap(ax, result, render_config):
     for row_value in row_axis.values:
         row = []
         for col_value in col_axis.values:
-            row.append(_scalar_value(result.cells[(row_value, col_value)]))
+            row.append(_scalar_value(result.cell((row_value, col_value))))
         matrix.append(row)
     image = ax.imshow(matrix, aspect="auto", origin="lower", cmap=_SEQUENTIAL_CMAP)
     ax.set_xticks(range(len(col_axis.values)))
@@ -346,7 +346,7 @@ def _plot_compare_scalar(ax, entries, render_config, x_label=None, y_label=None)
     positions, tick_labels = _category_positions(x_values)
     series_data = []
     for index, (label, result) in enumerate(entries):
-        y_values = [_scalar_value(result.cells[(value,)]) for value in x_values]
+        y_values = [_scalar_value(result.cell((value,))) for value in x_values]
         color = _PALETTE[index % len(_PALETTE)]
         ax.plot(positions, y_values, color=color, linewidth=2.0, label=label)
         ax.scatter(positions, y_values, color=color, s=16)
@@ -427,7 +427,7 @@ def _plot_diff(ax, entries, render_config, x_label=None, y_label=None):
         raise Exception("r_diff requires matching sweep values")
     positions, tick_labels = _category_positions(x_values)
     y_values = [
-        _scalar_value(left_result.cells[(value,)]) - _scalar_value(right_result.cells[(value,)])
+        _scalar_value(left_result.cell((value,))) - _scalar_value(right_result.cell((value,)))
         for value in x_values
     ]
     ax.axhline(0, color="#718096", linewidth=1.0, linestyle="--")
@@ -449,7 +449,7 @@ def _best_strategy_payload(result):
     winner_indexes = []
     margins = []
     for condition in condition_axis.values:
-        values = [_scalar_value(result.cells[(strategy, condition)]) for strategy in strategies]
+        values = [_scalar_value(result.cell((strategy, condition))) for strategy in strategies]
         ordered = sorted(enumerate(values), key=lambda item: item[1], reverse=True)
         winner_indexes.append(ordered[0][0])
         margin = ordered[0][1] - ordered[1][1] if len(ordered) > 1 else 0